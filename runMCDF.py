@@ -2,16 +2,28 @@ from __future__ import annotations
 
 import os, sys, platform
 import subprocess
-from multiprocessing import Process, Manager
+import signal
+from multiprocessing import Manager
 from multiprocessing.managers import ListProxy, ValueProxy
+from multiprocessing.connection import Listener, Client, Connection
 import shutil
+import tempfile
+import hashlib
 import re
+import heapq
+import time
+import math
+
+import threading
+import queue
+import atexit
+import traceback
 
 from functools import partial as partial_f
 
 import pickle
 
-from typing import List, Dict, Tuple
+from typing import List, Dict, Tuple, Callable
 
 import copy
 
@@ -21,15 +33,150 @@ exe_file = 'mcdfgme2019.exe'
 # Output files encoding
 ouput_enconding = 'latin-1'
 
-# ARG_MAX of the machine for the parallel command
-parallel_max_length = 2097152
+# Number of finished calculations between each checkpoint written to the calculation logs
+log_checkpoint_interval = 1000
 
 # Max number of transitions that will be stored at the same time for each type
 # This is done to conserve disk space when calculating large sets
 # At ~10M transitions the results will occupy >300GB
-# In this case we calculate batches of 3M transitions and delete all results storing only the energy and rates for each transition
+# In this case we calculate batches of transitions and delete all results storing only the energy and rates for each transition
+# Each batch holds the transitions that fit in the free disk space, with the size of their outputs measured in the previous batch, up to this number
 max_transitions = 3e+6
 
+# Smallest number of transitions in a batch, and the size in bytes of the outputs of a transition before it is measured
+min_transitions = 1e+3
+transition_footprint = 3e+4
+
+# Fraction of the disk holding the transitions that can be filled before a batch is read and its outputs deleted
+transitions_disk_high_water = 0.9
+
+# Number of finished transitions and time in seconds after which the journal of finished transitions is synced to disk
+journal_sync_interval = 1000
+journal_sync_time = 10.0
+
+# File, in the directory where the script is run, where the fit of the runtime of the calculations is stored
+# It holds the sums of the fit for each kind of calculation, so its size does not grow with the number of calculations
+# The fit is shared by all runs started from this directory to dispatch the longest calculations first
+job_timings_file = 'mcdfgme_job_timings.txt'
+
+# File, in the directory where the script is run, where the fit of the peak resident memory of the calculations is stored
+# The memory is fitted the same way as the runtime, to predict the memory a calculation takes before it is started
+job_memory_file = 'mcdfgme_job_memory.txt'
+
+# Each calculation is killed after this factor times its predicted runtime, and never before job_timeout_min seconds
+# A calculation that is killed is handled as not converged. Set the factor to 0 to disable the timeouts
+job_timeout_factor = 20.0
+job_timeout_min = 600.0
+
+# Calculations of a kind with fewer timings than this have no timeout, as their prediction still comes mostly from the prior of the model
+job_timeout_samples = 50
+
+# Return code of a calculation that was killed after its timeout, the same as the coreutils timeout command
+job_timeout_code = 124
+
+# State calculations can be stopped when the accuracy in their .f06 output oscillates, growing again in this number of iterations
+# without reaching a new best accuracy, or when it grows to scf_divergence_factor times the best accuracy reached
+# A slow SCF whose accuracy keeps decreasing is never stopped. The running outputs are read every scf_monitor_interval seconds
+# A calculation that is stopped is handled as not converged, going to the next convergence cycle
+# The monitor changes which states go through the later cycles, so it is disabled by default. Set the iterations above 0 to enable it
+scf_monitor_iterations = 0
+scf_divergence_factor = 1e+3
+scf_monitor_interval = 5.0
+
+# Return code of a state calculation that was stopped because its SCF was diverging
+scf_diverged_code = 125
+
+# Return code of a calculation that was not started, or was killed, because the script is stopping. It is calculated again when the calculation is resumed
+job_cancelled_code = 130
+
+# Return code of a calculation that could not be run because of an error in this script, such as a missing input file or a failed copy
+job_failed_code = 126
+
+# Directory where each calculation is run in its own scratch directory, such as /dev/shm, to keep the scratch files off the project filesystem
+# Only the .f05, .f06 and new .f09 files are copied back to the calculation directory. It is left empty to run the calculations in place
+job_scratch_dir = os.environ.get('MCDF_SCRATCH_DIR', '')
+
+# Extensions of the files that are copied back from the scratch directories
+job_output_extensions = (".f05", ".f06", ".f09")
+
+# Ways of staging the wavefunction files of the transitions, tried in order until one works: reflink, hardlink, symlink or copy
+# The hardlinks and symlinks are only used with job_scratch_dir, as MCDFGME writes to the wavefunction files of the transitions
+wavefunction_staging = ['reflink', 'hardlink', 'copy']
+
+# Retry cycles and by-hand runs start the SCF from the wavefunction left by the previous attempt of the state
+# If the seeded calculation ends up worse than the previous attempt it is repeated from scratch
+warm_start_retries = False
+
+# Names of the wavefunction files read and written by the seeded state calculations, at most 7 characters as required by MCDFGME
+# The written wavefunction only replaces the one of the state when the calculation finished normally with a complete output
+seed_file = 'seed'
+seed_output_file = 'seedout'
+
+# Directory where the outputs of the calculations are stored, addressed by the hash of their inputs and the MCDFGME executable
+# Calculations with stored outputs are copied instead of executed. It is left empty to disable the store
+job_cache_dir = os.environ.get('MCDF_CACHE_DIR', '')
+
+# Maximum size in bytes of the stored outputs, after which the least recently used ones are evicted
+job_cache_size = 50e+9
+
+# Time in seconds after which the staging and evicted directories left in the store by a stopped run are removed
+# Younger ones can still belong to another run using the same store
+job_cache_stale_time = 3600.0
+
+# Pinning of the local workers and the MCDFGME processes they start: '' to let the kernel place them, 'core' to pin each worker to a core,
+# 'node' to pin each worker to a NUMA node, or 'auto' to pin them to the NUMA nodes when there is more than one
+job_cpu_affinity = os.environ.get('MCDF_CPU_AFFINITY', '')
+
+# Directory where the NUMA nodes of the machine are listed
+node_sys_dir = "/sys/devices/system/node"
+
+# Local calculations are only started while the available memory, less the memory the running calculations are still expected to take,
+# leaves this fraction of the total memory free. Set it to 0 to only limit the calculations by the number of threads
+job_memory_reserve = 0.1
+
+# Factor applied to the peak resident memory predicted for a calculation, and the time in seconds between checks of the memory while calculations are held back
+job_memory_margin = 1.25
+job_memory_interval = 1.0
+
+# Number of calculations that are ordered by their predicted runtime at a time when they are dispatched while still being added
+pipeline_window = 1000
+
+# Numbers of threads tried when the number of threads is calibrated, as fractions of the threads of the machine. The physical cores are also tried
+# Each number of threads runs copies of the calibration_sample shortest calculations until each thread finished calibration_runs of them,
+# or for at most calibration_time seconds, which can also be entered after auto in the number of threads prompt
+# The larger numbers of threads are not tried once the throughput falls more than calibration_tolerance below the best one
+calibration_levels = [0.25, 0.5, 0.75, 1.0]
+calibration_sample = 16
+calibration_runs = 3
+calibration_time = 20.0
+calibration_tolerance = 0.1
+
+# Number of threads that clean up the finished calculations in the background, and the number of cleanups that can be pending at a time
+cleanup_threads = 2
+cleanup_backlog = 64
+
+# Number of calculations started by hand in cycle_list that run at the same time, while the others wait in a queue
+# Set it to 0 to use the number of threads of the calculation
+by_hand_processes = 0
+
+# Filename of the input and output of the transitions in the slot directories where they are calculated
+transition_slot_file = 'slot'
+
+# Address where the calculations are served to remote workers, as host:port, a port alone to listen only on localhost, or the path of a unix socket
+# It is left empty when only the local workers are used
+job_server_address = ''
+
+# Authentication key shared between the job server and the remote workers, taken from the MCDF_JOB_AUTHKEY environment variable
+# There is no default since the connections unpickle what the other side sends, so the server and the workers do not start without it
+job_server_authkey = os.environ.get('MCDF_JOB_AUTHKEY', '').encode()
+
+# Address of the campaign scheduler that runs the calculations of this run, as host:port or the path of a unix socket
+# It is set by the campaign mode for the run of each element and left empty otherwise, when the calculations run in this process
+campaign_address = os.environ.get('MCDF_CAMPAIGN_ADDRESS', '')
+
+# Answers to the prompts of the run of an element started by the campaign mode, given as setting=value arguments instead of asked
+campaign_settings: Dict[str, str] = {}
+
 
 # ---------------------------- #
 #      PHYSICAL CONSTANTS      #
@@ -60,7 +207,7 @@ nuc_model = ''
 machine_type = ''
 # Machine number of threads available
 number_max_of_threads = ''
-# User number of threads to use in the calculation
+# User number of threads to use in the calculation, or auto to calibrate it on a sample of the calculations before the first ones are executed
 number_of_threads = ''
 # Number of electrons in the configurations read from file
 nelectrons = ''
@@ -125,6 +272,8 @@ file_parameters = ''
 # Files with the energy and convergence results for the various atomic states calculated
 file_results = ''
 file_final_results = ''
+# Lock for the result files shared by the state types that are calculated at the same time
+file_results_lock = threading.Lock()
 file_final_results_1hole = ''
 file_final_results_2holes = ''
 file_final_results_3holes = ''
@@ -652,6 +801,251 @@ class Transition:
         self.multipole_array = copy.deepcopy(multipole_array)
         
 
+class JobCostModel:
+    def __init__(self, timings_file: str, prior_weight: float = 1.0):
+        """Model to predict the runtime of the MCDFGME calculations, used to dispatch the longest ones first.
+        For each kind of calculation the logarithm of the runtime is fitted as a linear function of the logarithm of the features,
+        with a ridge term pulling the coefficients towards a runtime proportional to the product of the features.
+        The fit is kept as the sums of the normal equations so it can be updated with every finished calculation.
+        Only these sums and the number of timings of each kind are stored, merged with the ones stored by other runs when they are saved.
+        
+        Args:
+            timings_file (str): file where the sums of the fit are stored and read from
+            prior_weight (float, optional): weight of the prior coefficients in the fit. Defaults to 1.0.
+        """
+        self.timings_file = timings_file
+        self.prior_weight = prior_weight
+        self.prior = [0.0, 1.0, 1.0, 1.0, 1.0]
+        self.xtx: Dict[str, List[List[float]]] = {}
+        self.xty: Dict[str, List[float]] = {}
+        self.counts: Dict[str, int] = {}
+        self.coefficients: Dict[str, List[float]] = {}
+        # Sums of the timings recorded since the last save
+        self.new_xtx: Dict[str, List[List[float]]] = {}
+        self.new_xty: Dict[str, List[float]] = {}
+        self.new_counts: Dict[str, int] = {}
+        self.loaded = False
+        self.lock = threading.Lock()
+    
+    @staticmethod
+    def features(electron_number: int, configuration: str, jj: int, eigv: int) -> List[float]:
+        """Helper function to build the features of a state calculation
+        
+        Args:
+            electron_number (int): number of electrons in the configuration
+            configuration (str): electron configuration of the state
+            jj (int): 2*j value for the state
+            eigv (int): eigenvalue for the state
+        
+        Returns:
+            List[float]: list with the constant term and the logarithm of each feature.
+            The configuration size is the number of subshells in the configuration.
+        """
+        return [1.0, math.log(max(electron_number, 1)), math.log(max(len(configuration.split()), 1)), math.log(jj + 2), math.log(eigv + 1)]
+    
+    @staticmethod
+    def combine(features_i: List[float], features_f: List[float]) -> List[float]:
+        """Helper function to build the features of a transition calculation from the features of both states
+        
+        Args:
+            features_i (List[float]): features of the initial state
+            features_f (List[float]): features of the final state
+        
+        Returns:
+            List[float]: list with the constant term and the sum of the features of both states
+        """
+        return [1.0] + [fi + ff for fi, ff in zip(features_i[1:], features_f[1:])]
+    
+    @staticmethod
+    def accumulate(xtx: Dict[str, List[List[float]]], xty: Dict[str, List[float]], counts: Dict[str, int], \
+                   kind: str, sample_xtx: List[List[float]], sample_xty: List[float], count: int):
+        """Helper function to add the sums of some timings to the sums of the normal equations of a kind
+        
+        Args:
+            xtx (Dict[str, List[List[float]]]): sums of the products of the features, for each kind
+            xty (Dict[str, List[float]]): sums of the features times the logarithm of the runtime, for each kind
+            counts (Dict[str, int]): number of timings, for each kind
+            kind (str): kind of calculation
+            sample_xtx (List[List[float]]): sums of the products of the features of the timings to add
+            sample_xty (List[float]): sums of the features times the logarithm of the runtime of the timings to add
+            count (int): number of timings to add
+        """
+        if kind not in xtx:
+            xtx[kind] = [[0.0] * len(sample_xty) for _ in sample_xty]
+            xty[kind] = [0.0] * len(sample_xty)
+            counts[kind] = 0
+        
+        for a in range(len(sample_xty)):
+            xty[kind][a] += sample_xty[a]
+            for b in range(len(sample_xty)):
+                xtx[kind][a][b] += sample_xtx[a][b]
+        
+        counts[kind] += count
+    
+    @staticmethod
+    def sums(features: List[float], runtime: float) -> Tuple[List[List[float]], List[float]]:
+        """Helper function for the sums of the normal equations of a single timing
+        
+        Args:
+            features (List[float]): features of the calculation
+            runtime (float): runtime of the calculation in seconds
+        
+        Returns:
+            Tuple[List[List[float]], List[float]]: products of the features and the features times the logarithm of the runtime
+        """
+        y = math.log(max(runtime, 1e-3))
+        
+        return [[fa * fb for fb in features] for fa in features], [fa * y for fa in features]
+    
+    def readSums(self) -> Tuple[Dict[str, List[List[float]]], Dict[str, List[float]], Dict[str, int]]:
+        """Helper function to read the sums stored in the timings file.
+        A file written by older versions of this script, with a line for each timing, is summed the same way.
+        
+        Returns:
+            Tuple[Dict[str, List[List[float]]], Dict[str, List[float]], Dict[str, int]]: sums of the products of the features,
+            sums of the features times the logarithm of the runtime and number of timings, for each kind
+        """
+        xtx: Dict[str, List[List[float]]] = {}
+        xty: Dict[str, List[float]] = {}
+        counts: Dict[str, int] = {}
+        
+        if not os.path.isfile(self.timings_file):
+            return xtx, xty, counts
+        
+        n = len(self.prior)
+        
+        with open(self.timings_file, "r") as timings:
+            for line in timings:
+                values = line.split()
+                try:
+                    if len(values) == 2 + n * n + n:
+                        numbers = [float(value) for value in values[2:]]
+                        self.accumulate(xtx, xty, counts, values[0], [numbers[a * n:(a + 1) * n] for a in range(n)], numbers[n * n:], int(values[1]))
+                    elif len(values) == 2 + n:
+                        self.accumulate(xtx, xty, counts, values[0], *self.sums([float(value) for value in values[1:-1]], float(values[-1])), 1)
+                except ValueError:
+                    continue
+        
+        return xtx, xty, counts
+    
+    def load(self):
+        """Helper function to read the sums stored by previous runs
+        """
+        self.loaded = True
+        
+        xtx, xty, counts = self.readSums()
+        for kind in counts:
+            self.accumulate(self.xtx, self.xty, self.counts, kind, xtx[kind], xty[kind], counts[kind])
+        
+        self.coefficients.clear()
+    
+    def samples(self, kind: str) -> int:
+        """Function for the number of timings the fit of a kind of calculation is based on
+        
+        Args:
+            kind (str): kind of calculation
+        
+        Returns:
+            int: number of timings
+        """
+        with self.lock:
+            if not self.loaded:
+                self.load()
+            
+            return self.counts.get(kind, 0)
+    
+    def fit(self, kind: str) -> List[float]:
+        """Helper function to solve the normal equations for a kind of calculation
+        
+        Args:
+            kind (str): kind of calculation
+        
+        Returns:
+            List[float]: fitted coefficients. If there are no timings these are the prior coefficients.
+        """
+        if kind not in self.xtx:
+            return self.prior
+        
+        n = len(self.prior)
+        
+        # Augmented matrix of the ridge normal equations
+        matrix = [[self.xtx[kind][a][b] + (self.prior_weight if a == b else 0.0) for b in range(n)] + \
+                  [self.xty[kind][a] + self.prior_weight * self.prior[a]] for a in range(n)]
+        
+        # Gauss-Jordan elimination with partial pivoting
+        for col in range(n):
+            pivot = max(range(col, n), key=lambda row: abs(matrix[row][col]))
+            matrix[col], matrix[pivot] = matrix[pivot], matrix[col]
+            
+            for row in range(n):
+                if row != col:
+                    factor = matrix[row][col] / matrix[col][col]
+                    matrix[row] = [vr - factor * vc for vr, vc in zip(matrix[row], matrix[col])]
+        
+        return [matrix[a][n] / matrix[a][a] for a in range(n)]
+    
+    def predict(self, kind: str, features: List[float]) -> float:
+        """Function to predict the runtime of a calculation
+        
+        Args:
+            kind (str): kind of calculation
+            features (List[float]): features of the calculation
+        
+        Returns:
+            float: predicted runtime in seconds
+        """
+        with self.lock:
+            if not self.loaded:
+                self.load()
+            
+            if kind not in self.coefficients:
+                self.coefficients[kind] = self.fit(kind)
+            
+            return math.exp(sum(c * f for c, f in zip(self.coefficients[kind], features)))
+    
+    def record(self, kind: str, features: List[float], runtime: float):
+        """Function to update the model with the runtime of a finished calculation
+        
+        Args:
+            kind (str): kind of calculation
+            features (List[float]): features of the calculation
+            runtime (float): runtime of the calculation in seconds
+        """
+        with self.lock:
+            if not self.loaded:
+                self.load()
+            
+            sample_xtx, sample_xty = self.sums(features, runtime)
+            
+            self.accumulate(self.xtx, self.xty, self.counts, kind, sample_xtx, sample_xty, 1)
+            self.accumulate(self.new_xtx, self.new_xty, self.new_counts, kind, sample_xtx, sample_xty, 1)
+            
+            if kind in self.coefficients:
+                del self.coefficients[kind]
+    
+    def save(self):
+        """Function to add the new timings to the sums in the timings file.
+        The sums are read again, so the timings saved by other runs in the meantime are kept, and the file is replaced at once.
+        """
+        with self.lock:
+            if len(self.new_counts) == 0:
+                return
+            
+            xtx, xty, counts = self.readSums()
+            for kind in self.new_counts:
+                self.accumulate(xtx, xty, counts, kind, self.new_xtx[kind], self.new_xty[kind], self.new_counts[kind])
+            
+            with open(self.timings_file + "." + str(os.getpid()) + ".tmp", "w") as timings:
+                for kind in counts:
+                    timings.write(kind + " " + str(counts[kind]) + " " + " ".join([repr(value) for row in xtx[kind] for value in row]) + " " + \
+                                  " ".join([repr(value) for value in xty[kind]]) + "\n")
+            
+            os.replace(self.timings_file + "." + str(os.getpid()) + ".tmp", self.timings_file)
+            
+            self.new_xtx.clear()
+            self.new_xty.clear()
+            self.new_counts.clear()
+
 # List of calculated radiative transitions and their energy, rate and multipoles
 calculatedRadiativeTransitions:List[Transition] = []
 # List of calculated auger transitions and their energy and rate
@@ -719,6 +1113,12 @@ clearLine = '\r\x1b[K'
 # Root directory where the script is located
 rootDir = os.getcwd()
 
+# Model of the runtime of the calculations shared by all the job executions
+job_cost_model = JobCostModel(rootDir + "/" + job_timings_file)
+
+# Model of the peak resident memory of the calculations, fitted the same way as their runtime
+job_memory_model = JobCostModel(rootDir + "/" + job_memory_file)
+
 
 
 
@@ -1031,7 +1431,7 @@ def checkPartial():
         ## In this case the first element is 4 to flag that the first 2 type of transitions are to be potentially recalculated
         return 4, last_rad_calculated, last_aug_calculated
     """
-    global directory_name, parallel_max_length, machine_type, number_max_of_threads
+    global directory_name, machine_type, number_max_of_threads
     global label_auto, atomic_number, nelectrons, nuc_massyorn, nuc_mass, nuc_model, number_of_threads
     global calculated1holeStates, calculated2holesStates, calculated3holesStates, calculatedShakeupStates
     global exist_3holes, exist_shakeup, exist_excitation
@@ -1050,8 +1450,6 @@ def checkPartial():
     
     directory_name = inp
     
-    parallel_max_length = int(subprocess.check_output(['getconf', 'ARG_MAX']).strip())
-    
     machine_type = platform.uname()[0]
     
     if machine_type == 'Darwin':
@@ -1087,10 +1485,12 @@ def checkPartial():
             elif "Number of considered threads in the calculation=" in line:
                 number_of_threads = line.replace("Number of considered threads in the calculation=", "").strip()
     
-    if int(number_of_threads) > int(number_max_of_threads):
+    if number_of_threads != 'auto' and int(number_of_threads) > int(number_max_of_threads):
         print("Previous number of threads is greater than the current machine's maximum. Proceding with the current maximum threads...\n")
         number_of_threads = number_max_of_threads
     
+    setupJobServer()
+    
     loadElectronConfigs()
     
     
@@ -1147,12 +1547,17 @@ def checkPartial():
                         
                         if "First Cycle Last Calculated:" in line:
                             last_calculated_cycle_1hole = 1
+                            last_calculated_state_1hole = [0, 0, 0]
                         elif "Second Cycle Last Calculated:" in line:
                             last_calculated_cycle_1hole = 2
+                            last_calculated_state_1hole = [0, 0, 0]
                         elif "Third Cycle Last Calculated:" in line:
                             last_calculated_cycle_1hole = 3
+                            last_calculated_state_1hole = [0, 0, 0]
                         elif "Fourth Cycle Last Calculated:" in line or "CalculationFinalized" in line:
                             last_calculated_cycle_1hole = 4
+                            if "Fourth Cycle Last Calculated:" in line:
+                                last_calculated_state_1hole = [0, 0, 0]
                         elif last_calculated_cycle_1hole > 0 and line != "\n":
                             last_calculated_state_1hole = [int(qn) for qn in line.strip().split(", ")]
                         
@@ -1174,12 +1579,17 @@ def checkPartial():
                         
                         if "First Cycle Last Calculated:" in line:
                             last_calculated_cycle_2holes = 1
+                            last_calculated_state_2holes = [0, 0, 0]
                         elif "Second Cycle Last Calculated:" in line:
                             last_calculated_cycle_2holes = 2
+                            last_calculated_state_2holes = [0, 0, 0]
                         elif "Third Cycle Last Calculated:" in line:
                             last_calculated_cycle_2holes = 3
+                            last_calculated_state_2holes = [0, 0, 0]
                         elif "Fourth Cycle Last Calculated:" in line or "CalculationFinalized" in line:
                             last_calculated_cycle_2holes = 4
+                            if "Fourth Cycle Last Calculated:" in line:
+                                last_calculated_state_2holes = [0, 0, 0]
                         elif last_calculated_cycle_2holes > 0 and line != "\n":
                             last_calculated_state_2holes = [int(qn) for qn in line.strip().split(", ")]
                         
@@ -1202,12 +1612,17 @@ def checkPartial():
                             
                             if "First Cycle Last Calculated:" in line:
                                 last_calculated_cycle_3holes = 1
+                                last_calculated_state_3holes = [0, 0, 0]
                             elif "Second Cycle Last Calculated:" in line:
                                 last_calculated_cycle_3holes = 2
+                                last_calculated_state_3holes = [0, 0, 0]
                             elif "Third Cycle Last Calculated:" in line:
                                 last_calculated_cycle_3holes = 3
+                                last_calculated_state_3holes = [0, 0, 0]
                             elif "Fourth Cycle Last Calculated:" in line or "CalculationFinalized" in line:
                                 last_calculated_cycle_3holes = 4
+                                if "Fourth Cycle Last Calculated:" in line:
+                                    last_calculated_state_3holes = [0, 0, 0]
                             elif last_calculated_cycle_3holes > 0 and line != "\n":
                                 last_calculated_state_3holes = [int(qn) for qn in line.strip().split(", ")]
                             
@@ -1232,12 +1647,17 @@ def checkPartial():
                             
                             if "First Cycle Last Calculated:" in line:
                                 last_calculated_cycle_shakeup = 1
+                                last_calculated_state_shakeup = [0, 0, 0]
                             elif "Second Cycle Last Calculated:" in line:
                                 last_calculated_cycle_shakeup = 2
+                                last_calculated_state_shakeup = [0, 0, 0]
                             elif "Third Cycle Last Calculated:" in line:
                                 last_calculated_cycle_shakeup = 3
+                                last_calculated_state_shakeup = [0, 0, 0]
                             elif "Fourth Cycle Last Calculated:" in line or "CalculationFinalized" in line:
                                 last_calculated_cycle_shakeup = 4
+                                if "Fourth Cycle Last Calculated:" in line:
+                                    last_calculated_state_shakeup = [0, 0, 0]
                             elif last_calculated_cycle_shakeup > 0 and line != "\n":
                                 last_calculated_state_shakeup = [int(qn) for qn in line.strip().split(", ")]
                             
@@ -2363,175 +2783,2835 @@ def configureStateInputFile(template: str, currDir: str, currFileName: str, conf
     
     with open(currDir + "/mdfgme.dat", "w") as mdfgme:
         mdfgme.write(mdfgmeFile.replace("f05FileName", currFileName))
+
+
+def seedStateInput(currDir: str, currFileName: str) -> bool:
+    """Helper function to change the input file of a state so the SCF starts from the wavefunction of its previous calculation.
+    The previous .f09 wavefunction is copied to the seed file, which the calculation reads, and the new wavefunction is written to the seed output file.
+    
+    Args:
+        currDir (str): current directory where the state is located
+        currFileName (str): filename for the state
+    
+    Returns:
+        bool: True if the input file was seeded, False if warm starts are disabled or there is no previous wavefunction
+    """
+    if not warm_start_retries or not os.path.isfile(currDir + "/" + currFileName + ".f09"):
+        return False
+    
+    with open(currDir + "/" + currFileName + ".f05", "r") as stateInput:
+        inputContent = stateInput.read()
+    
+    # Read the seed with the same options used to read the wavefunctions in the transition templates
+    seededContent = re.sub(r"norbsc=\S+\s+ndep=\S+\s+nlec=\S+\s+nec=(\S+)\s*:", \
+                           "norbsc=-1  ndep=3  nlec=1  fil_read=" + seed_file + "  nec=\\1  filwri=" + seed_output_file + " :", \
+                           inputContent.replace("modfilname_wf=n", "modfilname_wf=y"), count = 1)
+    
+    if "fil_read=" + seed_file not in seededContent:
+        return False
+    
+    # The seed is copied under a temporary name, so a seed left by a stopped script is always complete
+    shutil.copy(currDir + "/" + currFileName + ".f09", currDir + "/" + seed_file + ".f09.tmp")
+    os.replace(currDir + "/" + seed_file + ".f09.tmp", currDir + "/" + seed_file + ".f09")
     
+    if os.path.isfile(currDir + "/" + seed_output_file + ".f09"):
+        os.remove(currDir + "/" + seed_output_file + ".f09")
+    
+    with open(currDir + "/" + currFileName + ".f05", "w") as stateInput:
+        stateInput.write(seededContent)
+    
+    return True
 
-def executeBatchStateCalculation(parallel_paths: List[str], log_file: str = '', state_list: List[State] = [], log_line_header: str = ''):
-    """Helper function to execute batches of state calculations.
-    the calculations are also logged into the correct files
 
+def finishSeededRun(currDir: str, currFileName: str, clean: bool) -> bool:
+    """Helper function to move the wavefunction written by a seeded calculation to the .f09 file of the state.
+    The wavefunction is only moved if the calculation exited normally and its output is complete,
+    otherwise it may be partially written, such as when the calculation was killed, so it is removed and the state keeps its previous wavefunction.
+    
     Args:
-        parallel_paths (List[str]): list of the paths to the executables of each state to be executed
-        log_file (str, optional): filename of the log file for the calulations. Defaults to ''.
-        state_list (List[State], optional): list of states where the subset is being calculated from. Defaults to [].
-        log_line_header (str, optional): log file line header to format the file. Defaults to ''.
+        currDir (str): current directory where the state is located
+        currFileName (str): filename for the state
+        clean (bool): flag if the calculation exited normally and its output is complete
+    
+    Returns:
+        bool: True if the last calculation of the state was seeded
     """
-    parallel_max_paths = (len(parallel_paths) * parallel_max_length / len(' '.join(parallel_paths))) / 17
-    if len(parallel_paths) < parallel_max_paths:
-        subprocess.check_output(['parallel -j' + number_of_threads + ' --bar --files ' + "'cd {//} && {/} && cd -'" + ' ::: ' + ' '.join(parallel_paths) + ' >/dev/null'], shell=True) # type: ignore
-        if log_file != '' and state_list != [] and log_line_header != '':
-            with open(log_file, "a") as log:
-                log.write(log_line_header)
-                log.write(', '.join([str(qn) for qn in state_list[-1].qns()]) + "\n")
-    else:
-        pl: int = 0
-        for pl in range(int(len(parallel_paths) / parallel_max_paths)):
-            subprocess.check_output(['parallel -j' + number_of_threads + ' --bar --files ' + "'cd {//} && {/} && cd -'" + ' ::: ' + ' '.join(parallel_paths[int(pl * parallel_max_paths):int((pl + 1) * parallel_max_paths)]) + ' >/dev/null'], shell=True) # type: ignore
-            
-            if log_file != '' and state_list != [] and log_line_header != '':
-                with open(log_file, "a") as log:
-                    if pl == 0:
-                        log.write(log_line_header)
-                    
-                    log.write(', '.join([str(qn) for qn in state_list[int((pl + 1) * parallel_max_paths) - 1].qns()]) + "\n")
-        
+    if not os.path.isfile(currDir + "/" + seed_file + ".f09"):
+        return False
+    
+    os.remove(currDir + "/" + seed_file + ".f09")
+    
+    if os.path.isfile(currDir + "/" + seed_output_file + ".f09"):
+        if clean:
+            os.replace(currDir + "/" + seed_output_file + ".f09", currDir + "/" + currFileName + ".f09")
+        else:
+            os.remove(currDir + "/" + seed_output_file + ".f09")
+    
+    return True
+
+
+def seedWorse(previous_complete: bool, previous_accuracy: float, complete: bool, accuracy: float) -> bool:
+    """Helper function to check if a seeded calculation that did not converge ended up worse than the previous attempt
+    
+    Args:
+        previous_complete (bool): flag if the output of the previous attempt was complete
+        previous_accuracy (float): cycle accuracy of the previous attempt
+        complete (bool): flag if the output of the seeded calculation is complete
+        accuracy (float): cycle accuracy of the seeded calculation
+    
+    Returns:
+        bool: True if the calculation should be repeated from scratch
+    """
+    return not complete or (previous_complete and abs(accuracy) > abs(previous_accuracy))
+
+
+def readStateInputCycle(currDir: str, currFileName: str) -> Tuple[int, List[str]]:
+    """Helper function to read which convergence cycle the current input file of a state belongs to.
+    This is used to pick up the calculation of each state from where it stopped.
+    
+    Args:
+        currDir (str): current directory where the state is located
+        currFileName (str): filename for the state
+    
+    Returns:
+        Tuple[int, List[str]]: 2 return arguments for:
         
-        subprocess.check_output(['parallel -j' + number_of_threads + ' --bar --files ' + "'cd {//} && {/} && cd -'" + ' ::: ' + ' '.join(parallel_paths[int((pl + 1) * parallel_max_paths):]) + ' >/dev/null'], shell=True) # type: ignore
+        cycle of the input file: 1 for the default input, 2 for 10 steps, 3 for 10 steps with one failed orbital
+        and 4 for 10 steps with the second failed orbital. 0 if there is no input file.\n
+        list of failed orbitals in the input file, formated as in the State failed_orbs.\n
+    """
+    if not os.path.isfile(currDir + "/" + currFileName + ".f05"):
+        return 0, []
+    
+    with open(currDir + "/" + currFileName + ".f05", "r") as stateInput:
+        inputContent = stateInput.readlines()
+    
+    if not any("modsolv_orb=y" in line for line in inputContent):
+        return (1 if any("nstep=0" in line for line in inputContent) else 2), []
+    
+    # Indentation of the failed orbitals placeholder in the template
+    placeholder = [line for line in f05Template_10steps_Forbs_nuc.split("\n") if "mcdfgmefailledorbital" in line][0]
+    indent = placeholder[:placeholder.index("mcdfgmefailledorbital")]
+    
+    failed_orbs: List[str] = []
+    
+    start = [i for i, line in enumerate(inputContent) if "modsolv_orb=y" in line][0] + 1
+    for line in inputContent[start:]:
+        if line.strip() == "end":
+            break
         
-        if log_file != '' and state_list != [] and log_line_header != '':
-            with open(log_file, "a") as log:
-                log.write(', '.join([str(qn) for qn in state_list[-1].qns()]) + "\n")
-
+        failed_orbs.append(line.rstrip("\n")[len(indent):] if len(failed_orbs) == 0 else line.rstrip("\n"))
+    
+    # The second failed orbital is always added with an extra indentation
+    if len(failed_orbs) == 2 or (len(failed_orbs) == 1 and failed_orbs[0].startswith("    ")):
+        return 4, failed_orbs
+    
+    return 3, failed_orbs
 
-def executeBatchTransitionCalculation(parallel_paths: List[str], \
-                                    parallel_initial_src_paths: List[str], parallel_final_src_paths: List[str], \
-                                    parallel_initial_dst_paths: List[str], parallel_final_dst_paths: List[str], \
-                                    log_file: str = '', transition_list: List[Transition] = [], log_line_header: str = '', \
-                                    batch: bool = False):
-    """Helper function to execute batches of transition calculations and clean up the extra files afterwards
 
+def jobTimeout(kind: str, predicted: float) -> float | None:
+    """Helper function for the timeout of a calculation given its predicted runtime
+    
     Args:
-        parallel_paths (List[str]): list with the paths to the executables for the transitions
-        parallel_initial_src_paths (List[str]): list with the paths to the source of the .f09 wavefunction files for the initial state
-        parallel_final_src_paths (List[str]): list with the paths to the source of the .f09 wavefunction files for the final state
-        parallel_initial_dst_paths (List[str]): list with the paths to the destination of the .f09 wavefunction files for the initial state
-        parallel_final_dst_paths (List[str]): list with the paths to the destination of the .f09 wavefunction files for the final state
-        log_file (str, optional): filename of the log file where to log the calculation for these transitions. Defaults to ''.
-        transition_list (List[Transition], optional): list of transition where the execution is being done from. Defaults to [].
-        log_line_header (str, optional): log header line to format the log file. Defaults to ''.
-        batch (bool, optional): flag to control if this calculation contains all the transitions or is just a sub batch. Defaults to False
+        kind (str): kind of calculation in the job cost model
+        predicted (float): predicted runtime of the calculation in seconds
+    
+    Returns:
+        float | None: timeout in seconds, or None if the timeouts are disabled or the kind does not have job_timeout_samples timings yet
     """
+    if job_timeout_factor <= 0 or job_cost_model.samples(kind) < job_timeout_samples:
+        return None
     
-    parallel_max_paths = (len(parallel_paths) * parallel_max_length / len(' '.join(parallel_paths))) / 17
-    if len(parallel_paths) < parallel_max_paths:
-        # COPY .f09 WAVEFUNCTION FILES
-        for wf_src, wf_dst in zip(parallel_initial_src_paths, parallel_initial_dst_paths):
-            shutil.copy(wf_src, wf_dst)
+    return max(job_timeout_min, job_timeout_factor * predicted)
+
+
+class ScfMonitor:
+    def __init__(self, output_path: str):
+        """Helper class to follow the SCF of a running state calculation through its .f06 output.
+        Each "Variation of eigenenergy" block printed by MCDFGME is read as one iteration, with the accuracy read the same way as in checkOutput.
+        The calculation should be stopped when its accuracy grows far above the best value reached, or when it oscillates,
+        with the accuracy growing again in scf_monitor_iterations iterations since the best value was reached.
+        Iterations where the accuracy decreases without reaching the best value are not counted, so a slow SCF is not stopped.
         
-        for wf_src, wf_dst in zip(parallel_final_src_paths, parallel_final_dst_paths):
-            shutil.copy(wf_src, wf_dst)
+        Args:
+            output_path (str): path to the .f06 output of the calculation
+        """
+        self.output_path = output_path
+        self.offset = 0
+        self.buffer = ''
+        self.in_variation = False
+        self.accuracy: float | None = None
+        self.previous = math.inf
+        self.best = math.inf
+        self.stalled = 0
+    
+    def update(self) -> bool:
+        """Function to read the output written since the last update
         
-        # EXECUTE PARALLEL JOB
-        subprocess.check_output(['parallel -j' + number_of_threads + ' --bar --files ' + "'cd {//} && {/} && cd -'" + ' ::: ' + ' '.join(parallel_paths) + ' >/dev/null'], shell=True) # type: ignore
+        Returns:
+            bool: True if the calculation is diverging or oscillating and should be stopped
+        """
+        try:
+            with open(self.output_path, "r", encoding = ouput_enconding) as output:
+                output.seek(self.offset)
+                self.buffer += output.read()
+                self.offset = output.tell()
+        except FileNotFoundError:
+            return False
         
-        # LOG THE CALCULATED STATES
-        if log_file != '' and transition_list != [] and log_line_header != '':
-            with open(log_file, "a") as log:
-                log.write(log_line_header)
-                log.write(', '.join([str(qn) for qn in transition_list[-1].qnsi()]) + " => " + ', '.join([str(qn) for qn in transition_list[-1].qnsf()]) + " //" + str(len(parallel_paths)) + "\n")
-                if not batch:
-                    log.write("Finished Transitions")
+        # Only complete lines are parsed, the rest is kept for the next update
+        lines = self.buffer.split("\n")
+        self.buffer = lines.pop()
         
-        # REMOVE THE .f09 WAVEFUNCTION FILES
-        for wfi_dst, wff_dst in zip(parallel_initial_dst_paths, parallel_final_dst_paths):
-            os.remove(wfi_dst)
-            os.remove(wff_dst)
+        for line in lines:
+            if "Variation of eigenenergy for the last" in line:
+                self.in_variation = True
+                self.accuracy = None
+            elif self.in_variation:
+                if line.strip() != "":
+                    try:
+                        self.accuracy = abs(float(line.strip().split()[-1]))
+                    except (ValueError, IndexError):
+                        pass
+                    
+                    continue
+                
+                self.in_variation = False
+                
+                if self.accuracy is None:
+                    continue
+                
+                if self.accuracy < self.best:
+                    self.best = self.accuracy
+                    self.stalled = 0
+                elif self.accuracy > self.previous:
+                    self.stalled += 1
+                
+                self.previous = self.accuracy
+                
+                if self.stalled >= scf_monitor_iterations or self.accuracy > scf_divergence_factor * self.best:
+                    return True
         
-        for path in parallel_paths:
-            directory = '/'.join(path.split("/")[:-1]) + "/"
-            for filename in os.listdir(directory):
-                if ".f05" not in filename and ".f06" not in filename:
-                    if os.path.isfile(directory + filename):
-                        os.remove(directory + filename)
-                    else:
-                        shutil.rmtree(directory + filename)
-    else:
-        pl: int = 0
-        for pl in range(int(len(parallel_paths) / parallel_max_paths)):
-            # COPY .f09 WAVEFUNCTION FILES FOR THIS BATCH
-            for wf_src, wf_dst in zip(parallel_initial_src_paths[int(pl * parallel_max_paths):int((pl + 1) * parallel_max_paths)], parallel_initial_dst_paths[int(pl * parallel_max_paths):int((pl + 1) * parallel_max_paths)]):
-                shutil.copy(wf_src, wf_dst)
-            
-            for wf_src, wf_dst in zip(parallel_final_src_paths[int(pl * parallel_max_paths):int((pl + 1) * parallel_max_paths)], parallel_final_dst_paths[int(pl * parallel_max_paths):int((pl + 1) * parallel_max_paths)]):
-                shutil.copy(wf_src, wf_dst)
+        return False
+
+
+def discardJobOutput(currDir: str):
+    """Helper function to empty the .f06 output of a calculation that was stopped, which is then read as not converged
+    
+    Args:
+        currDir (str): directory of the calculation
+    """
+    for filename in os.listdir(currDir):
+        if filename.endswith(".f05"):
+            open(currDir + "/" + filename[:-4] + ".f06", "w").close()
+
+
+def waitJob(process: subprocess.Popen, timeout: float | None = None) -> int:
+    """Helper function to wait for a MCDFGME process the same way as Popen.wait, while following the peak resident memory of the process.
+    The peak memory is read from /proc every job_memory_interval seconds until the process finishes
+    and is given to the memory governor for the calculation of the calling worker.
+    
+    Args:
+        process (subprocess.Popen): process of the calculation
+        timeout (float | None, optional): time in seconds to wait for the process. Defaults to None, waiting until it finishes.
+    
+    Raises:
+        subprocess.TimeoutExpired: if the process is still running after the timeout
+    
+    Returns:
+        int: return code of the process
+    """
+    end = None if timeout is None else time.time() + timeout
+    
+    while True:
+        # The high water mark of the process is only kept while it is running, so it is read every job_memory_interval seconds
+        memory_governor.sample(process.pid)
         
-            
-            # EXECUTE PARALLEL JOB FOR THIS BATCH
-            subprocess.check_output(['parallel -j' + number_of_threads + ' --bar --files ' + "'cd {//} && {/} && cd -'" + ' ::: ' + ' '.join(parallel_paths[int(pl * parallel_max_paths):int((pl + 1) * parallel_max_paths)]) + ' >/dev/null'], shell=True) # type: ignore
-            
-            
-            # ONLY LOG FULL BATCHES AS THIS IS WHAT WILL BE WRITTEN TO FILE
-            # IF WE STOP IN THE MIDDLE THEN WE WILL HAVE TO RESTART FROM THE BATCH, NOT WHERE IT STOPPED
-            if not batch:
-                # LOG THE CALCULATED STATES IN THIS BATCH
-                if log_file != '' and transition_list != [] and log_line_header != '':
-                    with open(log_file, "a") as log:
-                        if pl == 0:
-                            log.write(log_line_header)
-                        
-                        log.write(', '.join([str(qn) for qn in transition_list[int((pl + 1) * parallel_max_paths) - 1].qnsi()]) + " => " + ', '.join([str(qn) for qn in transition_list[int((pl + 1) * parallel_max_paths) - 1].qnsf()]) + " //" + str(int((pl + 1) * parallel_max_paths) - 1) + "\n")
-            
-            
-            # REMOVE THE .f09 WAVEFUNCTION FILES IN THIS BATCH
-            for wfi_dst, wff_dst in zip(parallel_initial_dst_paths[int(pl * parallel_max_paths):int((pl + 1) * parallel_max_paths)], parallel_final_dst_paths[int(pl * parallel_max_paths):int((pl + 1) * parallel_max_paths)]):
-                os.remove(wfi_dst)
-                os.remove(wff_dst)
-            
-            for path in parallel_paths[int(pl * parallel_max_paths):int((pl + 1) * parallel_max_paths)]:
-                directory = '/'.join(path.split("/")[:-1]) + "/"
-                for filename in os.listdir(directory):
-                    if ".f05" not in filename and ".f06" not in filename:
-                        if os.path.isfile(directory + filename):
-                            os.remove(directory + filename)
-                        else:
-                            shutil.rmtree(directory + filename)
-            
+        remaining = None if end is None else end - time.time()
         
-        # COPY .f09 WAVEFUNCTION FILES FOR THE LAST BATCH
-        for wf_src, wf_dst in zip(parallel_initial_src_paths[int((pl + 1) * parallel_max_paths):], parallel_initial_dst_paths[int((pl + 1) * parallel_max_paths):]):
-            shutil.copy(wf_src, wf_dst)
+        try:
+            return process.wait(job_memory_interval if remaining is None else max(min(remaining, job_memory_interval), 0.0))
+        except subprocess.TimeoutExpired:
+            if remaining is not None and remaining <= job_memory_interval:
+                raise subprocess.TimeoutExpired(process.args, timeout) # type: ignore
+
+
+def runJob(exe_path: str, timeout: float | None = None, monitor: bool = False) -> int:
+    """Helper function to run a single MCDFGME calculation directly in its directory, without a shell.
+    The calculation runs in its own process group, so if it is stopped all of its processes are killed.
+    The .f06 output of a calculation that was stopped is emptied, which is then read as not converged.
+    
+    Args:
+        exe_path (str): path to the executable of the calculation, where the directory holds the mdfgme.dat and .f05 input files
+        timeout (float | None, optional): time in seconds after which the calculation is killed. Defaults to None, without timeout.
+        monitor (bool, optional): flag to follow the SCF in the .f06 output and stop the calculation if it diverges. Defaults to False.
+    
+    Returns:
+        int: return code of the MCDFGME process, job_timeout_code if it timed out or scf_diverged_code if its SCF was diverging
+    """
+    currDir = os.path.dirname(exe_path)
+    
+    # Prefer the executable placed alongside this script and fall back to the one in the PATH
+    exe_command = rootDir + "/" + exe_file if os.path.isfile(rootDir + "/" + exe_file) else exe_file
+    
+    scf_monitor: ScfMonitor | None = None
+    if monitor and scf_monitor_iterations > 0:
+        scf_monitor = ScfMonitor(currDir + "/" + [filename for filename in os.listdir(currDir) if filename.endswith(".f05")][0][:-4] + ".f06")
+    
+    process = subprocess.Popen([exe_command], cwd = currDir, stdout = subprocess.DEVNULL, stderr = subprocess.DEVNULL, start_new_session = True)
+    memory_governor.started(process.pid)
+    
+    with job_processes_lock:
+        job_processes[process.pid] = threading.get_ident()
+    
+    start = time.time()
+    return_code = job_timeout_code
+    
+    while True:
+        remaining = None if timeout is None else timeout - (time.time() - start)
         
-        for wf_src, wf_dst in zip(parallel_final_src_paths[int((pl + 1) * parallel_max_paths):], parallel_final_dst_paths[int((pl + 1) * parallel_max_paths):]):
-            shutil.copy(wf_src, wf_dst)
+        if remaining is not None and remaining <= 0:
+            break
         
+        try:
+            # Without monitoring we only wake up when the calculation finishes or times out
+            return_code = waitJob(process, timeout = remaining if scf_monitor is None else min(scf_monitor_interval, remaining or scf_monitor_interval))
+            
+            with job_processes_lock:
+                job_processes.pop(process.pid, None)
+            
+            # A calculation killed because the script is stopping did not fail, it is calculated again when the calculation is resumed
+            if return_code != 0 and job_kill.is_set():
+                discardJobOutput(currDir)
+                return job_cancelled_code
+            
+            return return_code
+        except subprocess.TimeoutExpired:
+            if scf_monitor is not None and scf_monitor.update():
+                return_code = scf_diverged_code
+                break
+    
+    try:
+        os.killpg(process.pid, signal.SIGKILL)
+    except ProcessLookupError:
+        pass
+    
+    process.wait()
+    
+    with job_processes_lock:
+        job_processes.pop(process.pid, None)
+    
+    discardJobOutput(currDir)
+    
+    return return_code
+
+
+def killRunningJobs():
+    """Helper function to kill the process groups of all the MCDFGME calculations that are running.
+    It also runs when the script exits, so no calculation is left running without the script.
+    """
+    with job_processes_lock:
+        pids = list(job_processes)
+    
+    for pid in pids:
+        try:
+            os.killpg(pid, signal.SIGKILL)
+        except ProcessLookupError:
+            pass
+
+
+def killThreadJobs(threads: List[int]):
+    """Helper function to kill the process groups of the MCDFGME calculations started by some threads
+    
+    Args:
+        threads (List[int]): identifiers of the threads whose calculations are killed
+    """
+    with job_processes_lock:
+        pids = [pid for pid, thread in job_processes.items() if thread in threads]
+    
+    for pid in pids:
+        try:
+            os.killpg(pid, signal.SIGKILL)
+        except ProcessLookupError:
+            pass
+
+
+# Process ids of the MCDFGME calculations that are running, which are also their process groups, with the thread that started each one
+job_processes: Dict[int, int] = {}
+job_processes_lock = threading.Lock()
+
+atexit.register(killRunningJobs)
+
+# Set when the script is stopping, after which no more calculations are started. The kill event is set when the running calculations are also killed
+job_interrupt = threading.Event()
+job_kill = threading.Event()
+
+
+class CalculationInterrupted(Exception):
+    """Exception raised by executeJobs when the script is stopping, once the calculations that were running finished and the results are checkpointed
+    """
+    pass
+
+
+def interruptCalculation(signum: int, frame):
+    """Signal handler to stop the calculation gracefully on SIGINT or SIGTERM.
+    On the first signal no more calculations are started and the running ones are left to finish. Each executeJobs then checkpoints
+    the results already harvested and raises CalculationInterrupted, so the calculation can be resumed as a partial calculation.
+    On a second signal the running calculations are killed, and are calculated again when the calculation is resumed.
+    When no calculations are being executed the signal stops the script as before.
+    
+    Args:
+        signum (int): number of the signal
+        frame: current stack frame
+    """
+    if job_interrupt.is_set():
+        print(clearLine + "Killing the running calculations...")
+        job_kill.set()
+        killRunningJobs()
+    elif active_executions > 0:
+        print(clearLine + "Stopping: no more calculations are started and the running ones are left to finish. Send the signal again to kill them.")
+        job_interrupt.set()
+    elif signum == signal.SIGINT:
+        raise KeyboardInterrupt
+    else:
+        raise SystemExit(128 + signum)
+
+
+def reportInterruption(exc_type, exc, tb):
+    """Exception hook to stop the script without a traceback when the calculation was interrupted
+    """
+    if issubclass(exc_type, CalculationInterrupted):
+        print(clearLine + "Calculation stopped. The finished calculations are kept, continue it with a partial calculation.")
+    else:
+        sys.__excepthook__(exc_type, exc, tb)
+
+
+def checkpointCalculation():
+    """Function to leave the files of a calculation that is stopping in a consistent state, so it is resumed without calculating again what is done.
+    The journals of the finished transitions are synced to disk and the pending cleanups are finished.
+    The cycle and transition logs are already written as each calculation finishes.
+    """
+    for journal in list(transition_journals):
+        journal.sync()
+    
+    background_cleaner.wait()
+
+
+# Number of executeJobs calls running, to know if a signal should stop the calculations gracefully
+active_executions = 0
+active_executions_lock = threading.Lock()
+
+
+def readJobFiles(currDir: str) -> Dict[str, bytes]:
+    """Helper function to read the files of a calculation directory, to ship them between the job server and the remote workers.
+    Only the files directly in the directory are read, the sub-directories hold scratch files or other calculations.
+    
+    Args:
+        currDir (str): directory of the calculation
+    
+    Returns:
+        Dict[str, bytes]: contents of each file in the directory
+    """
+    files: Dict[str, bytes] = {}
+    
+    for filename in os.listdir(currDir):
+        if os.path.isfile(currDir + "/" + filename):
+            with open(currDir + "/" + filename, "rb") as job_file:
+                files[filename] = job_file.read()
+    
+    return files
+
+
+def replaceJobFile(path: str):
+    """Helper function to remove a file of a calculation before its new content is written.
+    This way a wavefunction staged as a link is replaced instead of writing through to the file it links to.
+    
+    Args:
+        path (str): path of the file that is going to be written
+    """
+    if os.path.lexists(path):
+        os.remove(path)
+
+
+def stageWavefunction(src: str, dst: str) -> str:
+    """Helper function to stage a .f09 wavefunction file for a calculation without copying its data when possible.
+    The ways in wavefunction_staging are tried in order until one works. The hardlinks and symlinks are only used when the calculations
+    run in a scratch directory, as MCDFGME writes to the wavefunction files it reads and this would change the source file.
+    
+    Args:
+        src (str): path to the wavefunction file
+        dst (str): path where the wavefunction file is staged
+    
+    Returns:
+        str: way the wavefunction file was staged
+    """
+    replaceJobFile(dst)
+    
+    for mode in wavefunction_staging:
+        try:
+            if mode == 'reflink':
+                import fcntl
+                
+                # Clone the data of the file where the filesystem supports it (btrfs, xfs), which is copied only when written
+                with open(src, "rb") as src_file, open(dst, "wb") as dst_file:
+                    fcntl.ioctl(dst_file.fileno(), 0x40049409, src_file.fileno())
+            elif mode == 'hardlink' and job_scratch_dir != '':
+                os.link(src, dst)
+            elif mode == 'symlink' and job_scratch_dir != '':
+                os.symlink(os.path.abspath(src), dst)
+            elif mode == 'copy':
+                shutil.copy(src, dst)
+            else:
+                continue
+        except (OSError, ImportError):
+            replaceJobFile(dst)
+            continue
+        
+        return mode
+    
+    # Copy the file if none of the other ways worked
+    shutil.copy(src, dst)
+    
+    return 'copy'
+
+
+def checkJobFilenames(files: Dict[str, bytes]):
+    """Helper function to check that the files received from the other side of a job server connection stay in the calculation directory
+    
+    Args:
+        files (Dict[str, bytes]): files of the calculation received from the job server or a remote worker
+    
+    Raises:
+        ValueError: if a filename is not a plain filename, such as a path or ..
+    """
+    for filename in files:
+        if not isinstance(filename, str) or os.path.basename(filename) != filename or filename in ('', '.', '..') or '..' in filename:
+            raise ValueError("Unsafe filename received for a calculation: " + repr(filename))
+
+
+def runRemoteJob(files: Dict[str, bytes], timeout: float | None = None, monitor: bool = False) -> Tuple[int, float, Dict[str, bytes]]:
+    """Function to run a calculation received from the job server in a local scratch directory
+    
+    Args:
+        files (Dict[str, bytes]): input files of the calculation, with the .f05, mdfgme.dat and any .f09 wavefunctions it needs
+        timeout (float | None, optional): time in seconds after which the calculation is killed. Defaults to None, without timeout.
+        monitor (bool, optional): flag to follow the SCF in the .f06 output and stop the calculation if it diverges. Defaults to False.
+    
+    Returns:
+        Tuple[int, float, Dict[str, bytes]]: 3 return arguments for:
+        
+        return code of the MCDFGME process.\n
+        runtime of the calculation in seconds.\n
+        output files that were created or changed by the calculation.\n
+    """
+    checkJobFilenames(files)
+    
+    currDir = tempfile.mkdtemp(prefix = "mcdfgme_", dir = job_scratch_dir if job_scratch_dir != '' else None)
+    
+    try:
+        for filename, content in files.items():
+            with open(currDir + "/" + filename, "wb") as job_file:
+                job_file.write(content)
+        
+        os.mkdir(currDir + "/tmp")
+        
+        start = time.time()
+        return_code = runJob(currDir + "/" + exe_file, timeout, monitor)
+        runtime = time.time() - start
+        
+        outputs = {filename: content for filename, content in readJobFiles(currDir).items() \
+                   if filename.endswith(job_output_extensions) and files.get(filename) != content}
+    finally:
+        shutil.rmtree(currDir, ignore_errors = True)
+    
+    return return_code, runtime, outputs
+
+
+def runScratchJob(exe_path: str, timeout: float | None = None, monitor: bool = False) -> int:
+    """Function to run a calculation in a scratch directory inside job_scratch_dir instead of its own directory.
+    The input files are copied to the scratch directory and only the output files that were created or changed are copied back.
+    
+    Args:
+        exe_path (str): path to the executable of the calculation, where the directory holds the mdfgme.dat and .f05 input files
+        timeout (float | None, optional): time in seconds after which the calculation is killed. Defaults to None, without timeout.
+        monitor (bool, optional): flag to follow the SCF in the .f06 output and stop the calculation if it diverges. Defaults to False.
+    
+    Returns:
+        int: return code of the calculation, as returned by runJob
+    """
+    currDir = os.path.dirname(exe_path)
+    scratchDir = tempfile.mkdtemp(prefix = "mcdfgme_", dir = job_scratch_dir)
+    
+    try:
+        # Status of the input files, to only copy back the ones that were changed
+        status: Dict[str, Tuple[int, int]] = {}
+        
+        for filename in os.listdir(currDir):
+            if os.path.isfile(currDir + "/" + filename):
+                shutil.copy(currDir + "/" + filename, scratchDir + "/" + filename)
+                
+                file_status = os.stat(scratchDir + "/" + filename)
+                status[filename] = (file_status.st_mtime_ns, file_status.st_size)
+        
+        os.mkdir(scratchDir + "/tmp")
+        
+        return_code = runJob(scratchDir + "/" + exe_file, timeout, monitor)
+        
+        for filename in os.listdir(scratchDir):
+            if filename.endswith(job_output_extensions) and os.path.isfile(scratchDir + "/" + filename):
+                file_status = os.stat(scratchDir + "/" + filename)
+                
+                if status.get(filename) != (file_status.st_mtime_ns, file_status.st_size):
+                    replaceJobFile(currDir + "/" + filename)
+                    shutil.copy(scratchDir + "/" + filename, currDir + "/" + filename)
+    finally:
+        shutil.rmtree(scratchDir, ignore_errors = True)
+    
+    return return_code
+
+
+def parseJobServerAddress(address: str) -> Tuple[str, int] | str:
+    """Helper function to convert the job server address into the format used by the multiprocessing connections
+    
+    Args:
+        address (str): address as host:port or a port alone for a TCP socket on localhost, or the path of a unix socket
+    
+    Returns:
+        Tuple[str, int] | str: (host, port) tuple for a TCP socket or the path of the unix socket
+    """
+    if address.isdigit():
+        return 'localhost', int(address)
+    
+    host, _, port = address.rpartition(":")
+    
+    if port.isdigit() and (host != '' or address.startswith(":")):
+        return host or 'localhost', int(port)
+    
+    return address
+
+
+def checkJobServerAuthkey():
+    """Helper function to stop the script when the job server or a remote worker would start without an explicit authentication key
+    """
+    if job_server_authkey == b'':
+        print("Error: the job server and the remote workers need an authentication key, set it in the MCDF_JOB_AUTHKEY environment variable.")
+        print("Stopping...")
+        sys.exit(1)
+
+
+class ResultCache:
+    def __init__(self, cache_dir: str, max_size: float):
+        """Store of the outputs of finished calculations, addressed by the content of their inputs.
+        The key of a calculation is a hash of the MCDFGME executable, the rendered .f05 input and every .f09 wavefunction it reads,
+        so identical calculations in a re-run or in another project with the same settings are copied instead of executed.
+        When the store grows past its maximum size the least recently used results are evicted.
+        
+        Args:
+            cache_dir (str): directory where the results are stored
+            max_size (float): maximum size of the stored results in bytes
+        """
+        self.cache_dir = cache_dir
+        self.max_size = max_size
+        self.exe_hash = ''
+        # Last use time and size of each stored result
+        self.entries: Dict[str, Tuple[float, int]] = {}
+        self.size = 0
+        self.loaded = False
+        self.lock = threading.Lock()
+    
+    @staticmethod
+    def inputStem(currDir: str) -> str:
+        """Helper function for the filename of the .f05 input in a calculation directory
+        
+        Args:
+            currDir (str): directory of the calculation
+        
+        Returns:
+            str: filename of the input without the extension
+        """
+        return [filename for filename in os.listdir(currDir) if filename.endswith(".f05")][0][:-4]
+    
+    def entryDir(self, key: str) -> str:
+        return self.cache_dir + "/" + key[:2] + "/" + key
+    
+    def load(self):
+        """Helper function to index the results already in the store. The lock must be held by the caller.
+        """
+        self.loaded = True
+        
+        if not os.path.isdir(self.cache_dir):
+            os.makedirs(self.cache_dir)
+        
+        for prefix in os.listdir(self.cache_dir):
+            # The results that were being stored or evicted when a previous run stopped are not part of the store
+            if len(prefix) != 2 or not os.path.isdir(self.cache_dir + "/" + prefix):
+                leftover = self.cache_dir + "/" + prefix
+                
+                if (prefix.startswith((".evicted_", ".removed_")) or re.fullmatch(r"[0-9a-f]{64}_\w+", prefix)) and os.path.isdir(leftover) \
+                   and time.time() - os.path.getmtime(leftover) > job_cache_stale_time:
+                    background_cleaner.submit(shutil.rmtree, leftover, True)
+                
+                continue
+            
+            for key in os.listdir(self.cache_dir + "/" + prefix):
+                entry = self.cache_dir + "/" + prefix + "/" + key
+                size = sum(os.path.getsize(entry + "/" + filename) for filename in os.listdir(entry))
+                
+                self.entries[key] = (os.path.getmtime(entry), size)
+                self.size += size
+    
+    def key(self, exe_path: str) -> str:
+        """Function to build the key of a calculation from its inputs
+        
+        Args:
+            exe_path (str): path to the executable of the calculation, where the directory holds the mdfgme.dat and .f05 input files
+        
+        Returns:
+            str: hexadecimal hash of the calculation inputs
+        """
+        currDir = os.path.dirname(exe_path)
+        
+        with self.lock:
+            if self.exe_hash == '':
+                exe_command = rootDir + "/" + exe_file if os.path.isfile(rootDir + "/" + exe_file) else shutil.which(exe_file) or exe_file
+                
+                with open(exe_command, "rb") as exe:
+                    self.exe_hash = hashlib.sha256(exe.read()).hexdigest()
+        
+        digest = hashlib.sha256(self.exe_hash.encode())
+        
+        with open(currDir + "/" + self.inputStem(currDir) + ".f05", "rb") as jobInput:
+            inputContent = jobInput.read()
+        
+        digest.update(inputContent)
+        
+        # Wavefunctions read by the calculation, in the order they appear in the input
+        for wf_file in re.findall(rb"fil_read=(\S+)", inputContent):
+            with open(currDir + "/" + wf_file.decode() + ".f09", "rb") as wf:
+                digest.update(hashlib.sha256(wf.read()).digest())
+        
+        return digest.hexdigest()
+    
+    def restore(self, key: str, exe_path: str) -> bool:
+        """Function to copy a stored result into the calculation directory
+        
+        Args:
+            key (str): key of the calculation
+            exe_path (str): path to the executable of the calculation
+        
+        Returns:
+            bool: True if the result was found and copied
+        """
+        currDir = os.path.dirname(exe_path)
+        
+        with self.lock:
+            if not self.loaded:
+                self.load()
+            
+            if key not in self.entries:
+                return False
+            
+            entry = self.entryDir(key)
+            
+            os.utime(entry)
+            self.entries[key] = (time.time(), self.entries[key][1])
+        
+        # The files are copied without the lock, each one to a temporary name that replaces the output once it is complete
+        # If the result is evicted while it is copied the calculation is run instead
+        stem = self.inputStem(currDir)
+        restoring = ''
+        try:
+            for filename in os.listdir(entry):
+                # The outputs named after the input are stored with a * in place of the name
+                output = currDir + "/" + filename.replace("*", stem, 1)
+                restoring = output + ".restoring"
+                
+                shutil.copy(entry + "/" + filename, restoring)
+                os.replace(restoring, output)
+        except OSError:
+            if restoring != '' and os.path.isfile(restoring):
+                os.remove(restoring)
+            
+            return False
+        
+        return True
+    
+    def store(self, key: str, exe_path: str, status: Dict[str, Tuple[int, int]]):
+        """Function to store the outputs of a finished calculation
+        
+        Args:
+            key (str): key of the calculation
+            exe_path (str): path to the executable of the calculation
+            status (Dict[str, Tuple[int, int]]): modification time and size of the files in the directory before the calculation,
+            to only store the files created or changed by the calculation
+        """
+        currDir = os.path.dirname(exe_path)
+        stem = self.inputStem(currDir)
+        
+        outputs: List[str] = []
+        for filename in os.listdir(currDir):
+            if filename.endswith(job_output_extensions) and os.path.isfile(currDir + "/" + filename):
+                file_status = os.stat(currDir + "/" + filename)
+                
+                if status.get(filename) != (file_status.st_mtime_ns, file_status.st_size):
+                    outputs.append(filename)
+        
+        with self.lock:
+            if not self.loaded:
+                self.load()
+            
+            if key in self.entries:
+                return
+        
+        # The outputs are copied without the lock into a staging directory, which is renamed into the store once it is complete
+        entry = self.entryDir(key)
+        staging = tempfile.mkdtemp(prefix = key + "_", dir = self.cache_dir)
+        
+        for filename in outputs:
+            shutil.copy(currDir + "/" + filename, staging + "/" + (("*" + filename[len(stem):]) if filename.startswith(stem + ".") else filename))
+        
+        size = sum(os.path.getsize(staging + "/" + filename) for filename in os.listdir(staging))
+        
+        # Directories to remove once the lock is released
+        removed: List[str] = []
+        
+        with self.lock:
+            if key in self.entries:
+                # The same result was stored by another calculation in the meantime
+                removed.append(staging)
+            else:
+                os.makedirs(os.path.dirname(entry), exist_ok = True)
+                os.rename(staging, entry)
+                
+                self.entries[key] = (time.time(), size)
+                self.size += size
+                
+                # Evict the least recently used results down to 90% of the maximum size
+                # They are renamed out of the store, so the same results can be stored again while they are being removed
+                if self.size > self.max_size:
+                    evicted = tempfile.mkdtemp(prefix = ".evicted_", dir = self.cache_dir)
+                    removed.append(evicted)
+                    
+                    for old_key, (_, old_size) in sorted(self.entries.items(), key = lambda item: item[1][0]):
+                        if self.size <= 0.9 * self.max_size:
+                            break
+                        
+                        if os.path.isdir(self.entryDir(old_key)):
+                            os.rename(self.entryDir(old_key), evicted + "/" + old_key)
+                        
+                        del self.entries[old_key]
+                        self.size -= old_size
+        
+        for directory in removed:
+            shutil.rmtree(directory, ignore_errors = True)
+
+
+# Store of the results of the calculations, used when job_cache_dir is set
+job_cache = ResultCache(job_cache_dir, job_cache_size)
+
+
+def runCachedJob(exe_path: str, run: Callable[[], Tuple[int, float]]) -> Tuple[int, float | None]:
+    """Function to run a calculation through the result store, copying the stored outputs instead of running it if they exist
+    
+    Args:
+        exe_path (str): path to the executable of the calculation
+        run (Callable[[], Tuple[int, float]]): function that runs the calculation and returns its return code and runtime
+    
+    Returns:
+        Tuple[int, float | None]: return code and runtime of the calculation. The runtime is None if the outputs were copied from the store.
+    """
+    if job_cache_dir == '':
+        return run()
+    
+    try:
+        key = job_cache.key(exe_path)
+    except (OSError, IndexError):
+        # Without all of its inputs the calculation is not stored
+        return run()
+    
+    if job_cache.restore(key, exe_path):
+        return 0, None
+    
+    currDir = os.path.dirname(exe_path)
+    status = {filename: (os.stat(currDir + "/" + filename).st_mtime_ns, os.stat(currDir + "/" + filename).st_size) \
+              for filename in os.listdir(currDir) if os.path.isfile(currDir + "/" + filename)}
+    
+    return_code, runtime = run()
+    
+    if return_code == 0:
+        job_cache.store(key, exe_path, status)
+    
+    return return_code, runtime
+
+
+def parseCpuList(cpulist: str) -> List[int]:
+    """Helper function to parse a list of cpus in the format of /sys/devices/system, such as 0-3,8-11
+    
+    Args:
+        cpulist (str): list of cpus
+    
+    Returns:
+        List[int]: cpus in the list
+    """
+    cpus: List[int] = []
+    
+    for cpu_range in cpulist.strip().split(","):
+        if cpu_range == '':
+            continue
+        
+        if "-" in cpu_range:
+            first, last = cpu_range.split("-")
+            cpus.extend(range(int(first), int(last) + 1))
+        else:
+            cpus.append(int(cpu_range))
+    
+    return cpus
+
+
+def workerPlacements() -> List[List[int]]:
+    """Helper function to find the cpus where each local worker is pinned, according to job_cpu_affinity.
+    The NUMA nodes are read from /sys/devices/system/node, and the workers are spread over the nodes in turn.
+    When pinning to cores, the first thread of each physical core is used before their SMT siblings.
+    
+    Returns:
+        List[List[int]]: cpus of each worker placement, which are used in turn by the workers, or an empty list to not pin the workers
+    """
+    if job_cpu_affinity == '' or not hasattr(os, "sched_setaffinity"):
+        return []
+    
+    available = os.sched_getaffinity(0)
+    
+    nodes: List[List[int]] = []
+    for node in sorted(os.listdir(node_sys_dir) if os.path.isdir(node_sys_dir) else []):
+        if re.fullmatch(r"node[0-9]+", node) and os.path.isfile(node_sys_dir + "/" + node + "/cpulist"):
+            with open(node_sys_dir + "/" + node + "/cpulist", "r") as cpulist:
+                cpus = [cpu for cpu in parseCpuList(cpulist.read()) if cpu in available]
+            
+            if len(cpus) > 0:
+                nodes.append(cpus)
+    
+    if len(nodes) == 0:
+        nodes = [sorted(available)]
+    
+    if job_cpu_affinity == 'node' or (job_cpu_affinity == 'auto' and len(nodes) > 1):
+        return nodes
+    elif job_cpu_affinity != 'core':
+        return []
+    
+    # Position of each cpu among the SMT siblings of its core
+    def sibling(cpu: int) -> int:
+        siblings_file = "/sys/devices/system/cpu/cpu" + str(cpu) + "/topology/thread_siblings_list"
+        if not os.path.isfile(siblings_file):
+            return 0
+        
+        with open(siblings_file, "r") as siblings:
+            return parseCpuList(siblings.read()).index(cpu)
+    
+    placements: List[Tuple[int, int, int]] = []
+    for node, cpus in enumerate(nodes):
+        for position, cpu in enumerate(sorted(cpus, key = lambda cpu: (sibling(cpu), cpu))):
+            placements.append((position, node, cpu))
+    
+    return [[cpu] for _, _, cpu in sorted(placements)]
+
+
+def pinWorker(slot: int):
+    """Helper function to pin the calling worker thread to the cpus of its placement.
+    The MCDFGME processes started by this thread inherit its affinity, and the memory it touches is allocated in its NUMA node,
+    which includes the files it copies to a scratch directory in memory.
+    
+    Args:
+        slot (int): index of the worker
+    """
+    global worker_placements
+    
+    with worker_placements_lock:
+        if worker_placements is None:
+            worker_placements = workerPlacements()
+    
+    if len(worker_placements) > 0:
+        try:
+            os.sched_setaffinity(0, worker_placements[slot % len(worker_placements)])
+        except OSError as error:
+            print(clearLine + "Warning: could not pin worker " + str(slot) + ": " + str(error))
+
+
+# Placements of the workers, found when the first worker starts
+worker_placements: List[List[int]] | None = None
+worker_placements_lock = threading.Lock()
+
+
+class MemoryGovernor:
+    def __init__(self):
+        """Admission control of the local calculations by the memory of the node.
+        A calculation is only started while the available memory, less the memory the running calculations are still expected to take,
+        leaves job_memory_reserve of the total memory free. Each running calculation is expected to take the part of its predicted peak
+        resident memory that it does not hold yet. At least one calculation is always running, even if it is larger than the memory of the node.
+        """
+        # Predicted peak memory and process id of the calculation of each worker thread
+        self.running: Dict[int, Tuple[float, int | None]] = {}
+        self.admission = threading.Lock()
+        self.condition = threading.Condition()
+        self.local = threading.local()
+    
+    @staticmethod
+    def memoryInfo() -> Tuple[float, float] | None:
+        """Helper function to read the total and the available memory of the node
+        
+        Returns:
+            Tuple[float, float] | None: total and available memory in bytes, or None if they can not be read
+        """
+        values: Dict[str, float] = {}
+        
+        try:
+            with open("/proc/meminfo", "r") as meminfo:
+                for line in meminfo:
+                    name, value = line.split(":", 1)
+                    values[name] = float(value.split()[0]) * 1024.0
+        except (OSError, ValueError, IndexError):
+            return None
+        
+        if "MemTotal" not in values or "MemAvailable" not in values:
+            return None
+        
+        return values["MemTotal"], values["MemAvailable"]
+    
+    @staticmethod
+    def residentMemory(pid: int, field: str = "VmRSS") -> float:
+        """Helper function to read the resident memory of a running process
+        
+        Args:
+            pid (int): process id
+            field (str, optional): field of the status of the process, VmRSS for the current resident memory or VmHWM for its peak. Defaults to "VmRSS".
+        
+        Returns:
+            float: resident memory in bytes, 0 if the process is gone
+        """
+        try:
+            with open("/proc/" + str(pid) + "/status", "r") as status:
+                for line in status:
+                    if line.startswith(field + ":"):
+                        return float(line.split()[1]) * 1024.0
+        except (OSError, ValueError, IndexError):
+            pass
+        
+        return 0.0
+    
+    def expected(self) -> float:
+        """Helper function for the memory the running calculations are still expected to take
+        
+        Returns:
+            float: sum of the predicted peak memory of the running calculations that they do not hold yet, in bytes
+        """
+        return sum([max(memory - (self.residentMemory(pid) if pid is not None else 0.0), 0.0) for memory, pid in self.running.values()])
+    
+    def admit(self, memory: float):
+        """Function to wait until a calculation of the calling worker can be started without putting the node under memory pressure
+        
+        Args:
+            memory (float): predicted peak resident memory of the calculation in bytes
+        """
+        self.local.peak = None
+        
+        # Only one worker at a time waits for the memory, the others wait for their turn
+        with self.admission:
+            with self.condition:
+                while job_memory_reserve > 0 and len(self.running) > 0:
+                    info = self.memoryInfo()
+                    if info is None:
+                        break
+                    
+                    total, available = info
+                    if available - self.expected() - memory >= job_memory_reserve * total:
+                        break
+                    
+                    self.condition.wait(job_memory_interval)
+                
+                self.running[threading.get_ident()] = (memory, None)
+    
+    def started(self, pid: int):
+        """Function to register the process of the calculation of the calling worker, to follow its resident memory
+        
+        Args:
+            pid (int): process id of the calculation
+        """
+        with self.condition:
+            if threading.get_ident() in self.running:
+                self.running[threading.get_ident()] = (self.running[threading.get_ident()][0], pid)
+    
+    def sample(self, pid: int):
+        """Function to follow the peak resident memory of the calculation of the calling worker while its process runs
+        
+        Args:
+            pid (int): process id of the calculation
+        """
+        peak = self.residentMemory(pid, "VmHWM")
+        
+        if peak > 0 and peak > (getattr(self.local, "peak", None) or 0.0):
+            self.local.peak = peak
+    
+    def release(self) -> float | None:
+        """Function to release the memory of the calculation of the calling worker once it finished
+        
+        Returns:
+            float | None: peak resident memory of the calculation in bytes, or None if it could not be read
+        """
+        with self.condition:
+            self.running.pop(threading.get_ident(), None)
+            self.condition.notify_all()
+        
+        return getattr(self.local, "peak", None)
+
+
+# Admission control of the local calculations shared by all the workers
+memory_governor = MemoryGovernor()
+
+
+class FairShareQueue:
+    def __init__(self):
+        """Queue of the calculations of several clients, with the same interface as the queue.PriorityQueue of the job pool.
+        The calculations are put with a (client, priority) tuple as their first element. Each get takes the calculation with the lowest priority
+        from the client that took the fewest calculations, so each client has the same share of the workers while it has calculations queued.
+        A client that was idle starts from the fewest calculations taken by the busy clients, so it can not take the workers for the time it was idle.
+        """
+        self.queues: Dict[int, list] = {}
+        self.taken: Dict[int, float] = {}
+        self.condition = threading.Condition()
+    
+    def put(self, item: tuple):
+        """Function to queue a calculation of a client
+        
+        Args:
+            item (tuple): calculation with the (client, priority) tuple as its first element and a unique sequence number as its second
+        """
+        with self.condition:
+            client, priority = item[0]
+            
+            if len(self.queues.get(client, [])) == 0:
+                busy = [self.taken[other] for other, pending in self.queues.items() if len(pending) > 0]
+                self.taken[client] = max(self.taken.get(client, 0.0), min(busy) if len(busy) > 0 else 0.0)
+                self.queues[client] = []
+            
+            heapq.heappush(self.queues[client], (priority, item[1], item))
+            self.condition.notify()
+    
+    def get(self) -> tuple:
+        """Function to take the next calculation, waiting for one to be queued
+        
+        Returns:
+            tuple: calculation as it was queued
+        """
+        with self.condition:
+            self.condition.wait_for(lambda: any([len(pending) > 0 for pending in self.queues.values()]))
+            
+            client = min([client for client, pending in self.queues.items() if len(pending) > 0], key = lambda client: self.taken[client])
+            self.taken[client] += 1.0
+            
+            return heapq.heappop(self.queues[client])[2]
+    
+    def cancel(self, client: int) -> int:
+        """Function to remove the queued calculations of a client
+        
+        Args:
+            client (int): client whose calculations are removed
+        
+        Returns:
+            int: number of calculations removed
+        """
+        with self.condition:
+            pending = self.queues.pop(client, [])
+            self.taken.pop(client, None)
+            
+            return len(pending)
+
+
+class JobPool:
+    def __init__(self):
+        """Pool of worker threads shared by all the MCDFGME calculations that are running at the same time.
+        Every client submits its calculations to the same priority queue, so the cores are filled from all clients
+        and each client only receives its own finished calculations.
+        The pool can also serve its calculations to remote workers, which are used the same way as the local ones.
+        In a campaign the pool of each run sends its calculations to the pool of the campaign scheduler, which runs the calculations of all the runs.
+        """
+        self.pending: queue.PriorityQueue | FairShareQueue = queue.PriorityQueue()
+        self.workers: List[threading.Thread] = []
+        self.remote_workers = 0
+        self.listener: Listener | None = None
+        self.campaign: Connection | None = None
+        self.campaign_jobs: Dict[int, Tuple[int, str, queue.Queue]] = {}
+        # Priority of the calculation each local worker is running, which holds the client in a campaign
+        self.running: Dict[int, float | Tuple[int, float]] = {}
+        self.sequence = 0
+        self.submitted = 0
+        self.done = 0
+        self.lock = threading.Lock()
+    
+    def worker(self, slot: int):
+        try:
+            pinWorker(slot)
+        except (OSError, ValueError):
+            print(clearLine + "Warning: could not pin worker " + str(slot) + ":\n" + traceback.format_exc())
+        
+        while True:
+            priority, _, idx, path, finished, timeout, monitor, memory = self.pending.get()
+            
+            # The calculations still queued when the script is stopping are returned without running them
+            if job_interrupt.is_set():
+                finished.put((idx, path, job_cancelled_code, None))
+                continue
+            
+            with self.lock:
+                self.running[threading.get_ident()] = priority
+            
+            def run() -> Tuple[int, float]:
+                memory_governor.admit(job_memory_margin * job_memory_model.predict(*memory) if memory is not None else 0.0)
+                
+                try:
+                    start = time.time()
+                    return_code = runScratchJob(path, timeout, monitor) if job_scratch_dir != '' else runJob(path, timeout, monitor)
+                    runtime = time.time() - start
+                finally:
+                    peak = memory_governor.release()
+                
+                # Learn the peak memory of the calculations that finished normally
+                if return_code == 0 and memory is not None and peak is not None:
+                    job_memory_model.record(*memory, peak)
+                
+                return return_code, runtime
+            
+            # An error must not stop the worker, or the client would wait for this calculation forever
+            try:
+                result = runCachedJob(path, run)
+            except Exception:
+                print(clearLine + "Error: could not run the calculation in " + os.path.dirname(path) + ":\n" + traceback.format_exc())
+                result = (job_failed_code, None)
+            
+            with self.lock:
+                del self.running[threading.get_ident()]
+            
+            finished.put((idx, path, *result))
+    
+    def remoteWorker(self, connection: Connection):
+        """Function to feed the calculations to a remote worker connected to the job server.
+        The input files are sent to the worker and the files it creates are written back into the calculation directory.
+        If the worker disconnects, its current calculation is queued again for the other workers.
+        
+        Args:
+            connection (Connection): connection to the remote worker
+        """
+        while True:
+            job = self.pending.get()
+            _, _, idx, path, finished, timeout, monitor, _ = job
+            
+            if job_interrupt.is_set():
+                finished.put((idx, path, job_cancelled_code, None))
+                continue
+            
+            def run() -> Tuple[int, float]:
+                connection.send((readJobFiles(os.path.dirname(path)), timeout, monitor))
+                return_code, runtime, outputs = connection.recv()
+                
+                checkJobFilenames(outputs)
+                
+                for filename, content in outputs.items():
+                    replaceJobFile(os.path.dirname(path) + "/" + filename)
+                    
+                    with open(os.path.dirname(path) + "/" + filename, "wb") as job_file:
+                        job_file.write(content)
+                
+                return return_code, runtime
+            
+            try:
+                return_code, runtime = runCachedJob(path, run)
+            except (EOFError, OSError):
+                self.pending.put(job)
+                
+                with self.lock:
+                    self.remote_workers -= 1
+                
+                connection.close()
+                return
+            except ValueError as error:
+                # A worker that sends files outside the calculation directory is not trusted with more calculations
+                print(clearLine + "Error: disconnecting a remote worker: " + str(error))
+                finished.put((idx, path, job_failed_code, None))
+                
+                with self.lock:
+                    self.remote_workers -= 1
+                
+                connection.close()
+                return
+            
+            finished.put((idx, path, return_code, runtime))
+    
+    def serve(self, address: str):
+        """Function to start serving the calculations of the pool to remote workers
+        
+        Args:
+            address (str): address where the job server listens, as host:port or the path of a unix socket
+        """
+        checkJobServerAuthkey()
+        
+        self.listener = Listener(parseJobServerAddress(address), authkey = job_server_authkey)
+        
+        def accept():
+            while True:
+                try:
+                    connection = self.listener.accept() # type: ignore
+                except (OSError, EOFError):
+                    continue
+                
+                with self.lock:
+                    self.remote_workers += 1
+                
+                threading.Thread(target = self.remoteWorker, args = (connection,), daemon = True).start()
+        
+        threading.Thread(target = accept, daemon = True).start()
+    
+    def submitCampaign(self, priority: float, idx: int, path: str, finished: queue.Queue, timeout: float | None, monitor: bool, \
+                       memory: Tuple[str, List[float]] | None):
+        """Helper function to send a calculation to the campaign scheduler, called with the lock of the pool held.
+        The finished calculations sent back by the scheduler are put in the queue of their client.
+        
+        Args:
+            priority (float): priority of the calculation among the calculations of this run
+            idx (int): index of the calculation for the client
+            path (str): path to the executable of the calculation
+            finished (queue.Queue): queue of the client where the finished calculation is put
+            timeout (float | None): time in seconds after which the calculation is killed
+            monitor (bool): flag to follow the SCF in the .f06 output and stop the calculation if it diverges
+            memory (Tuple[str, List[float]] | None): kind and features of the calculation, to predict and learn its peak resident memory
+        """
+        if self.campaign is None:
+            self.campaign = Client(parseJobServerAddress(campaign_address), authkey = job_server_authkey)
+            
+            def receive():
+                while True:
+                    try:
+                        sequence, return_code, runtime = self.campaign.recv() # type: ignore
+                    except (EOFError, OSError):
+                        # Without the scheduler none of the calculations of this run can finish, so the run stops as if it was interrupted
+                        print(clearLine + "Error: lost the connection to the campaign scheduler at " + campaign_address)
+                        job_interrupt.set()
+                        
+                        with self.lock:
+                            lost = list(self.campaign_jobs.values())
+                            self.campaign_jobs.clear()
+                        
+                        for client_idx, client_path, client_finished in lost:
+                            client_finished.put((client_idx, client_path, job_cancelled_code, None))
+                        
+                        return
+                    
+                    with self.lock:
+                        client_idx, client_path, client_finished = self.campaign_jobs.pop(sequence)
+                    
+                    client_finished.put((client_idx, client_path, return_code, runtime))
+            
+            threading.Thread(target = receive, daemon = True).start()
+        
+        self.sequence += 1
+        self.submitted += 1
+        
+        self.campaign_jobs[self.sequence] = (idx, path, finished)
+        self.campaign.send((priority, self.sequence, path, timeout, monitor, memory))
+    
+    def serveCampaign(self, address: str):
+        """Function to start running the calculations of the runs of a campaign, which connect to the given address.
+        The calculations of all the runs are shared fairly between the workers of this pool.
+        
+        Args:
+            address (str): address where the campaign scheduler listens, as host:port or the path of a unix socket
+        """
+        self.pending = FairShareQueue()
+        
+        listener = Listener(parseJobServerAddress(address), authkey = job_server_authkey)
+        
+        def client(connection: Connection, client_id: int):
+            finished: queue.Queue = queue.Queue()
+            
+            def send():
+                while True:
+                    result = finished.get()
+                    
+                    if result is None:
+                        return
+                    
+                    sequence, _, return_code, runtime = result
+                    
+                    try:
+                        connection.send((sequence, return_code, runtime))
+                    except (EOFError, OSError):
+                        return
+            
+            threading.Thread(target = send, daemon = True).start()
+            
+            while True:
+                try:
+                    priority, sequence, path, timeout, monitor, memory = connection.recv()
+                except (EOFError, OSError):
+                    break
+                
+                self.submit((client_id, priority), sequence, path, finished, timeout, monitor, memory) # type: ignore
+            
+            connection.close()
+            
+            # Nobody waits for the calculations of a run that stopped, so they are dropped and the workers go to the other runs
+            cancelled = self.pending.cancel(client_id) # type: ignore
+            
+            with self.lock:
+                threads = [thread for thread, priority in self.running.items() if isinstance(priority, tuple) and priority[0] == client_id]
+            
+            killThreadJobs(threads)
+            finished.put(None)
+            
+            if cancelled + len(threads) > 0:
+                print(clearLine + "Cancelled " + str(cancelled + len(threads)) + " calculations of a run that disconnected")
+        
+        def accept():
+            clients = 0
+            
+            while True:
+                try:
+                    connection = listener.accept()
+                except (OSError, EOFError):
+                    continue
+                
+                clients += 1
+                threading.Thread(target = client, args = (connection, clients), daemon = True).start()
+        
+        threading.Thread(target = accept, daemon = True).start()
+    
+    def size(self) -> int:
+        """Helper function for the number of workers that can run calculations at the same time
+        
+        Returns:
+            int: number of local and remote workers
+        """
+        with self.lock:
+            return int(number_of_threads) + self.remote_workers
+    
+    def submit(self, priority: float, idx: int, path: str, finished: queue.Queue, timeout: float | None = None, monitor: bool = False, \
+               memory: Tuple[str, List[float]] | None = None):
+        """Function to queue a calculation in the pool
+        
+        Args:
+            priority (float): priority of the calculation, lower values are calculated first
+            idx (int): index of the calculation for the client
+            path (str): path to the executable of the calculation
+            finished (queue.Queue): queue of the client where the finished calculation is put
+            timeout (float | None, optional): time in seconds after which the calculation is killed. Defaults to None, without timeout.
+            monitor (bool, optional): flag to follow the SCF in the .f06 output and stop the calculation if it diverges. Defaults to False.
+            memory (Tuple[str, List[float]] | None, optional): kind and features of the calculation, to predict and learn its peak resident memory.
+            Defaults to None, when the calculation is only held back while the node is under memory pressure.
+        """
+        with self.lock:
+            if campaign_address != '':
+                self.submitCampaign(priority, idx, path, finished, timeout, monitor, memory)
+                return
+            
+            # Start the workers the first time they are needed
+            while len(self.workers) < int(number_of_threads):
+                self.workers.append(threading.Thread(target = self.worker, args = (len(self.workers),), daemon = True))
+                self.workers[-1].start()
+            
+            # The sequence number keeps the submission order between calculations with the same priority
+            self.sequence += 1
+            self.submitted += 1
+            
+            self.pending.put((priority, self.sequence, idx, path, finished, timeout, monitor, memory))
+    
+    def jobDone(self) -> str:
+        """Helper function to count a finished calculation
+        
+        Returns:
+            str: progress of all the calculations submitted to the pool
+        """
+        with self.lock:
+            self.done += 1
+            
+            return str(self.done) + "/" + str(self.submitted)
+
+
+# Pool of workers shared by all the calculations
+job_pool = JobPool()
+
+
+class BackgroundCleaner:
+    def __init__(self):
+        """Pool of threads that remove the files of finished calculations while the next calculations run.
+        The backlog of pending removals is bounded by cleanup_backlog, so submitting more work waits for the oldest removals.
+        """
+        self.pending: queue.Queue = queue.Queue(maxsize = cleanup_backlog)
+        self.workers: List[threading.Thread] = []
+        self.lock = threading.Lock()
+    
+    def worker(self):
+        while True:
+            function, args = self.pending.get()
+            
+            try:
+                function(*args)
+            except OSError as error:
+                print(clearLine + "Warning: cleanup failed: " + str(error))
+            finally:
+                self.pending.task_done()
+    
+    def submit(self, function: Callable, *args):
+        """Function to run a cleanup function in the background, waiting for a free place in the backlog if it is full
+        
+        Args:
+            function (Callable): cleanup function
+            *args: arguments of the cleanup function
+        """
+        with self.lock:
+            while len(self.workers) < cleanup_threads:
+                self.workers.append(threading.Thread(target = self.worker, daemon = True))
+                self.workers[-1].start()
+        
+        self.pending.put((function, args))
+    
+    def remove(self, path: str):
+        """Function to remove a directory in the background.
+        The directory is first renamed, so a new directory can be created in its place right away.
+        
+        Args:
+            path (str): path of the directory to remove
+        """
+        if not os.path.exists(path):
+            return
+        
+        removed = tempfile.mkdtemp(prefix = ".removed_", dir = os.path.dirname(path))
+        os.rename(path, removed + "/" + os.path.basename(path))
+        
+        self.submit(shutil.rmtree, removed, True)
+    
+    def wait(self):
+        """Function to wait for all the submitted cleanup functions to finish
+        """
+        self.pending.join()
+
+
+# Threads that clean up the finished calculations
+background_cleaner = BackgroundCleaner()
+
+
+def runRemoteWorkers(address: str, threads: int):
+    """Function to run calculations served by a job server in another process or host, until the server closes.
+    Each thread keeps its own connection to the server and runs one calculation at a time.
+    
+    Args:
+        address (str): address of the job server, as host:port or the path of a unix socket
+        threads (int): number of calculations to run at the same time
+    """
+    checkJobServerAuthkey()
+    
+    def work(slot: int):
+        pinWorker(slot)
+        
+        connection = Client(parseJobServerAddress(address), authkey = job_server_authkey)
+        
+        while True:
+            try:
+                files, timeout, monitor = connection.recv()
+            except (EOFError, OSError):
+                break
+            
+            try:
+                result = runRemoteJob(files, timeout, monitor)
+            except ValueError as error:
+                # A server that sends files outside the calculation directory is not trusted with more calculations
+                print("Error: disconnecting from the job server: " + str(error))
+                break
+            
+            connection.send(result)
+        
+        connection.close()
+    
+    workers = [threading.Thread(target = work, args = (slot,)) for slot in range(threads)]
+    
+    for worker in workers:
+        worker.start()
+    
+    print("Running " + str(threads) + " workers for the job server at " + address)
+    
+    for worker in workers:
+        worker.join()
+
+
+def runCampaign(campaign_file: str, threads: int):
+    """Function to calculate a campaign of several elements, such as an isoelectronic or isonuclear series.
+    Each element is a full calculation with automatic configurations, in its own project directory and its own process running this script,
+    with the answers to the prompts given as arguments from its line in the campaign file. The calculations of all the elements run in the workers of this process,
+    which share them fairly between the elements. The output of each element is written to the .log file alongside its directory.
+    Each line of the campaign file holds the atomic number, the nuclear model, the types of states and the type of calculation for one element:
+    the nuclear model is standard for the standard mass, or uniform:<mass> or fermi:<mass> for a given nuclear mass,
+    the types of states are all, 3+s, 3holes, shakeup or excitation, as in the prompt of the configurations,
+    and the type of calculation is All, Simple, Excitation, rates_all, rates or excitation_rates, as in the prompt after the states.
+    Elements whose directory already exists are skipped, so they can be continued with a partial calculation.
+    
+    Args:
+        campaign_file (str): path to the campaign file
+        threads (int): number of calculations to run at the same time for all the elements
+    """
+    global number_of_threads, active_executions, job_server_authkey
+    
+    number_of_threads = str(threads)
+    
+    # The scheduler only talks to the runs started here, so without a given key it uses a random one passed to them
+    if job_server_authkey == b'':
+        job_server_authkey = os.urandom(32).hex().encode()
+    
+    # The signals stop the campaign gracefully, as the calculations of the elements run in this process
+    with active_executions_lock:
+        active_executions += 1
+    
+    campaign_name = os.path.splitext(os.path.basename(campaign_file))[0]
+    address = rootDir + "/." + campaign_name + ".campaign"
+    
+    if os.path.exists(address):
+        os.remove(address)
+    
+    job_pool.serveCampaign(address)
+    
+    processes: List[Tuple[str, subprocess.Popen]] = []
+    
+    with open(campaign_file, "r") as campaign:
+        for line in campaign:
+            values = line.split("#")[0].split()
+            if len(values) == 0:
+                continue
+            
+            if len(values) != 4 or not values[0].isdigit():
+                print("Skipping campaign line, it must hold Z, nuclear model, state types and calculation type: " + line.strip())
+                continue
+            
+            atomic_number_campaign, nuclear_model, state_types, calculation_type = values
+            
+            campaignDir = campaign_name + "_Z" + atomic_number_campaign + ("" if nuclear_model == "standard" else "_" + nuclear_model.replace(":", "_"))
+            
+            if os.path.exists(campaignDir):
+                print("Skipping " + campaignDir + ", the directory already exists")
+                continue
+            
+            # Answers to the prompts of a full calculation, given as arguments of the run
+            settings = {'calculation': "full", 'configurations': "automatic", 'atomic_number': atomic_number_campaign, \
+                        'standard_mass': "y" if nuclear_model == "standard" else "n", 'threads': "", 'job_server': "", \
+                        'directory': campaignDir, 'states': state_types, 'rates': calculation_type}
+            if nuclear_model != "standard":
+                settings['nuclear_model'], _, settings['nuclear_mass'] = nuclear_model.partition(":")
+            
+            with open(campaignDir + ".log", "w") as log:
+                process = subprocess.Popen([sys.executable, os.path.abspath(__file__), "element"] + [setting + "=" + value for setting, value in settings.items()], \
+                                           cwd = rootDir, stdin = subprocess.DEVNULL, stdout = log, stderr = subprocess.STDOUT, \
+                                           env = dict(os.environ, MCDF_CAMPAIGN_ADDRESS = address, MCDF_JOB_AUTHKEY = job_server_authkey.decode()), text = True)
+            
+            processes.append((campaignDir, process))
+            
+            print("Started " + campaignDir)
+    
+    print("Running " + str(threads) + " workers for " + str(len(processes)) + " elements")
+    
+    for campaignDir, process in processes:
+        return_code = process.wait()
+        
+        print(clearLine + campaignDir + (" finished" if return_code == 0 else " stopped with code " + str(return_code) + ", see " + campaignDir + ".log"))
+    
+    job_memory_model.save()
+    
+    os.remove(address)
+
+
+class JobStream:
+    def __init__(self, paths: List[str] | None = None):
+        """Stream of calculations that are added while the first ones are already running.
+        A list of calculations is a stream that is closed from the start.
+        The stream holds at most pipeline_window * 2 calculations that were not yet taken, so adding more waits for the workers.
+        
+        Args:
+            paths (List[str] | None, optional): paths to the executables of the calculations of a closed stream. Defaults to None, for an open stream.
+        """
+        self.paths: List[str] = list(paths) if paths is not None else []
+        self.closed = paths is not None
+        self.cancelled = False
+        self.taken = 0
+        self.condition = threading.Condition()
+    
+    def __len__(self) -> int:
+        return len(self.paths)
+    
+    def append(self, path: str):
+        """Function to add a calculation to the stream
+        
+        Args:
+            path (str): path to the executable of the calculation
+        """
+        with self.condition:
+            while len(self.paths) - self.taken >= 2 * pipeline_window and not self.cancelled:
+                self.condition.wait()
+            
+            self.paths.append(path)
+            self.condition.notify_all()
+    
+    def close(self):
+        """Function to mark that no more calculations will be added to the stream
+        """
+        with self.condition:
+            self.closed = True
+            self.condition.notify_all()
+    
+    def cancel(self):
+        """Function to stop taking calculations from the stream when the script is stopping, so adding more calculations does not wait
+        """
+        with self.condition:
+            self.cancelled = True
+            self.condition.notify_all()
+    
+    def windows(self, size: int):
+        """Generator for the calculations of the stream in windows of a given size, waiting for them to be added.
+        When the stream is closed the last window holds all the remaining calculations.
+        
+        Args:
+            size (int): number of calculations in each window
+        
+        Yields:
+            List[Tuple[int, str]]: index and path of each calculation in the window
+        """
+        while True:
+            with self.condition:
+                self.condition.wait_for(lambda: self.closed or len(self.paths) - self.taken >= size)
+                
+                start = self.taken
+                self.taken = len(self.paths) if self.closed else start + size
+                window = list(enumerate(self.paths[start:self.taken], start))
+                last = self.closed and self.taken == len(self.paths)
+                
+                self.condition.notify_all()
+            
+            if len(window) > 0:
+                yield window
+            
+            if last:
+                return
+
+
+def physicalCores() -> int:
+    """Helper function to count the physical cores available to this process, where the SMT siblings of a core count once
+    
+    Returns:
+        int: number of physical cores, or the number of available cpus if the topology can not be read
+    """
+    cpus = os.sched_getaffinity(0) if hasattr(os, "sched_getaffinity") else set(range(os.cpu_count() or 1))
+    cores = set()
+    
+    for cpu in cpus:
+        siblings_file = "/sys/devices/system/cpu/cpu" + str(cpu) + "/topology/thread_siblings_list"
+        if not os.path.isfile(siblings_file):
+            return len(cpus)
+        
+        with open(siblings_file, "r") as siblings:
+            cores.add(siblings.read().strip())
+    
+    return len(cores)
+
+
+def calibrateThreads(sample_paths: List[str], job_features: Callable[[int, str], Tuple[str, List[float]]] = None):
+    """Function to choose the number of threads with the highest throughput of calculations, when the number of threads is auto.
+    Copies of the shortest calculations in the sample are executed with each number of threads in calibration_levels until each thread
+    finished calibration_runs of them or for at most calibration_time seconds, and the number of threads that finishes the most calculations per second is kept.
+    The larger numbers of threads are not tried once the throughput falls below the best one, as they only add contention.
+    The calculations run in their own directories, so the sampled calculations are not changed.
+    The chosen number of threads is stored in the calculation parameters to be used again when the calculation is continued.
+    
+    Args:
+        sample_paths (List[str]): paths to the executables of the calculations that can be sampled, with their input files ready
+        job_features (Callable[[int, str], Tuple[str, List[float]]], optional): function that returns the kind and the features
+        of a calculation given its index and path, used to sample the shortest calculations. Defaults to None.
+    """
+    global number_of_threads
+    
+    with calibration_lock:
+        if number_of_threads != 'auto':
+            return
+        
+        max_threads = int(number_max_of_threads)
+        
+        # Without calculations to sample all the threads are used, and the calibration is done in the next run
+        if len(sample_paths) == 0:
+            number_of_threads = str(max_threads)
+            return
+        
+        if job_features is not None:
+            sample_paths = sorted(sample_paths, key = lambda path: job_cost_model.predict(*job_features(0, path)))
+        
+        sample_paths = sample_paths[:calibration_sample]
+        
+        levels = sorted(set([max(1, round(fraction * max_threads)) for fraction in calibration_levels] + [min(physicalCores(), max_threads)]))
+        
+        calibrationDir = rootDir + "/" + directory_name + "/calibration"
+        
+        print("\nCalibrating the number of threads with " + str(len(sample_paths)) + " sampled calculations...")
+        
+        throughput: Dict[int, float] = {}
+        for level in levels:
+            next_job = 0
+            completed = 0
+            lock = threading.Lock()
+            start = time.time()
+            deadline = start + calibration_time
+            
+            def work(slot: int):
+                nonlocal next_job, completed
+                
+                pinWorker(slot)
+                
+                jobDir = calibrationDir + "/" + str(level) + "_" + str(slot)
+                
+                for _ in range(calibration_runs):
+                    if time.time() >= deadline:
+                        break
+                    
+                    with lock:
+                        sampleDir = os.path.dirname(sample_paths[next_job % len(sample_paths)])
+                        next_job += 1
+                    
+                    if os.path.isdir(jobDir):
+                        shutil.rmtree(jobDir)
+                    
+                    os.makedirs(jobDir)
+                    
+                    # Only the input files directly in the directory of the calculation are needed
+                    for filename in os.listdir(sampleDir):
+                        if os.path.isfile(sampleDir + "/" + filename) and not filename.endswith(".f06"):
+                            shutil.copy2(sampleDir + "/" + filename, jobDir + "/" + filename)
+                    
+                    os.mkdir(jobDir + "/tmp")
+                    
+                    # Only the calculations that finished normally are counted, the ones still running at the end of the calibration time are killed
+                    if runJob(jobDir + "/" + exe_file, max(deadline - time.time(), 0.0)) == 0:
+                        with lock:
+                            completed += 1
+            
+            threads = [threading.Thread(target = work, args = (slot,), daemon = True) for slot in range(level)]
+            
+            for thread in threads:
+                thread.start()
+            
+            for thread in threads:
+                thread.join()
+            
+            throughput[level] = completed / (time.time() - start)
+            
+            print(clearLine + str(level) + " threads: " + str(round(throughput[level], 3)) + " calculations per second")
+            
+            if throughput[level] < (1.0 - calibration_tolerance) * max(throughput.values()):
+                break
+        
+        background_cleaner.remove(calibrationDir)
+        
+        # Without any finished calculation the calibration says nothing, so all the threads are used and the calibration is done in the next run
+        if max(throughput.values()) == 0.0:
+            print("No sampled calculation finished during the calibration, using all the threads\n")
+            number_of_threads = str(max_threads)
+            return
+        
+        # The smallest number of threads wins a tie
+        number_of_threads = str(max(throughput, key = lambda level: (throughput[level], -level)))
+        
+        print("number of threads = " + number_of_threads + "\n")
+        
+        with open(file_parameters, "r") as fp:
+            parameters = fp.readlines()
+        
+        with open(file_parameters, "w") as fp:
+            for line in parameters:
+                if "Number of considered threads in the calculation=" in line:
+                    line = "Number of considered threads in the calculation= " + number_of_threads + "\n"
+                
+                fp.write(line)
+
+
+# Lock so only the first calculations executed calibrate the number of threads
+calibration_lock = threading.Lock()
+
+
+def executeJobs(parallel_paths: List[str] | JobStream, on_done: Callable[[int, str, int], List[str] | None] = None, \
+                job_features: Callable[[int, str], Tuple[str, List[float]]] = None, prepare: Callable[[int, str], str | None] = None, \
+                monitor_scf: bool = False, job_group: Callable[[int, str], str] = None):
+    """Function to execute a list of MCDFGME calculations in the shared job pool.
+    The calculations are fed to the pool a few at a time, so there is no limit on the number of calculations
+    and the workers stay busy until the last one. The completion of each calculation is reported.
+    If the features of the calculations are given, the calculations with the longest predicted runtime are dispatched first
+    and the runtime of each one is used to update the job cost model. These calculations are also killed if they run for much longer than predicted.
+    Several threads can execute their calculations at the same time, sharing the workers of the pool.
+    The calculations can also be given as a JobStream, which are executed while they are added until the stream is closed.
+    In this case the calculations are ordered within windows of pipeline_window calculations.
+    
+    Args:
+        parallel_paths (List[str] | JobStream): list or stream of the paths to the executables of each calculation to be executed
+        on_done (Callable[[int, str, int], List[str] | None], optional): function called in the calling thread with the index, the path
+        and the return code of each finished calculation. It can return a list of paths to be calculated next, which are queued immediately.
+        Defaults to None.
+        job_features (Callable[[int, str], Tuple[str, List[float]]], optional): function that returns the kind and the features
+        of a calculation given its index and path. Defaults to None.
+        prepare (Callable[[int, str], str | None], optional): function called with the index and the path of each calculation
+        just before it is queued. It can return the path where the calculation is actually executed, which is then given to on_done.
+        Defaults to None.
+        monitor_scf (bool, optional): flag to follow the SCF of the calculations while they run and stop the ones that diverge. Defaults to False.
+        job_group (Callable[[int, str], str], optional): function that returns the group of a calculation given its index and path.
+        The calculations of each group are dispatched one after the other, starting with the group of the longest predicted calculation.
+        Defaults to None.
+    """
+    global active_executions
+    
+    # The number of threads is calibrated on the first list of calculations that are ready to be executed
+    if number_of_threads == 'auto':
+        calibrateThreads(parallel_paths if isinstance(parallel_paths, list) and prepare is None else [], job_features)
+    
+    stream = parallel_paths if isinstance(parallel_paths, JobStream) else JobStream(parallel_paths)
+    
+    if stream.closed and len(stream) == 0:
+        return
+    
+    with active_executions_lock:
+        active_executions += 1
+    
+    try:
+        executeJobStream(stream, on_done, job_features, prepare, monitor_scf, job_group)
+    finally:
+        with active_executions_lock:
+            active_executions -= 1
+
+
+def runPooledJob(path: str) -> int:
+    """Function to run a single calculation in the shared job pool and wait for it, for the calculations started by hand.
+    It takes a place of the pool like the other calculations, so it is held back under memory pressure and killed when the script stops.
+    
+    Args:
+        path (str): path to the executable of the calculation
+    
+    Returns:
+        int: return code of the calculation
+    """
+    if number_of_threads == 'auto':
+        calibrateThreads([])
+    
+    finished: queue.Queue = queue.Queue()
+    
+    # The user is waiting for the calculations started by hand, so they go before the ones already queued
+    job_pool.submit(-math.inf, 0, path, finished)
+    
+    _, _, return_code, _ = finished.get()
+    job_pool.jobDone()
+    
+    return return_code
+
+
+def executeJobStream(stream: JobStream, on_done: Callable[[int, str, int], List[str] | None] = None, \
+                     job_features: Callable[[int, str], Tuple[str, List[float]]] = None, prepare: Callable[[int, str], str | None] = None, \
+                     monitor_scf: bool = False, job_group: Callable[[int, str], str] = None):
+    """Helper function for executeJobs that executes the calculations of a stream, with the same arguments.
+    When the script is stopping, no more calculations are queued and the ones already queued are returned without running.
+    Once the running calculations finished the results are checkpointed and CalculationInterrupted is raised.
+    """
+    # Kind and features of each calculation, to predict and record its runtime
+    features: Dict[int, Tuple[str, List[float]]] = {}
+    
+    def priority(idx: int, path: str) -> float:
+        if job_features is None:
+            return 0.0
+        
+        features[idx] = job_features(idx, path)
+        return -job_cost_model.predict(*features[idx])
+    
+    def timeout(idx: int, job_priority: float) -> float | None:
+        if idx not in features:
+            return None
+        
+        return jobTimeout(features[idx][0], -job_priority)
+    
+    def dispatch_order(window: List[Tuple[int, str]]) -> List[Tuple[float, float, int, str]]:
+        # Longest predicted calculations first
+        order = sorted([(priority(idx, path), idx, path) for idx, path in window])
+        
+        if job_group is None:
+            return [(job_priority, job_priority, idx, path) for job_priority, idx, path in order]
+        
+        groups: Dict[str, List[Tuple[float, int, str]]] = {}
+        for job_priority, idx, path in order:
+            groups.setdefault(job_group(idx, path), []).append((job_priority, idx, path))
+        
+        # The priority in the job pool is the same for the calculations of a group so they keep their order
+        return [(group[0][0], job_priority, idx, path) for group in groups.values() for job_priority, idx, path in group]
+    
+    finished: queue.Queue = queue.Queue()
+    
+    # Only keep a few calculations of this list queued at a time, so any preparation is done just before they are needed
+    # The number of queued calculations follows the number of workers, which grows when remote workers connect
+    queued = 0
+    slots = threading.Condition()
+    
+    # Number of calculations of the stream that were queued
+    fed = 0
+    
+    # Error raised while queuing the calculations, raised again once the queued ones finished
+    feeder_error: BaseException | None = None
+    
+    def feeder():
+        nonlocal feeder_error
+        
+        try:
+            feed()
+        except BaseException as error:
+            feeder_error = error
+            stream.cancel()
+        finally:
+            # All the calculations of the stream are queued, or the script is stopping, or queuing failed
+            finished.put(None)
+    
+    def feed():
+        nonlocal queued, fed
+        
+        for window in stream.windows(len(stream) if stream.closed else pipeline_window):
+            for pool_priority, job_priority, idx, path in dispatch_order(window):
+                with slots:
+                    while queued >= 2 * job_pool.size() and not job_interrupt.is_set():
+                        slots.wait(1.0)
+                    
+                    if job_interrupt.is_set():
+                        break
+                    
+                    queued += 1
+                
+                if prepare is not None:
+                    path = prepare(idx, path) or path
+                
+                job_pool.submit(pool_priority, idx, path, finished, timeout(idx, job_priority), monitor_scf, features.get(idx))
+                fed += 1
+            
+            if job_interrupt.is_set():
+                stream.cancel()
+                break
+    
+    threading.Thread(target = feeder, daemon = True).start()
+    
+    # The calculations that follow from others have negative indexes
+    total: int | None = None
+    chained = 0
+    
+    done = 0
+    while total is None or done < total + chained:
+        result = finished.get()
+        
+        if result is None:
+            total = fed
+            continue
+        
+        idx, path, return_code, runtime = result
+        done += 1
+        
+        if idx >= 0:
+            with slots:
+                queued -= 1
+                slots.notify()
+        
+        if return_code == job_cancelled_code:
+            # The calculation was not finished because the script is stopping, also when it is the campaign scheduler that stops
+            job_interrupt.set()
+            features.pop(idx, None)
+            continue
+        elif return_code == job_timeout_code:
+            print(clearLine + "Warning: MCDFGME timed out after " + str(round(runtime)) + "s in " + os.path.dirname(path))
+            features.pop(idx, None)
+        elif return_code == scf_diverged_code:
+            print(clearLine + "Warning: MCDFGME stopped with a diverging SCF in " + os.path.dirname(path))
+            features.pop(idx, None)
+        elif return_code == job_failed_code:
+            print(clearLine + "Warning: MCDFGME could not be run in " + os.path.dirname(path))
+            features.pop(idx, None)
+        elif return_code != 0:
+            print(clearLine + "Warning: MCDFGME returned " + str(return_code) + " in " + os.path.dirname(path))
+            features.pop(idx, None)
+        elif idx in features:
+            # Outputs copied from the result store have no runtime
+            if runtime is not None:
+                job_cost_model.record(*features.pop(idx), runtime)
+            else:
+                features.pop(idx)
+        
+        if on_done is not None:
+            # Queue the calculations that follow from this one
+            for next_path in on_done(idx, path, return_code) or []:
+                chained += 1
+                next_priority = priority(-chained, next_path)
+                job_pool.submit(next_priority, -chained, next_path, finished, timeout(-chained, next_priority), monitor_scf, features.get(-chained))
+        
+        print(clearLine + "Finished calculation " + job_pool.jobDone() + ": " + os.path.dirname(path).replace(rootDir + "/", ""), end="")
+    
+    job_cost_model.save()
+    job_memory_model.save()
+    
+    print()
+    
+    if feeder_error is not None:
+        raise feeder_error
+    
+    if job_interrupt.is_set():
+        checkpointCalculation()
+        raise CalculationInterrupted()
+
+
+class CompletionWatermark:
+    def __init__(self, total: int = 0):
+        """Helper class to track the longest prefix of a stream of calculations that has fully finished.
+        Calculations finish out of order, so this is the last position from where a calculation can safely be resumed.
+        
+        Args:
+            total (int, optional): total number of calculations in the stream, which grows as calculations are marked. Defaults to 0.
+        """
+        self.total = total
+        self.finished = [False] * total
+        self.prefix = 0
+    
+    def update(self, idx: int) -> bool:
+        """Helper function to mark a calculation as finished and advance the prefix
+        
+        Args:
+            idx (int): position of the finished calculation in the stream
+        
+        Returns:
+            bool: True if the finished prefix has advanced
+        """
+        if idx >= self.total:
+            self.finished.extend([False] * (idx + 1 - self.total))
+            self.total = idx + 1
+        
+        self.finished[idx] = True
+        
+        previous = self.prefix
+        while self.prefix < self.total and self.finished[self.prefix]:
+            self.prefix += 1
+        
+        return self.prefix > previous
+
+
+def executeBatchStateCalculation(parallel_paths: List[str], log_file: str = '', state_list: List[State] = [], log_line_header: str = ''):
+    """Helper function to execute batches of state calculations.
+    the calculations are also logged into the correct files
+
+    Args:
+        parallel_paths (List[str]): list of the paths to the executables of each state to be executed
+        log_file (str, optional): filename of the log file for the calulations. Defaults to ''.
+        state_list (List[State], optional): list of states where the subset is being calculated from. Defaults to [].
+        log_line_header (str, optional): log file line header to format the file. Defaults to ''.
+    """
+    logging = log_file != '' and state_list != [] and log_line_header != ''
+    
+    # The states in the log are aligned with the end of the state list
+    offset = len(state_list) - len(parallel_paths)
+    
+    watermark = CompletionWatermark(len(parallel_paths))
+    last_logged = 0
+    
+    def log_state(idx: int, path: str, return_code: int):
+        nonlocal last_logged
+        
+        # Only log the last state of the finished prefix every log_checkpoint_interval calculations
+        # If we stop in the middle we will restart from the last logged state
+        if watermark.update(idx) and logging and watermark.prefix - last_logged >= log_checkpoint_interval:
+            with open(log_file, "a") as log:
+                if last_logged == 0:
+                    log.write(log_line_header)
+                
+                log.write(', '.join([str(qn) for qn in state_list[offset + watermark.prefix - 1].qns()]) + "\n")
+            
+            last_logged = watermark.prefix
+    
+    executeJobs(parallel_paths, log_state)
+    
+    if logging and (last_logged == 0 or last_logged < len(parallel_paths)):
+        with open(log_file, "a") as log:
+            if last_logged == 0:
+                log.write(log_line_header)
+            
+            log.write(', '.join([str(qn) for qn in state_list[-1].qns()]) + "\n")
+
+
+def executeBatchTransitionCalculation(transitions_dir: str, parallel_inputs: List[Callable[[str, str], Tuple[str, str]]], \
+                                    parallel_initial_src_paths: List[str], parallel_final_src_paths: List[str], \
+                                    log_file: str = '', transition_list: List[Transition] = [], log_line_header: str = '', \
+                                    batch: bool = False, parallel_features: List[Tuple[str, List[float]]] = [], parallel_counters: List[int] = [], \
+                                    journal: TransitionJournal | None = None, parallel_stream: JobStream | None = None):
+    """Helper function to execute batches of transition calculations and clean up the extra files afterwards.
+    The transitions are calculated in a few slot directories that are reused as soon as a transition finishes,
+    with the .f06 output of each transition moved to the transitions directory as <index>.f06 before its slot is reused.
+    The transitions from the same initial state are dispatched one after the other, and a slot keeps the initial wavefunction
+    staged for the next of these transitions if the calculation did not change it.
+
+    Args:
+        transitions_dir (str): directory name for the transitions of this type
+        parallel_inputs (List[Callable[[str, str], Tuple[str, str]]]): list with the functions that write the input file of each transition
+        given the directory and filename, returning the names of the initial and final wavefunction files
+        parallel_initial_src_paths (List[str]): list with the paths to the source of the .f09 wavefunction files for the initial state
+        parallel_final_src_paths (List[str]): list with the paths to the source of the .f09 wavefunction files for the final state
+        log_file (str, optional): filename of the log file where to log the calculation for these transitions. Defaults to ''.
+        transition_list (List[Transition], optional): list of transition where the execution is being done from. Defaults to [].
+        log_line_header (str, optional): log header line to format the log file. Defaults to ''.
+        batch (bool, optional): flag to control if this calculation contains all the transitions or is just a sub batch. Defaults to False
+        parallel_features (List[Tuple[str, List[float]]], optional): list with the kind and features of each transition for the job cost model. Defaults to [].
+        parallel_counters (List[int], optional): list with the index of each transition in the transition_list.
+        Defaults to [], in which case the transitions are aligned with the end of the transition_list.
+        journal (TransitionJournal | None, optional): journal where the result of each finished transition is recorded. Defaults to None.
+        parallel_stream (JobStream | None, optional): stream where the transitions are added after their entries in the other lists,
+        to calculate them while the rest of the batch is prepared. The features and indexes of the transitions must be given in this case.
+        Defaults to None, where the transitions in the lists are calculated.
+    """
+    logging = log_file != '' and transition_list != [] and log_line_header != ''
+    
+    # The transitions in the log are aligned with the end of the transition list unless their indexes are given
+    if parallel_stream is None and len(parallel_counters) != len(parallel_inputs):
+        parallel_counters = list(range(len(transition_list) - len(parallel_inputs), len(transition_list)))
+    
+    transitionsDir = rootDir + "/" + directory_name + "/transitions/" + transitions_dir
+    
+    if not os.path.exists(transitionsDir):
+        os.makedirs(transitionsDir)
+    
+    # Slot directories that are free to calculate the next transition, and the wavefunction files staged in each running transition
+    free_slots: List[str] = []
+    slots_lock = threading.Lock()
+    slots_created = 0
+    staged: Dict[int, List[str]] = {}
+    
+    # Status of the initial wavefunction staged in each running transition, and the initial wavefunction kept in each free slot
+    staged_status: Dict[int, tuple] = {}
+    kept: Dict[str, Tuple[str, str, tuple]] = {}
+    
+    watermark = CompletionWatermark(len(parallel_inputs) if parallel_stream is None else 0)
+    last_logged = 0
+    header_logged = False
+    
+    def log_line(cnt: int) -> str:
+        transition = transition_list[cnt]
+        return ', '.join([str(qn) for qn in transition.qnsi()]) + " => " + ', '.join([str(qn) for qn in transition.qnsf()]) + " //" + str(cnt) + "\n"
+    
+    def wavefunction_status(src: str, dst: str) -> tuple:
+        src_status = os.stat(src)
+        dst_status = os.stat(dst)
+        return (src_status.st_mtime_ns, src_status.st_size, dst_status.st_ino, dst_status.st_mtime_ns, dst_status.st_size)
+    
+    def stage_transition(idx: int, path: str) -> str:
+        nonlocal slots_created
+        
+        wfi_src = parallel_initial_src_paths[idx]
+        
+        # PREFER THE SLOT THAT STILL HOLDS THE WAVEFUNCTION OF THIS INITIAL STATE
+        with slots_lock:
+            matching = [slot for slot in free_slots if slot in kept and kept[slot][0] == wfi_src]
+            
+            if len(matching) > 0:
+                slotDir = matching[0]
+                free_slots.remove(slotDir)
+            elif len(free_slots) > 0:
+                slotDir = free_slots.pop(0)
+            else:
+                slotDir = transitionsDir + "/slots/" + str(slots_created)
+                slots_created += 1
+            
+            kept_wf = kept.pop(slotDir, None)
+        
+        wfiFile, wffFile = parallel_inputs[idx](slotDir, transition_slot_file)
+        
+        # STAGE THE .f09 WAVEFUNCTION FILES JUST BEFORE THE TRANSITION IS QUEUED
+        staged[idx] = [slotDir + "/" + wfiFile + ".f09", slotDir + "/" + wffFile + ".f09"]
+        
+        if kept_wf is not None and kept_wf[1] != staged[idx][0]:
+            replaceJobFile(kept_wf[1])
+        
+        if kept_wf is None or kept_wf[:2] != (wfi_src, staged[idx][0]) or wfiFile == wffFile or not os.path.isfile(staged[idx][0]) or \
+            wavefunction_status(wfi_src, staged[idx][0]) != kept_wf[2]:
+            stageWavefunction(wfi_src, staged[idx][0])
+        
+        stageWavefunction(parallel_final_src_paths[idx], staged[idx][1])
+        
+        staged_status[idx] = wavefunction_status(wfi_src, staged[idx][0])
+        
+        return slotDir + "/" + exe_file
+    
+    def clear_slot(slotDir: str, wfi_src: str, wfi_path: str, wff_path: str, status: tuple):
+        # KEEP THE INITIAL WAVEFUNCTION FOR THE NEXT TRANSITION FROM THIS STATE IF THE CALCULATION DID NOT CHANGE IT
+        keep = None
+        if wfi_path != wff_path and os.path.isfile(wfi_path) and os.path.isfile(wfi_src) and \
+            wavefunction_status(wfi_src, wfi_path) == status:
+            keep = (wfi_src, wfi_path, status)
+        
+        # REMOVE THE .f09 WAVEFUNCTION FILES AND THE SCRATCH FILES OF THIS TRANSITION
+        for wf_path in ([wff_path] if keep is not None else [wfi_path, wff_path]):
+            if os.path.lexists(wf_path):
+                os.remove(wf_path)
+        
+        for filename in os.listdir(slotDir):
+            if keep is not None and filename == os.path.basename(wfi_path):
+                continue
+            
+            if filename == "tmp":
+                for tmp_filename in os.listdir(slotDir + "/tmp"):
+                    if os.path.isfile(slotDir + "/tmp/" + tmp_filename):
+                        os.remove(slotDir + "/tmp/" + tmp_filename)
+                    else:
+                        shutil.rmtree(slotDir + "/tmp/" + tmp_filename)
+            elif ".f05" not in filename and filename != "mdfgme.dat":
+                if os.path.isfile(slotDir + "/" + filename):
+                    os.remove(slotDir + "/" + filename)
+                else:
+                    shutil.rmtree(slotDir + "/" + filename)
+        
+        with slots_lock:
+            free_slots.append(slotDir)
+            
+            if keep is not None:
+                kept[slotDir] = keep
+    
+    def clean_transition(idx: int, path: str, return_code: int):
+        nonlocal last_logged, header_logged
+        
+        slotDir = os.path.dirname(path)
+        
+        # MOVE THE OUTPUT OF THIS TRANSITION OUT OF THE SLOT BEFORE IT IS REUSED
+        if os.path.isfile(slotDir + "/" + transition_slot_file + ".f06"):
+            os.replace(slotDir + "/" + transition_slot_file + ".f06", transitionsDir + "/" + str(parallel_counters[idx]) + ".f06")
+            
+            if journal is not None:
+                journal.record(parallel_counters[idx], readTransition(transitionsDir, str(parallel_counters[idx]), journal.radiative))
+        
+        # THE SLOT IS CLEARED IN THE BACKGROUND AND FREED FOR THE NEXT TRANSITIONS AFTERWARDS
+        background_cleaner.submit(clear_slot, slotDir, parallel_initial_src_paths[idx], *staged.pop(idx), staged_status.pop(idx))
+        
+        # THE OUTPUTS OF THE BATCH ARE KEPT UNTIL IT IS WRITTEN TO FILE, SO WE CAN RESTART FROM ANY LOGGED TRANSITION
+        # IF WE STOP IN THE MIDDLE THE TRANSITIONS IN THE JOURNAL ARE NOT CALCULATED AGAIN
+        if watermark.update(idx) and logging and watermark.prefix - last_logged >= log_checkpoint_interval:
+            with open(log_file, "a") as log:
+                if not header_logged:
+                    log.write(log_line_header)
+                    header_logged = True
+                
+                log.write(log_line(parallel_counters[watermark.prefix - 1]))
+            
+            last_logged = watermark.prefix
+    
+    def transition_features(idx: int, path: str) -> Tuple[str, List[float]]:
+        return parallel_features[idx]
+    
+    def transition_group(idx: int, path: str) -> str:
+        return parallel_initial_src_paths[idx]
+    
+    # The slot of each transition is only chosen when it is queued
+    parallel_paths = parallel_stream if parallel_stream is not None else [transitionsDir + "/" + str(cnt) for cnt in parallel_counters]
+    
+    executeJobs(parallel_paths, clean_transition, \
+                transition_features if parallel_stream is not None or len(parallel_features) == len(parallel_inputs) else None, stage_transition, \
+                job_group = transition_group)
+    
+    if journal is not None:
+        journal.sync()
+    
+    background_cleaner.wait()
+    background_cleaner.remove(transitionsDir + "/slots")
+    
+    # LOG THE LAST CALCULATED TRANSITION
+    if logging:
+        with open(log_file, "a") as log:
+            if not header_logged:
+                log.write(log_line_header)
+            
+            if last_logged == 0 or last_logged < len(parallel_inputs):
+                log.write(log_line(len(transition_list) - 1))
+            if not batch:
+                log.write("Finished Transitions")
+
+
+class TransitionBatchCalculation:
+    def __init__(self, transitions_dir: str, parallel_inputs: List[Callable[[str, str], Tuple[str, str]]], \
+                parallel_initial_src_paths: List[str], parallel_final_src_paths: List[str], \
+                log_file: str, transition_list: List[Transition], log_line_header: str, \
+                parallel_features: List[Tuple[str, List[float]]], parallel_counters: List[int], journal: TransitionJournal):
+        """Calculation of a batch of transitions that starts as soon as its first transition is prepared.
+        The transitions are calculated by executeBatchTransitionCalculation in another thread while the rest of the batch is prepared,
+        with the lists of the batch shared with the thread that prepares them.
+        
+        Args:
+            transitions_dir (str): directory name for the transitions of this type
+            parallel_inputs (List[Callable[[str, str], Tuple[str, str]]]): list with the functions that write the input file of each transition
+            parallel_initial_src_paths (List[str]): list with the paths to the source of the .f09 wavefunction files for the initial state
+            parallel_final_src_paths (List[str]): list with the paths to the source of the .f09 wavefunction files for the final state
+            log_file (str): filename of the log file where to log the calculation for these transitions
+            transition_list (List[Transition]): list of transition where the execution is being done from
+            log_line_header (str): log header line to format the log file
+            parallel_features (List[Tuple[str, List[float]]]): list with the kind and features of each transition for the job cost model
+            parallel_counters (List[int]): list with the index of each transition in the transition_list
+            journal (TransitionJournal): journal where the result of each finished transition is recorded
+        """
+        self.transitions_dir = transitions_dir
+        self.log_file = log_file
+        self.stream = JobStream()
+        self.errors: List[BaseException] = []
+        
+        def run():
+            try:
+                executeBatchTransitionCalculation(transitions_dir, parallel_inputs, \
+                                                parallel_initial_src_paths, parallel_final_src_paths, \
+                                                log_file, transition_list, log_line_header, True, parallel_features, parallel_counters, \
+                                                journal, self.stream)
+            except BaseException as error:
+                self.errors.append(error)
+        
+        self.thread = threading.Thread(target = run)
+        self.thread.start()
+    
+    def add(self, combCnt: int):
+        """Function to start calculating a transition, after its entries were added to the lists of the batch
+        
+        Args:
+            combCnt (int): index of the transition
+        """
+        self.stream.append(rootDir + "/" + directory_name + "/transitions/" + self.transitions_dir + "/" + str(combCnt))
+        
+        # When the script is stopping the calculation of the batch raises CalculationInterrupted once its running transitions finished
+        if self.stream.cancelled:
+            self.finish()
+    
+    def finish(self, last: bool = False):
+        """Function to wait for all the transitions of the batch to finish
+        
+        Args:
+            last (bool, optional): flag for the last batch of these transitions, which is logged as finished. Defaults to False.
+        """
+        self.stream.close()
+        self.thread.join()
+        
+        if len(self.errors) > 0:
+            raise self.errors[0]
+        
+        if last:
+            with open(self.log_file, "a") as log:
+                log.write("Finished Transitions")
+
+
+def transitionOutput(transitions_dir: str, combCnt: int) -> Tuple[str, str]:
+    """Helper function for the location of the .f06 output of a transition.
+    The outputs are kept directly in the transitions directory, unless they were left in a directory per transition by an older version of this script.
+
+    Args:
+        transitions_dir (str): directory name for the transitions of this type
+        combCnt (int): index of the transition
+
+    Returns:
+        Tuple[str, str]: directory and filename of the .f06 output
+    """
+    currDir = rootDir + "/" + directory_name + "/transitions/" + transitions_dir
+    
+    if not os.path.isfile(currDir + "/" + str(combCnt) + ".f06") and os.path.isdir(currDir + "/" + str(combCnt)):
+        return currDir + "/" + str(combCnt), str(combCnt)
+    
+    return currDir, str(combCnt)
+    
+    
+class TransitionPrecalculator:
+    def __init__(self):
+        """Scheduler for the transitions that can be calculated while other states are still converging.
+        Each transition depends only on its initial and final states, so it is queued in the job pool as soon as both have converged.
+        These calculations have a lower priority than any state calculation, only filling the cores that would be idle.
+        The outputs are kept until rates() or rates_auger() collect them, checking that the wavefunctions of both states did not change.
+        """
+        # Transition types to calculate: initial states directory, final states directory, initial and final electron numbers
+        self.edges: Dict[str, Tuple[str, str, str, str]] = {}
+        # Converged states for each states directory
+        self.converged: Dict[str, List[State]] = {}
+        # Transitions of each converged state still to be queued: type, state, partner states directory, next and end index in its converged list,
+        # and whether the state is the initial one. The transitions are only taken from here when the backlog has room for them
+        self.cursors: List[List] = []
+        # Transitions waiting to be queued in the job pool, ordered by priority, with their features for the job cost model
+        self.backlog: List[Tuple[float, int, str, State, State, List[float]]] = []
+        # Transitions in the job pool: type, key of the result, staged wavefunction files, features for the job cost model
+        self.running: Dict[int, Tuple[str, Tuple[str, str, str, str, str], List[str], List[float]]] = {}
+        # Directory and wavefunction files status of each calculated transition
+        self.results: Dict[Tuple[str, str, str, str, str], Tuple[str, List[Tuple[int, int]]]] = {}
+        # Number of results kept for each type, which stops at max_transitions like the batches of the rates functions.
+        # Only the results that fit in the free disk space up to transitions_disk_high_water are calculated
+        self.stored: Dict[str, int] = {}
+        # Number of prompts that hold back the transitions while the user is checking the states
+        self.paused = 0
+        self.sequence = 0
+        self.finished: queue.Queue = queue.Queue()
+        self.lock = threading.Condition()
+        self.collector: threading.Thread | None = None
+    
+    def precalculatedDir(self, transition_type: str) -> str:
+        return rootDir + "/" + directory_name + "/transitions/precalculated/" + transition_type
+    
+    @staticmethod
+    def wavefunctionStatus(wf_path: str) -> Tuple[int, int]:
+        """Helper function for the status of a .f09 wavefunction file, used to check if it has been changed
+
+        Args:
+            wf_path (str): path to the .f09 wavefunction file
+
+        Returns:
+            Tuple[int, int]: modification time in ns and size of the file
+        """
+        status = os.stat(wf_path)
+        return status.st_mtime_ns, status.st_size
+    
+    def addTransitions(self, transition_type: str, states_dir_i: str, states_dir_f: str, electron_num_i: str, electron_num_f: str):
+        """Function to start calculating a type of transitions between converged states.
+        Transitions with the same initial and final states directory are radiative, otherwise they are auger transitions.
+
+        Args:
+            transition_type (str): type of transition, which is the transitions directory used by rates() or rates_auger()
+            states_dir_i (str): directory name with the initial states
+            states_dir_f (str): directory name with the final states
+            electron_num_i (str): number of electrons in the initial configurations
+            electron_num_f (str): number of electrons in the final configurations
+        """
+        with self.lock:
+            # The outputs left by a previous run of the script cannot be collected, as their results were not kept
+            if transition_type not in self.edges and self.stored.get(transition_type, 0) == 0:
+                background_cleaner.remove(self.precalculatedDir(transition_type))
+            
+            self.edges[transition_type] = (states_dir_i, states_dir_f, str(int(electron_num_i)), str(int(electron_num_f)))
+            
+            if self.collector is None:
+                self.collector = threading.Thread(target = self.collect_finished, daemon = True)
+                self.collector.start()
+    
+    def stateConverged(self, states_dir: str, state: State):
+        """Function to queue the transitions of a newly converged state with all the states that have already converged.
+        The transitions are only generated when there is room for them in the backlog.
+
+        Args:
+            states_dir (str): directory name with the states of this type
+            state (State): converged state
+        """
+        with self.lock:
+            converged = self.converged.setdefault(states_dir, [])
+            
+            # A state that is checked again, such as when the calculation is resumed, keeps the transitions it already has
+            if any(converged_state.qns() == state.qns() for converged_state in converged):
+                return
+            
+            for transition_type, (states_dir_i, states_dir_f, _, _) in self.edges.items():
+                if states_dir == states_dir_i:
+                    self.cursors.append([transition_type, state, states_dir_f, 0, len(self.converged.get(states_dir_f, [])), True])
+                
+                if states_dir == states_dir_f and states_dir_i != states_dir_f:
+                    self.cursors.append([transition_type, state, states_dir_i, 0, len(self.converged.get(states_dir_i, [])), False])
+            
+            converged.append(state)
+        
+        self.pump()
+    
+    def seedConverged(self, states_dir: str, states: List[State]):
+        """Function to add the states that converged before the calculation was resumed, so their transitions are also calculated in advance
+
+        Args:
+            states_dir (str): directory name with the states of this type
+            states (List[State]): states already calculated, of which only the converged ones are added
+        """
+        for state in states:
+            wf_path = rootDir + "/" + directory_name + "/" + states_dir + "/" + state.getDir() + "/" + state.getFileName() + ".f09"
+            
+            if state.converged(diffThreshold, overlapsThreshold, accThreshold) and os.path.isfile(wf_path):
+                self.stateConverged(states_dir, state)
+    
+    def pause(self):
+        """Function to stop queueing transitions in the job pool while the user is checking the states, the queued ones are left to finish
+        """
+        with self.lock:
+            self.paused += 1
+    
+    def resume(self):
+        """Function to queue transitions again after pause
+        """
+        with self.lock:
+            self.paused -= 1
+        
+        self.pump()
+    
+    def fill(self):
+        """Helper function to generate the transitions of the converged states until the backlog holds as many as can be in the job pool.
+        The lock must be held by the caller.
+        """
+        while len(self.backlog) < 2 * job_pool.size() and len(self.cursors) > 0:
+            cursor = self.cursors[0]
+            transition_type, state, partners_dir, position, end, initial = cursor
+            
+            # The remaining transitions of a type that is no longer calculated here, or that holds too many results, are left to the rates functions
+            if transition_type not in self.edges or self.stored.get(transition_type, 0) >= max_transitions or position >= end:
+                self.cursors.pop(0)
+                continue
+            
+            cursor[3] += 1
+            
+            partner = self.converged[partners_dir][position]
+            
+            if initial:
+                self.queueTransition(transition_type, state, partner)
+            else:
+                self.queueTransition(transition_type, partner, state)
+    
+    def queueTransition(self, transition_type: str, state_a: State, state_b: State):
+        """Helper function to add a transition to the backlog, keeping the same initial and final states that the rates functions use.
+        The lock must be held by the caller.
+
+        Args:
+            transition_type (str): type of transition
+            state_a (State): state from the initial states directory
+            state_b (State): state from the final states directory
+        """
+        # The initial state is the one with higher energy, same as in the energy sorted lists
+        if state_a.welt == state_b.welt:
+            return
         
-        # EXECUTE PARALLEL JOB FOR THE LAST BATCH
-        subprocess.check_output(['parallel -j' + number_of_threads + ' --bar --files ' + "'cd {//} && {/} && cd -'" + ' ::: ' + ' '.join(parallel_paths[int((pl + 1) * parallel_max_paths):]) + ' >/dev/null'], shell=True) # type: ignore
+        if state_a.welt < state_b.welt:
+            if self.edges[transition_type][0] != self.edges[transition_type][1]:
+                return
+            
+            state_a, state_b = state_b, state_a
         
+        states_dir_i, states_dir_f, electron_num_i, electron_num_f = self.edges[transition_type]
         
-        # COPY .f09 WAVEFUNCTION FILES FOR THE LAST BATCH
-        if log_file != '' and transition_list != [] and log_line_header != '':
-            with open(log_file, "a") as log:
-                log.write(', '.join([str(qn) for qn in transition_list[-1].qnsi()]) + " => " + ', '.join([str(qn) for qn in transition_list[-1].qnsf()]) + " //" + str(len(transition_list) - 1) + "\n")
-                if not batch:
-                    log.write("Finished Transitions")
+        features = JobCostModel.combine(JobCostModel.features(int(electron_num_i), state_a.configuration, state_a.jj, state_a.eigv), \
+                                        JobCostModel.features(int(electron_num_f), state_b.configuration, state_b.jj, state_b.eigv))
         
+        # Always after the state calculations, with the longest transitions first
+        self.sequence += 1
+        heapq.heappush(self.backlog, (1.0 / (1.0 + job_cost_model.predict(transition_type, features)), self.sequence, transition_type, state_a, state_b, features))
+    
+    def diskBudget(self) -> float:
+        """Helper function for the size in bytes of the outputs that still fit in the disk, using the same limit as the batches of the rates functions
+
+        Returns:
+            float: free space in bytes up to transitions_disk_high_water
+        """
+        usage = shutil.disk_usage(rootDir + "/" + directory_name)
+        return usage.free - (1.0 - transitions_disk_high_water) * usage.total
+    
+    def take(self, budget: float) -> Tuple | None:
+        """Helper function to take the next transition from the backlog, reserving its place in the job pool and in the results.
+        The lock must be held by the caller.
+
+        Args:
+            budget (float): size in bytes of the outputs that still fit in the disk
+
+        Returns:
+            Tuple | None: priority, sequence, type, initial and final states, features and edge of the transition, or None if no transition can be queued
+        """
+        while len(self.running) < 2 * job_pool.size() and self.paused == 0 and not job_interrupt.is_set():
+            self.fill()
+            
+            if len(self.backlog) == 0:
+                return None
+            
+            transition_type = self.backlog[0][2]
+            
+            if transition_type not in self.edges or self.stored.get(transition_type, 0) >= max_transitions:
+                heapq.heappop(self.backlog)
+                continue
+            
+            # The transitions that do not fit in the disk, counting the outputs still to be written by the running ones,
+            # are kept in the backlog until the rates functions collect some results
+            if budget < (len(self.running) + 1) * transition_footprints.get(transition_type, transition_footprint):
+                return None
+            
+            item = heapq.heappop(self.backlog)
+            
+            self.running[item[1]] = (transition_type, None, [], item[5])
+            self.stored[transition_type] = self.stored.get(transition_type, 0) + 1
+            
+            return item + (self.edges[transition_type],)
         
-        # REMOVE THE .f09 WAVEFUNCTION FILES FOR THE LAST BATCH
-        for wfi_dst, wff_dst in zip(parallel_initial_dst_paths[int((pl + 1) * parallel_max_paths):], parallel_final_dst_paths[int((pl + 1) * parallel_max_paths):]):
-            os.remove(wfi_dst)
-            os.remove(wff_dst)
+        return None
+    
+    def pump(self):
+        """Helper function to move transitions from the backlog to the job pool.
+        Only a few transitions are in the job pool at a time, so the wavefunctions are only copied when they are needed.
+        The transitions are taken under the lock, but their files are written without holding it. The lock must not be held by the caller.
+        """
+        budget = self.diskBudget()
         
-        for path in parallel_paths[int((pl + 1) * parallel_max_paths):]:
-            directory = '/'.join(path.split("/")[:-1]) + "/"
+        while True:
+            with self.lock:
+                item = self.take(budget)
+            
+            if item is None:
+                break
+            
+            priority, sequence, transition_type, state_i, state_f, features, edge = item
+            
+            states_dir_i, states_dir_f, electron_num_i, electron_num_f = edge
+            
+            currDir = self.precalculatedDir(transition_type) + "/" + str(sequence)
+            currFileName = str(sequence)
+            
+            try:
+                currDir_i = rootDir + "/" + directory_name + "/" + states_dir_i + "/" + state_i.getDir()
+                currFileName_i = state_i.getFileName()
+                
+                currDir_f = rootDir + "/" + directory_name + "/" + states_dir_f + "/" + state_f.getDir()
+                currFileName_f = state_f.getFileName()
+                
+                if states_dir_i == states_dir_f:
+                    wfiFile, wffFile = configureTransitionInputFile(f05RadTemplate_nuc, \
+                                                                    currDir, currFileName, \
+                                                                    currFileName_i, \
+                                                                    state_i.configuration, state_i.jj, state_i.eigv, int(electron_num_i), \
+                                                                    currFileName_f, \
+                                                                    state_f.configuration, state_f.jj, state_f.eigv, int(electron_num_f))
+                else:
+                    wfiFile, wffFile = configureTransitionInputFile(f05AugTemplate_nuc, \
+                                                                    currDir, currFileName, \
+                                                                    currFileName_i, \
+                                                                    state_i.configuration, state_i.jj, state_i.eigv, int(electron_num_i), \
+                                                                    currFileName_f, \
+                                                                    state_f.configuration, state_f.jj, state_f.eigv, int(electron_num_f), \
+                                                                    state_i.welt - state_f.welt)
+                
+                wfi_src = currDir_i + "/" + currFileName_i + ".f09"
+                wff_src = currDir_f + "/" + currFileName_f + ".f09"
+                
+                key = (transition_type, wfi_src, wff_src, electron_num_i, electron_num_f)
+                
+                # Status of the wavefunctions used in this calculation
+                status = [self.wavefunctionStatus(wfi_src), self.wavefunctionStatus(wff_src)]
+                
+                stageWavefunction(wfi_src, currDir + "/" + wfiFile + ".f09")
+                stageWavefunction(wff_src, currDir + "/" + wffFile + ".f09")
+            except OSError as error:
+                # The transition is left to the rates functions, which calculate it again
+                print("Error: could not prepare the transition in " + currDir + ": " + str(error))
+                
+                background_cleaner.remove(currDir)
+                
+                with self.lock:
+                    del self.running[sequence]
+                    self.stored[transition_type] -= 1
+                    self.lock.notify_all()
+                
+                continue
+            
+            with self.lock:
+                self.running[sequence] = (transition_type, key, [currDir + "/" + wfiFile + ".f09", currDir + "/" + wffFile + ".f09"], features)
+                self.results[key] = (currDir, status)
+            
+            job_pool.submit(priority, sequence, currDir + "/" + exe_file, self.finished, jobTimeout(transition_type, 1.0 / priority - 1.0), memory = (transition_type, features))
+    
+    def collect_finished(self):
+        """Function running in the background to clean up the finished transitions and queue new ones
+        """
+        while True:
+            sequence, path, return_code, runtime = self.finished.get()
+            
+            with self.lock:
+                transition_type, key, staged_wfs, features = self.running[sequence]
+            
+            # The files are removed before the transition leaves the running ones, so finish() only returns when its directories are clean
+            for wf_path in staged_wfs:
+                if os.path.isfile(wf_path):
+                    os.remove(wf_path)
+            
+            directory = os.path.dirname(path) + "/"
             for filename in os.listdir(directory):
                 if ".f05" not in filename and ".f06" not in filename:
                     if os.path.isfile(directory + filename):
                         os.remove(directory + filename)
                     else:
                         shutil.rmtree(directory + filename)
-        
+            
+            if return_code == 0 and runtime is not None:
+                job_cost_model.record(transition_type, features, runtime)
+            
+            with self.lock:
+                del self.running[sequence]
+                
+                if return_code != 0 and key in self.results:
+                    del self.results[key]
+                    self.stored[transition_type] -= 1
+                
+                self.lock.notify_all()
+            
+            self.pump()
+    
+    def finish(self, transition_type: str):
+        """Function to stop queueing a type of transitions and wait for the ones already in the job pool
+
+        Args:
+            transition_type (str): type of transition
+        """
+        with self.lock:
+            if transition_type in self.edges:
+                del self.edges[transition_type]
+            
+            self.lock.wait_for(lambda: all(running[0] != transition_type for running in self.running.values()))
     
+    def collect(self, transition_type: str, wfi_src: str, wff_src: str, electron_num_i: str, electron_num_f: str, currDir: str, currFileName: str) -> bool:
+        """Function to collect a transition that has already been calculated, moving its output to where the rates functions read it from
+
+        Args:
+            transition_type (str): type of transition
+            wfi_src (str): path to the .f09 wavefunction file of the initial state
+            wff_src (str): path to the .f09 wavefunction file of the final state
+            electron_num_i (str): number of electrons in the initial configurations
+            electron_num_f (str): number of electrons in the final configurations
+            currDir (str): directory of the transition outputs in the rates functions
+            currFileName (str): filename of the transition output in the rates functions
+
+        Returns:
+            bool: True if the transition was collected, False if it needs to be calculated
+        """
+        with self.lock:
+            result = self.results.pop((transition_type, wfi_src, wff_src, str(int(electron_num_i)), str(int(electron_num_f))), None)
+            
+            if result is not None:
+                self.stored[transition_type] -= 1
+        
+        if result is None:
+            return False
+        
+        resultDir, status = result
+        resultFileName = os.path.basename(resultDir)
+        
+        # Only use this output if the wavefunctions did not change since it was calculated
+        if status != [self.wavefunctionStatus(wfi_src), self.wavefunctionStatus(wff_src)] or not os.path.isfile(resultDir + "/" + resultFileName + ".f06"):
+            shutil.rmtree(resultDir)
+            return False
+        
+        if not os.path.exists(currDir):
+            os.makedirs(currDir)
+        
+        shutil.move(resultDir + "/" + resultFileName + ".f06", currDir + "/" + currFileName + ".f06")
+        shutil.rmtree(resultDir)
+        
+        return True
     
+    def discard(self, transition_type: str):
+        """Function to remove the outputs of a type of transitions that were not collected
+
+        Args:
+            transition_type (str): type of transition
+        """
+        with self.lock:
+            for key in [key for key in self.results if key[0] == transition_type]:
+                del self.results[key]
+            
+            self.stored[transition_type] = 0
+        
+        background_cleaner.remove(self.precalculatedDir(transition_type))
+
+
+# Scheduler of the transitions calculated while the states are converging
+transition_precalculator = TransitionPrecalculator()
+
+
 def writeResultsState(file_cycle_log: str, file_final_per_type: str, state_mod: str, calculatedStates: List[State], by_hand: List[int], update: bool=False):
     """Write the results of the state calculations from the calculatedStates into
     the file_cycle_log and file_final_per_type files with the proper formating.
@@ -2631,7 +5711,7 @@ def writeResultsState(file_cycle_log: str, file_final_per_type: str, state_mod:
 
 
 def writeResultsTransitionAuger(rates_file: str, transition_mod: str,
-                           calculatedTransitions: List[Transition], startingCnt: int, batch: int, \
+                           calculatedTransitions: List[Transition], startingCnt: int, batch_start: int, \
                            energies: List[float], rates: List[float], total_rates: Dict[tuple, float]):
     """Helper function to update the transition list and write it to the rates file
 
@@ -2639,22 +5719,23 @@ def writeResultsTransitionAuger(rates_file: str, transition_mod: str,
         rates_file (str): filename for the rates file
         transition_mod (str): transition type modifier to format the rates file
         calculatedTransitions (List[Transition]): list of the transitions to update and print
-        batch (int): batch number from where to start writing the transitions
+        startingCnt (int): index of the first transition in the energies and rates
+        batch_start (int): index of the first transition of the batch, from where to start writing the transitions
         rates (List[float]): list of the rates for the transitions
         total_rates (Dict[tuple, float]): dictionary with the total rates form the initial LS shell for the transitions
     """
-    with open(rates_file, ("w" if batch == 0 else "a")) as rates_f:
-        if batch == 0:
+    with open(rates_file, ("w" if batch_start == 0 else "a")) as rates_f:
+        if batch_start == 0:
             rates_f.write("Calculated " + transition_mod + " Transitions\nTransition register\tShell IS\tIS Configuration\tIS 2JJ\tIS eigenvalue\tIS higher configuration\tIS percentage\tShell FS\tFS Configuration\tFS 2JJ\tFS eigenvalue\tFS higher configuration\tFS percentage\ttransition energy [eV]\trate [s-1]\ttotal rate from IS\tbranching ratio\n")
                 
-        for combCnt, transition in enumerate(calculatedTransitions[int(batch * max_transitions):], int(batch * max_transitions)):
+        for combCnt, transition in enumerate(calculatedTransitions[batch_start:], batch_start):
             transition.set_parameters(energies[combCnt - startingCnt], rates[combCnt - startingCnt], total_rates[tuple(transition.qnsi())])
             
             rates_f.write(str(combCnt) + "\t" + str(transition) + "\n")
 
 
 def writeResultsTransition(rates_file: str, transition_mod: str,  
-                           calculatedTransitions: List[Transition], startingCnt: int, batch: int, \
+                           calculatedTransitions: List[Transition], startingCnt: int, batch_start: int, \
                            energies: List[float], rates: List[float], total_rates: Dict[tuple, float], multipole_array: list, \
                            shakeup_configs: bool = False):
     """Helper function to update the transition list and write it to the rates file
@@ -2663,17 +5744,18 @@ def writeResultsTransition(rates_file: str, transition_mod: str,
         rates_file (str): filename for the rates file
         transition_mod (str): transition type modifier to format the rates file
         calculatedTransitions (List[Transition]): list of the transitions to update and print
-        batch (int): batch number from where to start writing the transitions
+        startingCnt (int): index of the first transition in the energies and rates
+        batch_start (int): index of the first transition of the batch, from where to start writing the transitions
         rates (List[float]): list of the rates for the transitions
         total_rates (Dict[tuple, float]): dictionary of the total rates from the initial LS shell for the transitions
         multipole_array (list): list of the multipoles and rates for each transition
         shakeup_configs (bool, optional): flag for shakeup configurations, which is used to filter monopolar excitations. Defaults to False.
     """
-    with open(rates_file, ("w" if batch == 0 else "a")) as rates_f:
-        if batch == 0:
+    with open(rates_file, ("w" if batch_start == 0 else "a")) as rates_f:
+        if batch_start == 0:
             rates_f.write("Calculated " + transition_mod + " Transitions\nTransition register\tShell IS\tIS Configuration\tIS 2JJ\tIS eigenvalue\tIS higher configuration\tIS percentage\tShell FS\tFS Configuration\tFS 2JJ\tFS eigenvalue\tFS higher configuration\tFS percentage\ttransition energy [eV]\trate [s-1]\tnumber multipoles\ttotal rate from IS\tbranching ratio\n")
         
-        for combCnt, transition in enumerate(calculatedTransitions[int(batch * max_transitions):], int(batch * max_transitions)):
+        for combCnt, transition in enumerate(calculatedTransitions[batch_start:], batch_start):
             if shakeup_configs:
                 # Filter for monopolar excitations
                 if not checkMonopolar(transition.shell1, transition.jj1):
@@ -2780,8 +5862,6 @@ def calculateStates(shell_labels: List[str], sub_dir: str, electron_configuratio
                 currFileName = state.getFileName()
                 
                 configureStateInputFile(f05Template_nuc, currDir, currFileName, state.configuration, state.jj, state.eigv, [], str(electron_number))
-                
-                parallel_paths.append(currDir + "/" + exe_file)
         
         
         with open(file_cycle_log, "a") as log:
@@ -2792,362 +5872,275 @@ def calculateStates(shell_labels: List[str], sub_dir: str, electron_configuratio
             log.write("ListEnd\n")
     
     
-    # Variables to control if the last calculated state has been reached in each cycle
-    found_cycle1 = False
-    found_cycle2 = False
-    found_cycle3 = False
-    found_cycle4 = False
+    # -------------- CONVERGENCE CYCLES FOR EACH STATE -------------- #
     
-    # If no starting cycle has been defined or the starting cycle is 1
-    if starting_cycle < 1:
-        # Counter for the first state to be calculated in the state lists
-        start_counter = 0
-        
-        # If the starting cycle is 1 we search for the starting state in the list
-        if starting_cycle == 0:
-            counter = 0
-            for state in calculatedStates:
-                if found_cycle1 or starting_state == [0, 0, 0]:
-                    currDir = rootDir + "/" + directory_name + "/" + sub_dir + "/" + state.getDir()
-                    currFileName = state.getFileName()
-                    
-                    parallel_paths.append(currDir + "/" + exe_file)
-                
-                counter += 1
-                
-                # Search for the starting state
-                if state.match(starting_state):
-                    found_cycle1 = True
-                    start_counter = counter
-                
-        
-        # Execute parallel batch job with logging of calculated state
-        executeBatchStateCalculation(parallel_paths, file_cycle_log, calculatedStates[start_counter:], "First Cycle Last Calculated:\n")
+    # Each state goes through the convergence cycles independently of the others:
+    # 1 - default input, 2 - 10 steps, 3 - 10 steps with the failed orbital, 4 - 10 steps with the second failed orbital
+    # The next cycle of a state is queued as soon as its output is checked
+    cycle_labels = ["First", "Second", "Third", "Fourth"]
     
+    # Cycle of the current input file of each state and last cycle already checked for each state (4 when the state is done)
+    input_cycle: List[int] = [1] * len(calculatedStates)
+    checked_cycle: List[int] = [0] * len(calculatedStates)
     
+    failed_states: List[int] = []
     
-    failed_first_cycle: List[int] = []
-    parallel_failed: List[str] = []
-    parallel_failed_counters: List[int] = []
+    state_paths: Dict[str, int] = {}
+    for counter, state in enumerate(calculatedStates):
+        state_paths[rootDir + "/" + directory_name + "/" + sub_dir + "/" + state.getDir() + "/" + exe_file] = counter
     
-    # -------------- FIRST CYCLE FOR CONVERGENCE CHECK -------------- #
     
-    # If no starting cycle has been defined or the starting cycle is 1
-    if starting_cycle <= 1:
-        # Even if the starting cycle is 1 it means that the calculation has finished in the last executeBatchStateCalculation
-        counter = 0
-        for state in calculatedStates:
-            currDir = rootDir + "/" + directory_name + "/" + sub_dir + "/" + state.getDir()
-            currFileName = state.getFileName()
-            
-            converged, failed_orbital, overlap, higher_config, highest_percent, accuracy, Diff, welt = checkOutput(currDir, currFileName)
-            
-            state.set_parameters(converged, higher_config, highest_percent, float(overlap), accuracy, Diff, welt)
-            
-            if not converged:
-                configureStateInputFile(f05Template_10steps_nuc, currDir, currFileName, state.configuration, state.jj, state.eigv, [], str(electron_number))
-            
-                parallel_failed.append(currDir + "/" + exe_file)
-                parallel_failed_counters.append(counter)
-                failed_first_cycle.append(counter)
-            else:
-                if not state.converged(diffThreshold, overlapsThreshold, accThreshold):
-                    configureStateInputFile(f05Template_10steps_nuc, currDir, currFileName, state.configuration, state.jj, state.eigv, [], str(electron_number))
-            
-                    parallel_failed.append(currDir + "/" + exe_file)
-                    parallel_failed_counters.append(counter)
-                    failed_first_cycle.append(counter)
-            
-            counter += 1
+    def checkState(counter: int, return_code: int | None = None) -> bool:
+        """Helper function to check the output of the current cycle of a state and configure its next cycle
         
-        parallel_failed_counters.append(counter - 1)
+        Args:
+            counter (int): index of the state in the calculatedStates list
+            return_code (int | None, optional): return code of the calculation, None if it finished in a previous run. Defaults to None.
         
-        # -------------- PRINT FIRST CYCLE RESULTS -------------- #
+        Returns:
+            bool: True if the state needs to be calculated again
+        """
+        state = calculatedStates[counter]
         
-        with open(file_results, "a") as resultDump:
-            resultDump.write("First Cycle " + resultDump_mod + " states\nShell, Shell index, 2J, Eigv, Higher Configuration, Percentage, Overlap, Accuracy, Energy Difference, Energy Welton\n")
-            for state in calculatedStates:
-                resultDump.write(state.shell + ", " + str(state) + "\n")
+        currDir = rootDir + "/" + directory_name + "/" + sub_dir + "/" + state.getDir()
+        currFileName = state.getFileName()
         
-    
-    
-    
-    # If no starting cycle has been defined or the starting cycle is 1 or 2
-    if starting_cycle < 2:
-        # If the starting cycle is 2 we search for the starting state in the list and fill in the failed_first_cycle list
-        if starting_cycle == 1:
-            counter = 0
-            for state in calculatedStates:
-                if found_cycle2 or starting_state == [0, 0, 0]:
-                    currDir = rootDir + "/" + directory_name + "/" + sub_dir + "/" + state.getDir()
-                    currFileName = state.getFileName()
-                    
-                    converged, failed_orbital, overlap, higher_config, highest_percent, accuracy, Diff, welt = checkOutput(currDir, currFileName)
-                    
-                    state.set_parameters(converged, higher_config, highest_percent, float(overlap), accuracy, Diff, welt)
-                    
-                    if not converged:
-                        # Only add this state to the calculation if we reached the starting state
-                        if found_cycle2 or starting_state == [0, 0, 0]:
-                            parallel_failed.append(currDir + "/" + exe_file)
-                            parallel_failed_counters.append(counter)
-                        
-                        failed_first_cycle.append(counter)
-                    else:
-                        if not state.converged(diffThreshold, overlapsThreshold, accThreshold):
-                            # Only add this state to the calculation if we reached the starting state
-                            if found_cycle2 or starting_state == [0, 0, 0]:
-                                parallel_failed.append(currDir + "/" + exe_file)
-                                parallel_failed_counters.append(counter)
-                            
-                            failed_first_cycle.append(counter)
-                
-                counter += 1
-                
-                # Search for the starting state
-                if state.match(starting_state):
-                    found_cycle2 = True
-            
-            parallel_failed_counters.append(counter - 1)    
+        previous_complete, previous_accuracy = state.complete, state.accuracy
         
-        if len(parallel_failed) == 0:
-            writeResults()
-            return
+        converged, failed_orbital, overlap, higher_config, highest_percent, accuracy, Diff, welt = checkOutput(currDir, currFileName)
         
-        # Execute parallel batch job with logging of calculated state
-        executeBatchStateCalculation(parallel_failed, file_cycle_log, [state for i, state in enumerate(calculatedStates) if i in parallel_failed_counters], "Second Cycle Last Calculated:\n")
-    
-    
-    failed_second_cycle: List[int] = []
-    parallel_failed: List[str] = []
-    parallel_failed_counters: List[int] = []
-    
-    # -------------- SECOND CYCLE FOR CONVERGENCE CHECK WITH FAILED ORBITALS -------------- #
-    
-    # If no starting cycle has been defined or the starting cycle is 1 or 2
-    if starting_cycle <= 2:
-        # Even if the starting cycle is 2 it means that the calculation has finished in the last executeBatchStateCalculation
-        # After having filled the failed_first_cycle list we can continue the calculation
-        counter: int = 0
-        for counter in failed_first_cycle:
-            state = calculatedStates[counter]
-            
-            currDir = rootDir + "/" + directory_name + "/" + sub_dir + "/" + state.getDir()
-            currFileName = state.getFileName()
-            
-            converged, failed_orbital, overlap, higher_config, highest_percent, accuracy, Diff, welt = checkOutput(currDir, currFileName)
-            
-            failed_orbs = [failed_orbital.strip() + "  1 5 0 1 :"]
-            
-            state.set_parameters(converged, higher_config, highest_percent, float(overlap), accuracy, Diff, welt, failed_orbs)
+        clean = return_code == 0 and converged
+        seeded = finishSeededRun(currDir, currFileName, clean)
+        
+        cycle = input_cycle[counter]
+        
+        # A seeded calculation that ended up worse than the previous attempt, or whose wavefunction was not kept, is repeated from scratch
+        if seeded:
+            seeded_state = copy.deepcopy(state)
+            seeded_state.set_parameters(converged, higher_config, highest_percent, float(overlap), accuracy, Diff, welt)
             
-            if not converged:
-                if failed_orbital != '':
+            if not clean or (not seeded_state.converged(diffThreshold, overlapsThreshold, accThreshold) and \
+                seedWorse(previous_complete, previous_accuracy, converged, accuracy)):
+                if cycle == 2:
+                    configureStateInputFile(f05Template_10steps_nuc, currDir, currFileName, state.configuration, state.jj, state.eigv, [], str(electron_number))
+                else:
                     configureStateInputFile(f05Template_10steps_Forbs_nuc, currDir, currFileName, state.configuration, state.jj, state.eigv, state.failed_orbs, str(electron_number))
-            
-                    parallel_failed.append(currDir + "/" + exe_file)
-                    parallel_failed_counters.append(counter)
-                    
                 
-                failed_second_cycle.append(counter)
-            else:
-                if not state.converged(diffThreshold, overlapsThreshold, accThreshold):
-                    if failed_orbital != '':
-                        configureStateInputFile(f05Template_10steps_Forbs_nuc, currDir, currFileName, state.configuration, state.jj, state.eigv, state.failed_orbs, str(electron_number))
-            
-                        parallel_failed.append(currDir + "/" + exe_file)
-                        parallel_failed_counters.append(counter)
-                    
-                    failed_second_cycle.append(counter)
-        
-        parallel_failed_counters.append(counter - 1)
+                return True
         
-        # -------------- PRINT SECOND CYCLE RESULTS -------------- #
-        
-        with open(file_results, "a") as resultDump:
-            resultDump.write("Second Cycle " + resultDump_mod + " states\nShell, Shell index, 2J, Eigv, Higher Configuration, Percentage, Overlap, Accuracy, Energy Difference, Energy Welton\n")
-            for state in calculatedStates:
-                resultDump.write(state.shell + ", " + str(state) + "\n")
-    
-    
-    # If no starting cycle has been defined or the starting cycle is 1, 2 or 3
-    if starting_cycle < 3:
-        # If the starting cycle is 3 we search for the starting state in the list and fill in the failed_second_cycle list
-        if starting_cycle == 2:
-            counter = 0
-            for state in calculatedStates:
-                currDir = rootDir + "/" + directory_name + "/" + sub_dir + "/" + state.getDir()
-                currFileName = state.getFileName()
-                
-                converged, failed_orbital, overlap, higher_config, highest_percent, accuracy, Diff, welt = checkOutput(currDir, currFileName)
+        # If a cycle does not need to be calculated the same output is checked with the rules of the next one
+        while True:
+            if cycle == 2:
+                state.set_parameters(converged, higher_config, highest_percent, float(overlap), accuracy, Diff, welt, [failed_orbital.strip() + "  1 5 0 1 :"])
+            else:
+                if cycle == 3 and failed_orbital != '':
+                    state.failed_orbs.append("    " + failed_orbital.strip() + "  1 5 0 1 :")
                 
                 state.set_parameters(converged, higher_config, highest_percent, float(overlap), accuracy, Diff, welt)
+            
+            checked_cycle[counter] = cycle
+            
+            if state.converged(diffThreshold, overlapsThreshold, accThreshold):
+                checked_cycle[counter] = 4
                 
-                if not converged:
-                    # Only add this state to the calculation if we reached the starting state
-                    if found_cycle3 or starting_state == [0, 0, 0]:
-                        parallel_failed.append(currDir + "/" + exe_file)
-                        parallel_failed_counters.append(counter)
-                    
-                    failed_second_cycle.append(counter)
-                else:
-                    if not state.converged(diffThreshold, overlapsThreshold, accThreshold):
-                        # Only add this state to the calculation if we reached the starting state
-                        if found_cycle3 or starting_state == [0, 0, 0]:
-                            parallel_failed.append(currDir + "/" + exe_file)
-                            parallel_failed_counters.append(counter)
-                        
-                        failed_second_cycle.append(counter)
-                
-                counter += 1
+                # The transitions of this state can already be calculated
+                transition_precalculator.stateConverged(sub_dir, state)
+                return False
+            
+            if cycle == 1:
+                configureStateInputFile(f05Template_10steps_nuc, currDir, currFileName, state.configuration, state.jj, state.eigv, [], str(electron_number))
+                seedStateInput(currDir, currFileName)
+                input_cycle[counter] = 2
+                return True
+            elif cycle == 2 and failed_orbital != '':
+                configureStateInputFile(f05Template_10steps_Forbs_nuc, currDir, currFileName, state.configuration, state.jj, state.eigv, state.failed_orbs, str(electron_number))
+                seedStateInput(currDir, currFileName)
+                input_cycle[counter] = 3
+                return True
+            elif cycle == 3 and len(state.failed_orbs) == 2:
+                if state.failed_orbs[0] == "  1 5 0 1 :":
+                    del state.failed_orbs[0]
                 
-                if state.match(starting_state):
-                    found_cycle3 = True
-                    start_counter = counter
+                configureStateInputFile(f05Template_10steps_Forbs_nuc, currDir, currFileName, state.configuration, state.jj, state.eigv, state.failed_orbs, str(electron_number))
+                seedStateInput(currDir, currFileName)
+                input_cycle[counter] = 4
+                return True
+            elif cycle == 4:
+                failed_states.append(counter)
+                return False
             
-            parallel_failed_counters.append(counter - 1)
-        
-        if len(parallel_failed) == 0:
-            writeResults()
-            return
-        
-        # Execute parallel batch job with logging of calculated state
-        executeBatchStateCalculation(parallel_failed, file_cycle_log, [state for i, state in enumerate(calculatedStates) if i in parallel_failed_counters], "Third Cycle Last Calculated:\n")
-    
+            cycle += 1
     
-    failed_third_cycle: List[int] = []
-    parallel_failed: List[str] = []
-    parallel_failed_counters: List[int] = []
     
-    # -------------- THIRD CYCLE FOR CONVERGENCE CHECK WITH FAILED ORBITALS -------------- #
+    # Cycle being logged, number of states that have already checked this cycle and number of those already written to the log
+    log_cycle = max(starting_cycle, 1)
+    log_position = 0
+    log_written = 0
     
-    # If no starting cycle has been defined or the starting cycle is 1 or 2
-    if starting_cycle <= 3:
-        # Even if the starting cycle is 3 it means that the calculation has finished in the last executeBatchStateCalculation
-        # After having filled the failed_second_cycle list we can continue the calculation
-        counter: int = 0
-        for counter in failed_second_cycle:
-            state = calculatedStates[counter]
-            
-            currDir = rootDir + "/" + directory_name + "/" + sub_dir + "/" + state.getDir()
-            currFileName = state.getFileName()
-            
-            converged, failed_orbital, overlap, higher_config, highest_percent, accuracy, Diff, welt = checkOutput(currDir, currFileName)
-            
-            if failed_orbital != '':
-                state.failed_orbs.append("    " + failed_orbital.strip() + "  1 5 0 1 :")
-            
-            
-            if not converged:
-                if state.failed_orbs[0] != "  1 5 0 1 :" and len(state.failed_orbs) == 2:
-                    configureStateInputFile(f05Template_10steps_Forbs_nuc, currDir, currFileName, state.configuration, state.jj, state.eigv, state.failed_orbs, str(electron_number))
+    def logStates():
+        """Helper function to write the progress of the states into the cycle log.
+        For each cycle we log the last state of the longest prefix of the list where that cycle has been checked.
+        The header of a cycle is only written when the previous cycle has been checked for all states.
+        """
+        nonlocal log_cycle, log_position, log_written
+        
+        while log_cycle <= 4:
+            while log_position < len(calculatedStates) and checked_cycle[log_position] >= log_cycle:
+                log_position += 1
             
-                    parallel_failed.append(currDir + "/" + exe_file)
-                    parallel_failed_counters.append(counter)
-                elif len(state.failed_orbs) == 2:
-                    del state.failed_orbs[0]
+            if log_position < len(calculatedStates):
+                if log_position - log_written >= log_checkpoint_interval:
+                    with open(file_cycle_log, "a") as log:
+                        log.write(', '.join(calculatedStates[log_position - 1].qns_s()) + "\n")
                     
-                    configureStateInputFile(f05Template_10steps_Forbs_nuc, currDir, currFileName, state.configuration, state.jj, state.eigv, state.failed_orbs, str(electron_number))
+                    log_written = log_position
+                
+                return
             
-                    parallel_failed.append(currDir + "/" + exe_file)
-                    parallel_failed_counters.append(counter)
+            with open(file_cycle_log, "a") as log:
+                if log_written < log_position:
+                    log.write(', '.join(calculatedStates[-1].qns_s()) + "\n")
                 
-                failed_third_cycle.append(counter)
-            else:
-                if not state.converged(diffThreshold, overlapsThreshold, accThreshold):
-                    if state.failed_orbs[0] != "  1 5 0 1 :" and len(state.failed_orbs) == 2:
-                        configureStateInputFile(f05Template_10steps_Forbs_nuc, currDir, currFileName, state.configuration, state.jj, state.eigv, state.failed_orbs, str(electron_number))
+                if log_cycle < 4:
+                    log.write(cycle_labels[log_cycle] + " Cycle Last Calculated:\n")
             
-                        parallel_failed.append(currDir + "/" + exe_file)
-                        parallel_failed_counters.append(counter)
-                    elif len(state.failed_orbs) == 2:
-                        del state.failed_orbs[0]
-                        
-                        configureStateInputFile(f05Template_10steps_Forbs_nuc, currDir, currFileName, state.configuration, state.jj, state.eigv, state.failed_orbs, str(electron_number))
+            # -------------- PRINT THE RESULTS OF THE CYCLE -------------- #
             
-                        parallel_failed.append(currDir + "/" + exe_file)
-                        parallel_failed_counters.append(counter)
-                
-                failed_third_cycle.append(counter)
+            if log_cycle < 4:
+                with file_results_lock, open(file_results, "a") as resultDump:
+                    resultDump.write(cycle_labels[log_cycle - 1] + " Cycle " + resultDump_mod + " states\nShell, Shell index, 2J, Eigv, Higher Configuration, Percentage, Overlap, Accuracy, Energy Difference, Energy Welton\n")
+                    for state in calculatedStates:
+                        resultDump.write(state.shell + ", " + str(state) + "\n")
             
-            state.set_parameters(converged, higher_config, highest_percent, float(overlap), accuracy, Diff, welt)
-        
-        parallel_failed_counters.append(counter - 1)
-        
-        # -------------- PRINT THIRD CYCLE RESULTS -------------- #
-        
-        with open(file_results, "a") as resultDump:
-            resultDump.write("Third Cycle " + resultDump_mod + " states\nShell, Shell index, 2J, Eigv, Higher Configuration, Percentage, Overlap, Accuracy, Energy Difference, Energy Welton\n")
-            for state in calculatedStates:
-                resultDump.write(state.shell + ", " + str(state) + "\n")
+            log_cycle += 1
+            log_position = 0
+            log_written = 0
     
     
+    parallel_paths = []
     
-    # If the starting cycle is 4 we search for the starting state in the list and fill in the failed_third_cycle list
-    if starting_cycle == 4:
-        counter = 0
+    if starting_cycle < 1:
+        with open(file_cycle_log, "a") as log:
+            log.write("First Cycle Last Calculated:\n")
+        
         for state in calculatedStates:
+            parallel_paths.append(rootDir + "/" + directory_name + "/" + sub_dir + "/" + state.getDir() + "/" + exe_file)
+    else:
+        # The log states that all states have checked the cycles before the starting cycle
+        # and the states up to the starting state have also checked the starting cycle
+        starting_position = 0
+        for counter, state in enumerate(calculatedStates):
+            if state.match(starting_state):
+                starting_position = counter + 1
+        
+        log_position = starting_position
+        log_written = starting_position
+        
+        for counter, state in enumerate(calculatedStates):
             currDir = rootDir + "/" + directory_name + "/" + sub_dir + "/" + state.getDir()
             currFileName = state.getFileName()
             
-            converged, failed_orbital, overlap, higher_config, highest_percent, accuracy, Diff, welt = checkOutput(currDir, currFileName)
+            cycle, failed_orbs = readStateInputCycle(currDir, currFileName)
             
-            state.set_parameters(converged, higher_config, highest_percent, float(overlap), accuracy, Diff, welt)
+            if cycle == 0:
+                configureStateInputFile(f05Template_nuc, currDir, currFileName, state.configuration, state.jj, state.eigv, [], str(electron_number))
+                cycle = 1
             
-            if not converged:
-                # Only add this state to the calculation if we reached the starting state
-                if found_cycle4 or starting_state == [0, 0, 0]:
-                    parallel_failed.append(currDir + "/" + exe_file)
-                    parallel_failed_counters.append(counter)
-                
-                failed_third_cycle.append(counter)
-            else:
-                if not state.converged(diffThreshold, overlapsThreshold, accThreshold):
-                    # Only add this state to the calculation if we reached the starting state
-                    if found_cycle4 or starting_state == [0, 0, 0]:
-                        parallel_failed.append(currDir + "/" + exe_file)
-                        parallel_failed_counters.append(counter)
-                    
-                    failed_third_cycle.append(counter)
+            input_cycle[counter] = cycle
+            state.failed_orbs = failed_orbs if failed_orbs != [] else ["  1 5 0 1 :"]
             
-            counter += 1
+            # The output of the current input file is only known to be complete if the log covers it
+            output_checked = cycle < starting_cycle or (cycle == starting_cycle and counter < starting_position)
             
-            if state.match(starting_state):
-                found_cycle4 = True
+            if output_checked and os.path.isfile(currDir + "/" + currFileName + ".f06"):
+                if checkState(counter):
+                    parallel_paths.append(currDir + "/" + exe_file)
+            else:
+                checked_cycle[counter] = cycle - 1
+                parallel_paths.append(currDir + "/" + exe_file)
+    
+    
+    def stateFeatures(idx: int, path: str) -> Tuple[str, List[float]]:
+        """Helper function to get the kind and features of a state calculation for the job cost model
+        
+        Args:
+            idx (int): position of the calculation in the job stream
+            path (str): path to the executable of the state
+        
+        Returns:
+            Tuple[str, List[float]]: kind of calculation, which depends on the type of states and the cycle, and the features of the state
+        """
+        counter = state_paths[path]
+        state = calculatedStates[counter]
         
-        parallel_failed_counters.append(counter - 1)
-    
-    if len(parallel_failed) == 0:
-        writeResults()
-        return
+        return "state_" + sub_dir + "_" + str(electron_number) + "_cycle" + str(input_cycle[counter]), \
+            JobCostModel.features(electron_number, state.configuration, state.jj, state.eigv)
     
-    # Execute parallel batch job with logging of calculated state
-    executeBatchStateCalculation(parallel_failed, file_cycle_log, [state for i, state in enumerate(calculatedStates) if i in parallel_failed_counters], "Fourth Cycle Last Calculated:\n")
     
-    
-    # -------------- FOURTH CYCLE TO CHECK WHICH STATES NEED TO BE REDONE BY HAND -------------- #
-    
-    # If no starting cycle has been defined or the starting cycle is 1, 2, 3 or 4
-    for counter in failed_third_cycle:
-        state = calculatedStates[counter]
+    def stateDone(idx: int, path: str, return_code: int) -> List[str]:
+        """Helper function to check a finished state calculation and queue its next cycle if needed
         
-        currDir = rootDir + "/" + directory_name + "/" + sub_dir + "/" + state.getDir()
-        currFileName = state.getFileName()
+        Args:
+            idx (int): position of the calculation in the job stream
+            path (str): path to the executable of the finished state
+            return_code (int): return code of the calculation
         
-        converged, failed_orbital, overlap, higher_config, highest_percent, accuracy, Diff, welt = checkOutput(currDir, currFileName)
+        Returns:
+            List[str]: list with the path of the state if it needs to be calculated again
+        """
+        recalculate = checkState(state_paths[path], return_code)
         
-        state.set_parameters(converged, higher_config, highest_percent, float(overlap), accuracy, Diff, welt)
+        logStates()
         
-        if not converged:
-            by_hand.append(counter)
-        else:
-            if not state.converged(diffThreshold, overlapsThreshold, accThreshold):
-                by_hand.append(counter)
+        return [path] if recalculate else []
+    
+    
+    logStates()
+    
+    # Execute parallel job with the retries of each state queued as soon as they are needed
+    executeJobs(parallel_paths, stateDone, stateFeatures, monitor_scf = scf_monitor_iterations > 0)
+    
+    logStates()
+    
+    
+    # -------------- STATES THAT NEED TO BE REDONE BY HAND -------------- #
+    
+    by_hand.extend(sorted(failed_states))
     
     
     # -------------- WRITE RESULTS TO THE FILES -------------- #
     
-    writeResults()
+    # The result files are shared by all state types
+    with file_results_lock:
+        writeResults()
+
+
+def calculateStatesConcurrently(calculations: List[Callable[[], None]]):
+    """Function to calculate several types of states at the same time.
+    Each calculateStates call runs in its own thread and all of them share the job pool,
+    while each type still writes its own cycle log and results.
+    
+    Args:
+        calculations (List[Callable[[], None]]): list of calculateStates calls for each type of state, with all arguments set
+    """
+    errors: List[BaseException] = []
+    
+    def run(calculation: Callable[[], None]):
+        try:
+            calculation()
+        except BaseException as error:
+            errors.append(error)
+    
+    threads = [threading.Thread(target = run, args = (calculation,)) for calculation in calculations]
+    
+    for thread in threads:
+        thread.start()
+    
+    for thread in threads:
+        thread.join()
+    
+    if len(errors) > 0:
+        raise errors[0]
 
 
 def checkMonopolar(excited_shell_label: str, jj: int) -> bool:
@@ -3304,6 +6297,195 @@ def readTransition(currDir: str, currFileName: str, radiative: bool = True) -> \
     
 
 
+# Size in bytes of the outputs of a transition for each type of transitions, measured in the last batch
+transition_footprints: Dict[str, float] = {}
+
+
+def readTransitionBatches(transitions_dir: str, restart: bool) -> List[int]:
+    """Helper function to read where the batches of a type of transitions that were already written to the rates file ended.
+    The batches are sized at runtime, so these are needed to resume the calculation in the same batch where it stopped.
+
+    Args:
+        transitions_dir (str): directory name for the transitions of this type
+        restart (bool): flag to start these transitions from the beginning, which removes the batches from a previous run
+
+    Returns:
+        List[int]: index of the transition after the end of each finished batch
+    """
+    batches_file = rootDir + "/" + directory_name + "/transitions/" + transitions_dir + ".batches"
+    
+    if restart and os.path.isfile(batches_file):
+        os.remove(batches_file)
+    
+    batch_ends: List[int] = []
+    
+    if os.path.isfile(batches_file):
+        with open(batches_file, "r") as batches:
+            for line in batches:
+                if line.strip() != '':
+                    batch_end, footprint = line.split()
+                    batch_ends.append(int(batch_end))
+                    transition_footprints[transitions_dir] = float(footprint)
+    
+    return batch_ends
+
+
+def logTransitionBatch(transitions_dir: str, batch_start: int, batch_end: int, batch_size: float):
+    """Helper function to log the end of a batch of transitions once it is written to the rates file
+
+    Args:
+        transitions_dir (str): directory name for the transitions of this type
+        batch_start (int): index of the first transition of the batch
+        batch_end (int): index of the transition after the end of the batch
+        batch_size (float): size in bytes of the outputs of the batch
+    """
+    if batch_end > batch_start:
+        transition_footprints[transitions_dir] = batch_size / (batch_end - batch_start)
+    
+    with open(rootDir + "/" + directory_name + "/transitions/" + transitions_dir + ".batches", "a") as batches:
+        batches.write(str(batch_end) + " " + str(transition_footprints.get(transitions_dir, transition_footprint)) + "\n")
+
+
+def transitionBatchEnd(transitions_dir: str, batch_start: int, combCnt: int, batch_ends: List[int], started: bool, released: float = 0.0) -> int | None:
+    """Helper function to choose where the current batch of transitions ends.
+    The batches that were finished before end where they ended. Otherwise the batch holds the transitions whose outputs fit in the free space
+    of the disk up to transitions_disk_high_water, between min_transitions and max_transitions.
+
+    Args:
+        transitions_dir (str): directory name for the transitions of this type
+        batch_start (int): index of the first transition of the batch
+        combCnt (int): index of the current transition
+        batch_ends (List[int]): index of the transition after the end of each finished batch
+        started (bool): flag for when the transition from where to start calculating has been found
+        released (float, optional): size in bytes of the outputs of the last batch that are still being removed. Defaults to 0.0.
+
+    Returns:
+        int | None: index of the transition after the end of the batch, or None if it cannot be chosen yet
+    """
+    for batch_end in batch_ends:
+        if batch_end > batch_start:
+            return batch_end
+    
+    # When resuming the batch can only end after the transition from where to start calculating
+    if not started:
+        return None
+    
+    usage = shutil.disk_usage(rootDir + "/" + directory_name + "/transitions")
+    budget = usage.free + released - (1.0 - transitions_disk_high_water) * usage.total
+    
+    batch_size = budget / transition_footprints.get(transitions_dir, transition_footprint)
+    
+    return combCnt + int(max(min_transitions, min(batch_size, max_transitions)))
+
+
+class TransitionJournal:
+    def __init__(self, transitions_dir: str, radiative: bool, restart: bool):
+        """Append-only journal of the finished transitions of the current batch, with the energy and rate read from their outputs.
+        When the calculation is resumed the transitions in the journal are not calculated again and their outputs are not read again.
+        The journal is synced to disk every journal_sync_interval transitions or journal_sync_time seconds,
+        and cleared when its batch is written to the rates file.
+        
+        Args:
+            transitions_dir (str): directory name for the transitions of this type
+            radiative (bool): flag for radiative transitions, which also have the multipole rate decomposition
+            restart (bool): flag to start these transitions from the beginning, which removes the journal from a previous run
+        """
+        self.path = rootDir + "/" + directory_name + "/transitions/" + transitions_dir + ".journal"
+        self.radiative = radiative
+        self.entries: Dict[int, tuple] = {}
+        
+        if restart and os.path.isfile(self.path):
+            os.remove(self.path)
+        
+        if os.path.isfile(self.path):
+            self.load()
+        
+        self.journal = open(self.path, "a")
+        self.unsynced = 0
+        self.last_sync = time.time()
+        self.lock = threading.Lock()
+        
+        transition_journals.append(self)
+    
+    def load(self):
+        """Function to load the transitions in the journal, skipping a line left incomplete when the calculation stopped
+        """
+        with open(self.path, "r") as journal:
+            for line in journal:
+                values = line.split()
+                
+                try:
+                    if self.radiative and len(values) >= 3 and len(values) % 2 == 1:
+                        multipoles = [[values[i], values[i + 1]] for i in range(3, len(values), 2)]
+                        self.entries[int(values[0])] = (float(values[1]), float(values[2]), multipoles)
+                    elif len(values) == 3:
+                        self.entries[int(values[0])] = (float(values[1]), float(values[2]))
+                except (ValueError, IndexError):
+                    continue
+    
+    def record(self, combCnt: int, result: tuple):
+        """Function to add a finished transition to the journal
+        
+        Args:
+            combCnt (int): index of the transition
+            result (tuple): energy and rate of the transition, and the multipoles for radiative transitions, as returned by readTransition
+        """
+        line = str(combCnt) + " " + repr(result[0]) + " " + repr(result[1])
+        if self.radiative:
+            line += "".join([" " + multipole[0] + " " + multipole[1] for multipole in result[2]])
+        
+        with self.lock:
+            self.entries[combCnt] = result
+            
+            self.journal.write(line + "\n")
+            self.unsynced += 1
+        
+        if self.unsynced >= journal_sync_interval or time.time() - self.last_sync >= journal_sync_time:
+            self.sync()
+    
+    def sync(self):
+        """Function to write the journal to disk
+        """
+        with self.lock:
+            self.journal.flush()
+            os.fsync(self.journal.fileno())
+            
+            self.unsynced = 0
+            self.last_sync = time.time()
+    
+    def take(self, combCnt: int) -> tuple | None:
+        """Function to take the result of a transition from the journal
+        
+        Args:
+            combCnt (int): index of the transition
+        
+        Returns:
+            tuple | None: result of the transition as returned by readTransition, or None if it is not in the journal
+        """
+        return self.entries.pop(combCnt, None)
+    
+    def clear(self):
+        """Function to clear the journal once its batch is written to the rates file
+        """
+        with self.lock:
+            self.journal.close()
+            self.journal = open(self.path, "w")
+        self.entries.clear()
+        self.unsynced = 0
+    
+    def close(self):
+        """Function to close and remove the journal once all the transitions are written to the rates file
+        """
+        transition_journals.remove(self)
+        
+        self.journal.close()
+        os.remove(self.path)
+
+
+# Journals that are open, synced when the script is stopping
+transition_journals: List[TransitionJournal] = []
+
+
 def rates(calculatedStates: List[State], calculatedTransitions: List[Transition], \
             transitions_dir: str, states_dir: str, file_transitions_log: str, rates_file: str, \
             transition_mod: str, electron_num: str, shakeup_configs: bool = False, \
@@ -3323,12 +6505,17 @@ def rates(calculatedStates: List[State], calculatedTransitions: List[Transition]
     """
     calculatedTransitions.clear()
     
+    # Stop precalculating these transitions, the remaining ones are calculated here
+    transition_precalculator.finish(transitions_dir)
+    
     parallel_initial_src_paths: List[str] = []
-    parallel_initial_dst_paths: List[str] = []
     parallel_final_src_paths: List[str] = []
-    parallel_final_dst_paths: List[str] = []
     
-    parallel_transition_paths: List[str] = []
+    parallel_inputs: List[Callable[[str, str], Tuple[str, str]]] = []
+    
+    parallel_features: List[Tuple[str, List[float]]] = []
+    
+    parallel_counters: List[int] = []
 
 
     found_starting = False
@@ -3340,7 +6527,19 @@ def rates(calculatedStates: List[State], calculatedTransitions: List[Transition]
     
     total_rates = dict.fromkeys([tuple(state.qns()) for state in calculatedStates], 0.0)
     
-    batch = 0
+    # First transition of the current batch, where it ends, and where the batches finished before ended
+    batch_start = 0
+    batch_end = None
+    batch_ends = readTransitionBatches(transitions_dir, starting_transition == [[0, 0, 0], [0, 0, 0]])
+    
+    # Transitions of the current batch that have finished
+    journal = TransitionJournal(transitions_dir, True, starting_transition == [[0, 0, 0], [0, 0, 0]])
+    
+    # Size of the outputs of the last batch, which are still being removed when the next batch is sized
+    released = 0.0
+    
+    # Calculation of the current batch, which starts with its first prepared transition
+    batch_calculation: TransitionBatchCalculation | None = None
     
     startingCnt = 0
     
@@ -3364,7 +6563,7 @@ def rates(calculatedStates: List[State], calculatedTransitions: List[Transition]
             if starting_transition == [[0, 0, 0], [0, 0, 0]] or found_starting:
                 print(clearLine + "Preparing Transition: " + str(combCnt + 1), end="")
                 
-                currDir = rootDir + "/" + directory_name + "/transitions/" + transitions_dir + "/" + str(combCnt)
+                currDir = rootDir + "/" + directory_name + "/transitions/" + transitions_dir
                 currFileName = str(combCnt)
                 
                 currDir_i = rootDir + "/" + directory_name + "/" + states_dir + "/" + state_i.getDir()
@@ -3373,20 +6572,34 @@ def rates(calculatedStates: List[State], calculatedTransitions: List[Transition]
                 currDir_f = rootDir + "/" + directory_name + "/" + states_dir + "/" + state_f.getDir()
                 currFileName_f = state_f.getFileName()
                 
-                wfiFile, wffFile = configureTransitionInputFile(f05RadTemplate_nuc, \
-                                                                currDir, currFileName, \
-                                                                currFileName_i, \
-                                                                state_i.configuration, state_i.jj, state_i.eigv, int(electron_num), \
-                                                                currFileName_f, \
-                                                                state_f.configuration, state_f.jj, state_f.eigv, int(electron_num))
-                
-                parallel_initial_src_paths.append(currDir_i + "/" + currFileName_i + ".f09")
-                parallel_final_src_paths.append(currDir_f + "/" + currFileName_f + ".f09")
-                
-                parallel_initial_dst_paths.append(currDir + "/" + wfiFile + ".f09")
-                parallel_final_dst_paths.append(currDir + "/" + wffFile + ".f09")
-                
-                parallel_transition_paths.append(currDir + "/" + exe_file)
+                if batch_calculation is None:
+                    batch_calculation = TransitionBatchCalculation(transitions_dir, parallel_inputs, \
+                                                                   parallel_initial_src_paths, parallel_final_src_paths, \
+                                                                   file_transitions_log, calculatedTransitions, "Calculated transitions:\n", \
+                                                                   parallel_features, parallel_counters, journal)
+                
+                # The transitions that finished before the calculation was resumed are taken from the journal
+                if combCnt not in journal.entries and \
+                    transition_precalculator.collect(transitions_dir, currDir_i + "/" + currFileName_i + ".f09", currDir_f + "/" + currFileName_f + ".f09", \
+                                                     electron_num, electron_num, currDir, currFileName):
+                    journal.record(combCnt, readTransition(currDir, currFileName))
+                elif combCnt not in journal.entries:
+                    # The input file is only written when the transition is queued in one of the slot directories
+                    parallel_inputs.append(partial_f(configureTransitionInputFile, f05RadTemplate_nuc, \
+                                                      currFileName_i = currFileName_i, \
+                                                      config_i = state_i.configuration, jj_i = state_i.jj, eigv_i = state_i.eigv, ne_i = int(electron_num), \
+                                                      currFileName_f = currFileName_f, \
+                                                      config_f = state_f.configuration, jj_f = state_f.jj, eigv_f = state_f.eigv, ne_f = int(electron_num)))
+                    
+                    parallel_initial_src_paths.append(currDir_i + "/" + currFileName_i + ".f09")
+                    parallel_final_src_paths.append(currDir_f + "/" + currFileName_f + ".f09")
+                    
+                    parallel_features.append((transitions_dir, JobCostModel.combine(JobCostModel.features(int(electron_num), state_i.configuration, state_i.jj, state_i.eigv), \
+                                                                                   JobCostModel.features(int(electron_num), state_f.configuration, state_f.jj, state_f.eigv))))
+                    
+                    parallel_counters.append(combCnt)
+                    
+                    batch_calculation.add(combCnt)
             else:
                 print(clearLine + "Finding Initial Transition: " + str(combCnt + 1), end="")
             
@@ -3396,28 +6609,35 @@ def rates(calculatedStates: List[State], calculatedTransitions: List[Transition]
                 found_starting = True
                 startingCnt = combCnt
             
-            if combCnt >= (batch + 1) * max_transitions:
-                if len(parallel_transition_paths) > 0:
-                    executeBatchTransitionCalculation(parallel_transition_paths, \
-                                                parallel_initial_src_paths, parallel_final_src_paths, \
-                                                parallel_initial_dst_paths, parallel_final_dst_paths, \
-                                                file_transitions_log, calculatedTransitions, "Calculated transitions:\n", True)
+            if batch_end is None:
+                batch_end = transitionBatchEnd(transitions_dir, batch_start, combCnt, batch_ends, \
+                                               starting_transition == [[0, 0, 0], [0, 0, 0]] or found_starting, released)
+                released = 0.0
+            
+            if batch_end is not None and combCnt >= batch_end:
+                if batch_calculation is not None:
+                    batch_calculation.finish()
+                    batch_calculation = None
                     
                     parallel_initial_src_paths.clear()
-                    parallel_initial_dst_paths.clear()
                     parallel_final_src_paths.clear()
-                    parallel_final_dst_paths.clear()
                     
-                    parallel_transition_paths.clear()
+                    parallel_inputs.clear()
+                    
+                    parallel_features.clear()
                     
+                    parallel_counters.clear()
                     
-                    for cnt, transition in enumerate(calculatedTransitions[int(batch * max_transitions):], int(batch * max_transitions)):
+                    
+                    for cnt, transition in enumerate(calculatedTransitions[batch_start:], batch_start):
                         print(clearLine + "Reading " + transitions_dir + " transition: " + str(cnt + 1) + "/" + str(len(calculatedTransitions)), end="")
                         
-                        currDir = rootDir + "/" + directory_name + "/transitions/" + transitions_dir + "/" + str(cnt)
-                        currFileName = str(cnt)
+                        currDir, currFileName = transitionOutput(transitions_dir, cnt)
+                        
+                        if os.path.isfile(currDir + "/" + currFileName + ".f06"):
+                            released += os.path.getsize(currDir + "/" + currFileName + ".f06")
                         
-                        energy, rate, multipoles = readTransition(currDir, currFileName) # type: ignore
+                        energy, rate, multipoles = journal.take(cnt) or readTransition(currDir, currFileName) # type: ignore
                         
                         total_rates[tuple(transition.qnsi())] += float(rate)
                         
@@ -3426,39 +6646,40 @@ def rates(calculatedStates: List[State], calculatedTransitions: List[Transition]
                         multipole_array.append(multipoles)
                     
                     
-                    shutil.rmtree(rootDir + "/" + directory_name + "/transitions/" + transitions_dir)
-                    os.mkdir(rootDir + "/" + directory_name + "/transitions/" + transitions_dir)
-                    
-                    
                     # -------------- WRITE RESULTS TO THE FILES -------------- #
                     
                     writeResultsTransition(rates_file, transition_mod,
-                                        calculatedTransitions, startingCnt, batch, \
+                                        calculatedTransitions, startingCnt, batch_start, \
                                         energies, rates, total_rates, multipole_array, shakeup_configs)
-
-                batch += 1
+                    
+                    logTransitionBatch(transitions_dir, batch_start, combCnt, released)
+                    journal.clear()
+                    
+                    background_cleaner.remove(rootDir + "/" + directory_name + "/transitions/" + transitions_dir)
+                    os.mkdir(rootDir + "/" + directory_name + "/transitions/" + transitions_dir)
+                
+                batch_start = combCnt
+                batch_end = None
                 
     
-    if len(parallel_transition_paths) > 0:
-        executeBatchTransitionCalculation(parallel_transition_paths, \
-                                        parallel_initial_src_paths, parallel_final_src_paths, \
-                                        parallel_initial_dst_paths, parallel_final_dst_paths, \
-                                        file_transitions_log, calculatedTransitions, "Calculated transitions:\n")
+    if batch_calculation is not None:
+        batch_calculation.finish(True)
     
     del parallel_initial_src_paths
-    del parallel_initial_dst_paths
     del parallel_final_src_paths
-    del parallel_final_dst_paths
-    del parallel_transition_paths
+    del parallel_inputs
+    del parallel_features
+    del parallel_counters
     
+    transition_precalculator.discard(transitions_dir)
     
-    for combCnt, transition in enumerate(calculatedTransitions[int(batch * max_transitions):], int(batch * max_transitions)):
+    
+    for combCnt, transition in enumerate(calculatedTransitions[batch_start:], batch_start):
         print(clearLine + "Reading " + transitions_dir + " transition: " + str(combCnt + 1) + "/" + str(len(calculatedTransitions)), end="")
         
-        currDir = rootDir + "/" + directory_name + "/transitions/" + transitions_dir + "/" + str(combCnt)
-        currFileName = str(combCnt)
+        currDir, currFileName = transitionOutput(transitions_dir, combCnt)
         
-        energy, rate, multipoles = readTransition(currDir, currFileName) # type: ignore
+        energy, rate, multipoles = journal.take(combCnt) or readTransition(currDir, currFileName) # type: ignore
         
         total_rates[tuple(transition.qnsi())] += float(rate)
         
@@ -3470,9 +6691,11 @@ def rates(calculatedStates: List[State], calculatedTransitions: List[Transition]
     # -------------- WRITE RESULTS TO THE FILES -------------- #
     
     writeResultsTransition(rates_file, transition_mod,
-                           calculatedTransitions, startingCnt, batch, \
+                           calculatedTransitions, startingCnt, batch_start, \
                            energies, rates, total_rates, multipole_array, shakeup_configs)
     
+    journal.close()
+    
     
 
 def rates_auger(calculatedStates_i: List[State], calculatedStates_f: List[State], calculatedTransitions: List[Transition], \
@@ -3496,12 +6719,17 @@ def rates_auger(calculatedStates_i: List[State], calculatedStates_f: List[State]
     """
     calculatedTransitions.clear()
     
+    # Stop precalculating these transitions, the remaining ones are calculated here
+    transition_precalculator.finish(transitions_dir)
+    
     parallel_initial_src_paths: List[str] = []
-    parallel_initial_dst_paths: List[str] = []
     parallel_final_src_paths: List[str] = []
-    parallel_final_dst_paths: List[str] = []
     
-    parallel_transition_paths: List[str] = []
+    parallel_inputs: List[Callable[[str, str], Tuple[str, str]]] = []
+    
+    parallel_features: List[Tuple[str, List[float]]] = []
+    
+    parallel_counters: List[int] = []
 
 
     found_starting = False
@@ -3512,7 +6740,21 @@ def rates_auger(calculatedStates_i: List[State], calculatedStates_f: List[State]
     
     total_rates = dict.fromkeys([tuple(state.qns()) for state in calculatedStates_i], 0.0)
 
-    batch = 0
+    # First transition of the current batch, where it ends, and where the batches finished before ended
+    batch_start = 0
+    batch_end = None
+    batch_ends = readTransitionBatches(transitions_dir, starting_transition == [[0, 0, 0], [0, 0, 0]])
+    
+    # Transitions of the current batch that have finished
+    journal = TransitionJournal(transitions_dir, False, starting_transition == [[0, 0, 0], [0, 0, 0]])
+    
+    # Size of the outputs of the last batch, which are still being removed when the next batch is sized
+    released = 0.0
+    
+    # Calculation of the current batch, which starts with its first prepared transition
+    batch_calculation: TransitionBatchCalculation | None = None
+    
+    batch_prepared = 0
 
     startingCnt = 0
 
@@ -3536,7 +6778,7 @@ def rates_auger(calculatedStates_i: List[State], calculatedStates_f: List[State]
             if starting_transition == [[0, 0, 0], [0, 0, 0]] or found_starting:
                 print(clearLine + "Preparing Transition: " + str(combCnt + 1), end="")
                 
-                currDir = rootDir + "/" + directory_name + "/transitions/" + transitions_dir + "/" + str(combCnt)
+                currDir = rootDir + "/" + directory_name + "/transitions/" + transitions_dir
                 currFileName = str(combCnt)
                 
                 currDir_i = rootDir + "/" + directory_name + "/" + states_dir_i + "/" + state_i.getDir()
@@ -3545,21 +6787,35 @@ def rates_auger(calculatedStates_i: List[State], calculatedStates_f: List[State]
                 currDir_f = rootDir + "/" + directory_name + "/" + states_dir_f + "/" + state_f.getDir()
                 currFileName_f = state_f.getFileName()
                 
-                wfiFile, wffFile = configureTransitionInputFile(f05AugTemplate_nuc, \
-                                                                currDir, currFileName, \
-                                                                currFileName_i, \
-                                                                state_i.configuration, state_i.jj, state_i.eigv, electron_num_i, \
-                                                                currFileName_f, \
-                                                                state_f.configuration, state_f.jj, state_f.eigv, electron_num_f, \
-                                                                energy_diff)
-                
-                parallel_initial_src_paths.append(currDir_i + "/" + currFileName_i + ".f09")
-                parallel_final_src_paths.append(currDir_f + "/" + currFileName_f + ".f09")
-                
-                parallel_initial_dst_paths.append(currDir + "/" + wfiFile + ".f09")
-                parallel_final_dst_paths.append(currDir + "/" + wffFile + ".f09")
-                
-                parallel_transition_paths.append(currDir + "/" + exe_file)
+                if batch_calculation is None:
+                    batch_calculation = TransitionBatchCalculation(transitions_dir, parallel_inputs, \
+                                                                   parallel_initial_src_paths, parallel_final_src_paths, \
+                                                                   file_transitions_log, calculatedTransitions, "Calculated transitions:\n", \
+                                                                   parallel_features, parallel_counters, journal)
+                
+                # The transitions that finished before the calculation was resumed are taken from the journal
+                if combCnt not in journal.entries and \
+                    transition_precalculator.collect(transitions_dir, currDir_i + "/" + currFileName_i + ".f09", currDir_f + "/" + currFileName_f + ".f09", \
+                                                     electron_num_i, electron_num_f, currDir, currFileName):
+                    journal.record(combCnt, readTransition(currDir, currFileName, False))
+                elif combCnt not in journal.entries:
+                    # The input file is only written when the transition is queued in one of the slot directories
+                    parallel_inputs.append(partial_f(configureTransitionInputFile, f05AugTemplate_nuc, \
+                                                      currFileName_i = currFileName_i, \
+                                                      config_i = state_i.configuration, jj_i = state_i.jj, eigv_i = state_i.eigv, ne_i = electron_num_i, \
+                                                      currFileName_f = currFileName_f, \
+                                                      config_f = state_f.configuration, jj_f = state_f.jj, eigv_f = state_f.eigv, ne_f = electron_num_f, \
+                                                      energy_diff = energy_diff))
+                    
+                    parallel_initial_src_paths.append(currDir_i + "/" + currFileName_i + ".f09")
+                    parallel_final_src_paths.append(currDir_f + "/" + currFileName_f + ".f09")
+                    
+                    parallel_features.append((transitions_dir, JobCostModel.combine(JobCostModel.features(int(electron_num_i), state_i.configuration, state_i.jj, state_i.eigv), \
+                                                                                   JobCostModel.features(int(electron_num_f), state_f.configuration, state_f.jj, state_f.eigv))))
+                    
+                    parallel_counters.append(combCnt)
+                    
+                    batch_calculation.add(combCnt)
             else:
                 print(clearLine + "Finding Initial Transition: " + str(combCnt + 1), end="")
             
@@ -3569,28 +6825,35 @@ def rates_auger(calculatedStates_i: List[State], calculatedStates_f: List[State]
                 found_starting = True
                 startingCnt = combCnt
             
-            if combCnt >= (batch + 1) * max_transitions:
-                if len(parallel_transition_paths) > 0:
-                    executeBatchTransitionCalculation(parallel_transition_paths, \
-                                                parallel_initial_src_paths, parallel_final_src_paths, \
-                                                parallel_initial_dst_paths, parallel_final_dst_paths, \
-                                                file_transitions_log, calculatedTransitions, "Calculated transitions:\n", True)
+            if batch_end is None:
+                batch_end = transitionBatchEnd(transitions_dir, batch_start, combCnt, batch_ends, \
+                                               starting_transition == [[0, 0, 0], [0, 0, 0]] or found_starting, released)
+                released = 0.0
+            
+            if batch_end is not None and combCnt >= batch_end:
+                if batch_calculation is not None:
+                    batch_calculation.finish()
+                    batch_calculation = None
                     
                     parallel_initial_src_paths.clear()
-                    parallel_initial_dst_paths.clear()
                     parallel_final_src_paths.clear()
-                    parallel_final_dst_paths.clear()
                     
-                    parallel_transition_paths.clear()
+                    parallel_inputs.clear()
+                    
+                    parallel_features.clear()
+                    
+                    parallel_counters.clear()
                     
                     
-                    for cnt, transition in enumerate(calculatedTransitions[int(batch * max_transitions):], int(batch * max_transitions)):
+                    for cnt, transition in enumerate(calculatedTransitions[batch_start:], batch_start):
                         print(clearLine + "Reading " + transitions_dir + " transition: " + str(cnt + 1) + "/" + str(len(calculatedTransitions)), end="")
                         
-                        currDir = rootDir + "/" + directory_name + "/transitions/" + transitions_dir + "/" + str(cnt)
-                        currFileName = str(cnt)
+                        currDir, currFileName = transitionOutput(transitions_dir, cnt)
                         
-                        energy, rate = readTransition(currDir, currFileName, False) # type: ignore
+                        if os.path.isfile(currDir + "/" + currFileName + ".f06"):
+                            released += os.path.getsize(currDir + "/" + currFileName + ".f06")
+                        
+                        energy, rate = journal.take(cnt) or readTransition(currDir, currFileName, False) # type: ignore
                         
                         total_rates[tuple(transition.qnsi())] += float(rate)
                         
@@ -3598,38 +6861,40 @@ def rates_auger(calculatedStates_i: List[State], calculatedStates_f: List[State]
                         rates.append(rate)
                         
                     
-                    shutil.rmtree(rootDir + "/" + directory_name + "/transitions/" + transitions_dir)
-                    os.mkdir(rootDir + "/" + directory_name + "/transitions/" + transitions_dir)
-
                     # -------------- WRITE RESULTS TO THE FILES -------------- #
         
                     writeResultsTransitionAuger(rates_file, transition_mod,
-                                        calculatedTransitions, startingCnt, batch, \
+                                        calculatedTransitions, startingCnt, batch_start, \
                                         energies, rates, total_rates)
+                    
+                    logTransitionBatch(transitions_dir, batch_start, combCnt, released)
+                    journal.clear()
+                    
+                    background_cleaner.remove(rootDir + "/" + directory_name + "/transitions/" + transitions_dir)
+                    os.mkdir(rootDir + "/" + directory_name + "/transitions/" + transitions_dir)
                 
-                batch += 1
+                batch_start = combCnt
+                batch_end = None
     
     
-    if len(parallel_transition_paths) > 0:
-        executeBatchTransitionCalculation(parallel_transition_paths, \
-                                        parallel_initial_src_paths, parallel_final_src_paths, \
-                                        parallel_initial_dst_paths, parallel_final_dst_paths, \
-                                        file_transitions_log, calculatedTransitions, "Calculated transitions:\n")
+    if batch_calculation is not None:
+        batch_calculation.finish(True)
     
     del parallel_initial_src_paths
-    del parallel_initial_dst_paths
     del parallel_final_src_paths
-    del parallel_final_dst_paths
-    del parallel_transition_paths
+    del parallel_inputs
+    del parallel_features
+    del parallel_counters
     
+    transition_precalculator.discard(transitions_dir)
     
-    for combCnt, transition in enumerate(calculatedTransitions[int(batch * max_transitions):], int(batch * max_transitions)):
+    
+    for combCnt, transition in enumerate(calculatedTransitions[batch_start:], batch_start):
         print(clearLine + "Reading " + transitions_dir + " transition: " + str(combCnt + 1) + "/" + str(len(calculatedTransitions)), end="")
         
-        currDir = rootDir + "/" + directory_name + "/transitions/" + transitions_dir + "/" + str(combCnt)
-        currFileName = str(combCnt)
+        currDir, currFileName = transitionOutput(transitions_dir, combCnt)
         
-        energy, rate = readTransition(currDir, currFileName, False) # type: ignore
+        energy, rate = journal.take(combCnt) or readTransition(currDir, currFileName, False) # type: ignore
         
         total_rates[tuple(transition.qnsi())] += float(rate)
         
@@ -3640,8 +6905,10 @@ def rates_auger(calculatedStates_i: List[State], calculatedStates_f: List[State]
     # -------------- WRITE RESULTS TO THE FILES -------------- #
     
     writeResultsTransitionAuger(rates_file, transition_mod,
-                           calculatedTransitions, startingCnt, batch, \
+                           calculatedTransitions, startingCnt, batch_start, \
                            energies, rates, total_rates)
+    
+    journal.close()
 
 
 
@@ -4471,7 +7738,7 @@ def bruteForce(reports: ListProxy, currRunningStates: ListProxy, uncheckedStates
 
     Args:
         reports (ListProxy): shared list object with the reports
-        currRunningStates (ListProxy): shared list object with the indexes of the currently running states in seperate processes
+        currRunningStates (ListProxy): shared list object with the indexes of the currently running states in seperate threads
         uncheckedStates (ListProxy): shared list object with the indexes of the finished calculations that were not yet checked
         currDir (str): directory name of the state to execute
         currFileName (str): filename of the state to execute
@@ -4503,11 +7770,11 @@ def bruteForce(reports: ListProxy, currRunningStates: ListProxy, uncheckedStates
 
 
 def executeCurrState(reports: ListProxy, currRunningStates: ListProxy, uncheckedStates: ListProxy, currDir: str, currFileName: str, num: int):
-    """Function to execute the current state in a seperate process
+    """Function to execute the current state in a seperate thread
 
     Args:
         reports (ListProxy): shared list object with the reports
-        currRunningStates (ListProxy): shared list object with the indexes of the currently running states in seperate processes
+        currRunningStates (ListProxy): shared list object with the indexes of the currently running states in seperate threads
         uncheckedStates (ListProxy): shared list object with the indexes of the finished calculations that were not yet checked
         currDir (str): directory name of the state to execute
         currFileName (str): filename of the state to execute
@@ -4523,7 +7790,27 @@ def executeCurrState(reports: ListProxy, currRunningStates: ListProxy, unchecked
     
     cycles, orbs = readInputPars(reports[num][0][-1])
     
-    subprocess.call(exe_file, cwd = currDir, stdout = subprocess.DEVNULL, stderr = subprocess.DEVNULL)
+    previous_complete, previous_accuracy = False, 0.0
+    if os.path.isfile(currDir + "/" + currFileName + ".f06"):
+        previous_complete, _, _, _, _, previous_accuracy, _, _ = checkOutput(currDir, currFileName)
+    
+    # Start from the wavefunction of the previous test, keeping the input of this test as it was written
+    if seedStateInput(currDir, currFileName):
+        return_code = runPooledJob(currDir + "/" + exe_file)
+        
+        with open(currDir + "/" + currFileName + ".f05", "w") as currInput:
+            currInput.write(reports[num][0][-1])
+        
+        converged, failed_orbital, overlap, higher_config, highest_percent, accuracy, Diff, welt = checkOutput(currDir, currFileName, True)
+        
+        clean = return_code == 0 and converged
+        finishSeededRun(currDir, currFileName, clean)
+        
+        if not clean or (not (converged and Diff >= 0.0 and Diff <= diffThreshold and float(str(overlap).strip().split()[-1]) < overlapsThreshold and accuracy < accThreshold) and \
+            seedWorse(previous_complete, previous_accuracy, converged, accuracy)):
+            runPooledJob(currDir + "/" + exe_file)
+    else:
+        runPooledJob(currDir + "/" + exe_file)
     
     converged, failed_orbital, overlap, higher_config, highest_percent, accuracy, Diff, welt = checkOutput(currDir, currFileName, True)
 
@@ -4875,6 +8162,7 @@ def showCommands(states_mod: str):
     print("\t<maxCycles> - the maximum number of cycles for this brute forcing.")
     print("\t<sepOrbitals> - 0, 1 / True, False if we want to seperate the orbitals of type p, p* in the modsolv_orb.")
     print("load <testNumber> - load the input file for the <testNumber> test and rerun the calculation.")
+    print("cancel - remove the calculations of this state that are still queued. A new calculation of a state already replaces its queued ones.")
     print("show <testNumber> - show the input file for the <testNumber> test. If no <testNumber> is provided the current output is shown.")
     print("flag - toggle the flag for this state as best convergence, even though it is not under thresholds.")
     print("mods - edit the modsolv_orb file where the orbital modifiers are stored.")
@@ -4885,7 +8173,8 @@ def showCommands(states_mod: str):
     inp = input()
 
 
-def updateInterface(num: int, by_hand_total: int, uncheckedStates: ListProxy, currRunningStates: ListProxy, reports: ListProxy, shell: str, jj: int, eigv: int, lastCalculatedState: ValueProxy[int]):
+def updateInterface(num: int, by_hand_total: int, uncheckedStates: ListProxy, currRunningStates: ListProxy, reports: ListProxy, shell: str, jj: int, eigv: int, lastCalculatedState: ValueProxy[int], \
+                    queued: List[str] = []):
     """Helper function to update the interface text
 
     Args:
@@ -4898,6 +8187,7 @@ def updateInterface(num: int, by_hand_total: int, uncheckedStates: ListProxy, cu
         jj (int): 2*j value of the state to be shown
         eigv (int): eigenvalue of the state to be shown
         lastCalculatedState (ValueProxy[int]): shared int object for the index of the last calculated state that
+        queued (List[str], optional): list of the queued calculations with the number of their state and their position in the queue. Defaults to [].
     """
     os.system("clear")
 
@@ -4921,26 +8211,91 @@ def updateInterface(num: int, by_hand_total: int, uncheckedStates: ListProxy, cu
     
     print(reports[num][1])
     
+    if len(queued) > 0:
+        print(" Queued: " + ', '.join(queued) + ".\n")
+    
     print("Type help for a list of the commands.")
 
 
-def cleanPending(processes: list, timeout:float = 1):
-    """Function to join the finished calculations lauched in the processes list
-
-    Args:
-        processes (list): list of the processes previously launched
-        timeout (float, optional): timeout to try to join a process that might have already finished. Defaults to 1.
-    """
-    to_delete = []
-    for i, p in enumerate(processes):
-        p.join(timeout)
-        if not p.is_alive():
-            to_delete.append(i)
+class ByHandQueue:
+    def __init__(self, size: int):
+        """Bounded queue of the calculations started by hand in cycle_list.
+        At most size states are calculated at the same time, each in its own thread, and the others wait in the order they were requested.
+        The MCDFGME runs of each state go through the shared job pool, so they share its workers and memory governor with the other calculations.
+        A new request for a state replaces the requests of that state that are still waiting, as they would run its previous input,
+        and a state is not started again while it is still running, as both would write the same files.
+        
+        Args:
+            size (int): number of states that are calculated at the same time
+        """
+        self.size = max(size, 1)
+        self.waiting: List[Tuple[int, Callable, tuple]] = []
+        self.running: Dict[int, threading.Thread] = {}
+        self.closed = False
+        self.condition = threading.Condition()
+        
+        threading.Thread(target = self.dispatch, daemon = True).start()
     
-    deleted = 0
-    for i in to_delete:
-        del processes[i - deleted]
-        deleted += 1
+    def submit(self, num: int, target: Callable, args: tuple):
+        """Function to queue a calculation of a state
+        
+        Args:
+            num (int): index of the state in the by_hand list
+            target (Callable): function that runs the calculation in its own thread
+            args (tuple): arguments of the function
+        """
+        with self.condition:
+            self.waiting = [request for request in self.waiting if request[0] != num]
+            self.waiting.append((num, target, args))
+            self.condition.notify_all()
+    
+    def cancel(self, num: int):
+        """Function to remove the queued calculations of a state, the running ones are not stopped
+        
+        Args:
+            num (int): index of the state in the by_hand list
+        """
+        with self.condition:
+            self.waiting = [request for request in self.waiting if request[0] != num]
+            self.condition.notify_all()
+    
+    def positions(self) -> List[str]:
+        """Helper function for the queued calculations to show in the interface
+        
+        Returns:
+            List[str]: number of the state of each queued calculation with its position in the queue
+        """
+        with self.condition:
+            return [str(num + 1) + " (" + str(position + 1) + ")" for position, (num, _, _) in enumerate(self.waiting)]
+    
+    def dispatch(self):
+        """Function running in the background to start the queued calculations when there are free places
+        """
+        while not self.closed:
+            with self.condition:
+                self.running = {num: thread for num, thread in self.running.items() if thread.is_alive()}
+                
+                # The requests of the states that are still running wait for them to finish
+                for request in [request for request in self.waiting if request[0] not in self.running]:
+                    if len(self.running) >= self.size:
+                        break
+                    
+                    num, target, args = request
+                    self.waiting.remove(request)
+                    
+                    self.running[num] = threading.Thread(target = target, args = args, daemon = True)
+                    self.running[num].start()
+                
+                self.condition.notify_all()
+                self.condition.wait(0.5)
+    
+    def join(self):
+        """Function to wait for the queued and the running calculations to finish, after which the queue is closed
+        """
+        with self.condition:
+            self.condition.wait_for(lambda: len(self.waiting) == 0 and all([not thread.is_alive() for thread in self.running.values()]))
+            
+            self.closed = True
 
 
 def cycle_list(by_hand: List[int], states_mod: str, states_dir: str, by_hand_report: List[Report], calculatedStates: List[State], file_final_results_reports: str):
@@ -4963,7 +8318,8 @@ def cycle_list(by_hand: List[int], states_mod: str, states_dir: str, by_hand_rep
         
         if inp == "y":
             with Manager() as manager:
-                processes = []
+                by_hand_queue = ByHandQueue(by_hand_processes if by_hand_processes > 0 else \
+                                            int(number_of_threads) if str(number_of_threads).isdigit() else os.cpu_count() or 1)
                 
                 # each element
                 # list of strings with the tested input files
@@ -5061,7 +8417,8 @@ def cycle_list(by_hand: List[int], states_mod: str, states_dir: str, by_hand_rep
                     currDir = rootDir + "/" + directory_name + "/" + states_dir + "/" + state.getDir()
                     currFileName = state.getFileName()
                     
-                    updateInterface(num, len(by_hand), uncheckedStates, currRunningStates, reports, state.shell, state.jj, state.eigv, lastCalculatedState)
+                    updateInterface(num, len(by_hand), uncheckedStates, currRunningStates, reports, state.shell, state.jj, state.eigv, lastCalculatedState, \
+                                    by_hand_queue.positions())
 
                     while True:
                         try:
@@ -5071,7 +8428,10 @@ def cycle_list(by_hand: List[int], states_mod: str, states_dir: str, by_hand_rep
                             print("Error reading input!!")
                     
                     while inp != "next" and inp != "prev" and inp != "exit" and inp != "flag" and inp != "mods" and inp != "save" and inp != "help":
-                        if "edit" in inp:
+                        if inp == "cancel":
+                            by_hand_queue.cancel(num)
+                            break
+                        elif "edit" in inp:
                             if len(inp.split()) >= 3:
                                 mod = inp.split()[1]
                                 orb = inp.split()[2:]
@@ -5079,22 +8439,14 @@ def cycle_list(by_hand: List[int], states_mod: str, states_dir: str, by_hand_rep
                                 modifyed = modifyInputFile(currDir, currFileName, orb_mods, mod, orb)
                                 
                                 if modifyed:
-                                    cleanPending(processes, 0.01)
-
-                                    p = Process(target = executeCurrState, args = (reports, currRunningStates, uncheckedStates, currDir, currFileName, num))
-                                    processes.append(p)
-                                    p.start()
+                                    by_hand_queue.submit(num, executeCurrState, (reports, currRunningStates, uncheckedStates, currDir, currFileName, num))
                                     if num > lastCalculatedState.value:
                                         lastCalculatedState.value = num + 1
                                     break
                             elif inp == "edit":
                                 os.system("nano " + currDir + "/" + currFileName + ".f05")
                                 
-                                cleanPending(processes, 0.01)
-                                
-                                p = Process(target = executeCurrState, args = (reports, currRunningStates, uncheckedStates, currDir, currFileName, num))
-                                processes.append(p)
-                                p.start()
+                                by_hand_queue.submit(num, executeCurrState, (reports, currRunningStates, uncheckedStates, currDir, currFileName, num))
                                 if num > lastCalculatedState.value:
                                     lastCalculatedState.value = num + 1
                                 break
@@ -5105,9 +8457,7 @@ def cycle_list(by_hand: List[int], states_mod: str, states_dir: str, by_hand_rep
                                 try:
                                     minCycles = int(inp.split()[1])
 
-                                    p = Process(target = bruteForce, args = (reports, currRunningStates, uncheckedStates, currDir, currFileName, num, orb_mods, minCycles))
-                                    processes.append(p)
-                                    p.start()
+                                    by_hand_queue.submit(num, bruteForce, (reports, currRunningStates, uncheckedStates, currDir, currFileName, num, orb_mods, minCycles))
                                     if num > lastCalculatedState.value:
                                         lastCalculatedState.value = num + 1
                                     break
@@ -5118,9 +8468,7 @@ def cycle_list(by_hand: List[int], states_mod: str, states_dir: str, by_hand_rep
                                     minCycles = int(inp.split()[1])
                                     maxCycles = int(inp.split()[2])
                                     
-                                    p = Process(target = bruteForce, args = (reports, currRunningStates, uncheckedStates, currDir, currFileName, num, orb_mods, minCycles, maxCycles))
-                                    processes.append(p)
-                                    p.start()
+                                    by_hand_queue.submit(num, bruteForce, (reports, currRunningStates, uncheckedStates, currDir, currFileName, num, orb_mods, minCycles, maxCycles))
                                     if num > lastCalculatedState.value:
                                         lastCalculatedState.value = num + 1
                                     break
@@ -5141,16 +8489,12 @@ def cycle_list(by_hand: List[int], states_mod: str, states_dir: str, by_hand_rep
                                         print("Error parsing <sepOrbitals> from input!!\n")
                                 
                                 if sepOrbitals != None:
-                                    p = Process(target = bruteForce, args = (reports, currRunningStates, uncheckedStates, currDir, currFileName, num, orb_mods, minCycles, maxCycles, sepOrbitals))
-                                    processes.append(p)
-                                    p.start()
+                                    by_hand_queue.submit(num, bruteForce, (reports, currRunningStates, uncheckedStates, currDir, currFileName, num, orb_mods, minCycles, maxCycles, sepOrbitals))
                                     if num > lastCalculatedState.value:
                                         lastCalculatedState.value = num + 1
                                     break
                             elif inp == "bruteForce":
-                                p = Process(target = bruteForce, args = (reports, currRunningStates, uncheckedStates, currDir, currFileName, num, orb_mods))
-                                processes.append(p)
-                                p.start()
+                                by_hand_queue.submit(num, bruteForce, (reports, currRunningStates, uncheckedStates, currDir, currFileName, num, orb_mods))
                                 if num > lastCalculatedState.value:
                                     lastCalculatedState.value = num + 1
                                 break
@@ -5182,7 +8526,6 @@ def cycle_list(by_hand: List[int], states_mod: str, states_dir: str, by_hand_rep
                                     
                                     if stateNum < len(reports):
                                         num = stateNum
-                                        cleanPending(processes, 0.01)
                                         break
                                     else:
                                         print("The current number of states by hand for these configurations " + str(len(reports)) + ", while " + str(stateNum + 1) + " was requested!!\n")
@@ -5199,13 +8542,9 @@ def cycle_list(by_hand: List[int], states_mod: str, states_dir: str, by_hand_rep
                                     if testNum < len(reports[num][0]):
                                         loadTest(reports, num, testNum, currDir, currFileName)
                                         
-                                        cleanPending(processes, 0.01)
-                                        
-                                        p = Process(target = executeCurrState, args = (reports, currRunningStates, uncheckedStates, currDir, currFileName, num))
-                                        processes.append(p)
+                                        by_hand_queue.submit(num, executeCurrState, (reports, currRunningStates, uncheckedStates, currDir, currFileName, num))
                                         if num > lastCalculatedState.value:
                                             lastCalculatedState.value = num + 1
-                                        p.start()
                                         break
                                     else:
                                         print("The current number of tests for this state is " + str(len(reports[num][0])) + ", while " + str(testNum + 1) + " was requested!!\n")
@@ -5214,7 +8553,7 @@ def cycle_list(by_hand: List[int], states_mod: str, states_dir: str, by_hand_rep
                             else:
                                 print("No testNumber was provided in the input!!\n")
                         else:
-                            print("keyword must be next, prev, cd, edit, bruteForce, show, flag, mods, save or exit!!!\n")
+                            print("keyword must be next, prev, cd, edit, bruteForce, load, cancel, show, flag, mods, save or exit!!!\n")
                         
                         
                         inp = input().strip()
@@ -5223,12 +8562,10 @@ def cycle_list(by_hand: List[int], states_mod: str, states_dir: str, by_hand_rep
                         num += 1
                         if num >= len(by_hand):
                             num = 0
-                        cleanPending(processes, 0.01)
                     elif inp == "prev":
                         num -= 1
                         if num <= -1:
                             num = len(by_hand) - 1
-                        cleanPending(processes, 0.01)
                     elif inp == "flag":
                         if "CONVERGED" not in reports[num][1] and "CONVERGENCE" not in reports[num][1]:
                             reports[num][1] += "\t\t\tWARNING: THIS STATE HAS BEEN FLAGGED AS BEST CONVERGENCE\n"
@@ -5256,8 +8593,7 @@ def cycle_list(by_hand: List[int], states_mod: str, states_dir: str, by_hand_rep
                             break
                 
                 
-                for p in processes:
-                    p.join()
+                by_hand_queue.join()
                 
                 by_hand_report = saveReportsFile(file_final_results_reports, reports, by_hand, calculatedStates)
     
@@ -5290,10 +8626,45 @@ def cycle_by_hand():
 
 
 
+def promptInput(setting: str, prompt: str = '') -> str:
+    """Helper function to ask for an answer, which is taken from campaign_settings instead when the run was started by the campaign mode.
+    Each setting is only used for the first time its prompt is asked, so an invalid setting is asked again.
+    
+    Args:
+        setting (str): name of the setting in campaign_settings
+        prompt (str, optional): text of the prompt. Defaults to ''.
+    
+    Returns:
+        str: answer without the surrounding whitespace
+    """
+    if setting in campaign_settings:
+        answer = campaign_settings.pop(setting)
+        print(prompt + answer)
+        
+        return answer
+    
+    return input(prompt).strip()
+
+
+def setupJobServer():
+    """Function to ask for the address where the calculations are served to remote workers and start the job server.
+    The workers are started in other processes or hosts with: python runMCDF.py worker <address> <number of threads>, with the same key in the MCDF_JOB_AUTHKEY environment variable
+    """
+    global job_server_address
+    
+    inp = promptInput('job_server', "Enter the address to serve calculations to remote workers, as host:port, a port for localhost or a socket path (For local only leave it blank): ")
+    
+    job_server_address = inp
+    
+    if job_server_address != '':
+        job_pool.serve(job_server_address)
+        print("Serving calculations to remote workers at " + job_server_address + "\n")
+
+
 def initializeEnergyCalc():
     """Function to configure and initialize a full calculation starting from the atomic states' energies
     """
-    global label_auto, atomic_number, nuc_massyorn, nuc_mass, nuc_model, machine_type, number_max_of_threads, number_of_threads, directory_name
+    global label_auto, atomic_number, nuc_massyorn, nuc_mass, nuc_model, machine_type, number_max_of_threads, number_of_threads, directory_name, calibration_time
 
     if not os.path.isfile(exe_file):
         print("$\nERROR!!!!!\n")
@@ -5302,7 +8673,7 @@ def initializeEnergyCalc():
         print("\n############## Energy Calculations with MCDGME code  ##############\n\n")
         
         
-        inp = input("Select option for the calculation of configurations - automatic or read (from file) : ").strip()
+        inp = promptInput('configurations', "Select option for the calculation of configurations - automatic or read (from file) : ")
         while inp != 'automatic' and inp != 'read':
             print("\n keyword must be automatic or read!!!")
             inp = input("Select option for the calculation of configurations - automatic or read (from file) : ").strip()
@@ -5310,14 +8681,14 @@ def initializeEnergyCalc():
         label_auto = inp == 'automatic'
         
         
-        inp = input("Enter atomic number Z : ").strip()
+        inp = promptInput('atomic_number', "Enter atomic number Z : ")
         while not inp.isdigit():
             print("\natomic number must be an integer!!!")
             inp = input("Enter atomic number Z : ").strip()
     
         atomic_number = inp
         
-        inp = input("Calculation with standard mass? (y or n) : ").strip()
+        inp = promptInput('standard_mass', "Calculation with standard mass? (y or n) : ")
         while inp != 'y' and inp != 'n':
             print("\n must be y or n!!!")
             inp = input("Calculation with standard mass? (y or n) : ").strip()
@@ -5325,14 +8696,14 @@ def initializeEnergyCalc():
         nuc_massyorn = inp
         
         if nuc_massyorn == 'n':
-            inp = input("Please enter the nuclear mass : ").strip()
+            inp = promptInput('nuclear_mass', "Please enter the nuclear mass : ")
             while not inp.isdigit():
                 print("\nnuclear mass must be an integer!!!")
                 inp = input("Please enter the nuclear mass : ").strip()
     
             nuc_mass = int(inp)
             
-            inp = input("Please enter the nuclear model (uniform or fermi) : ").strip()
+            inp = promptInput('nuclear_model', "Please enter the nuclear model (uniform or fermi) : ")
             while inp != 'uniform' and inp != 'fermi':
                 print("\n must be uniform or fermi!!!")
                 inp = input("Please enter the nuclear model (uniform or fermi) : ").strip()
@@ -5340,8 +8711,6 @@ def initializeEnergyCalc():
             nuc_model = inp
         
         
-        parallel_max_length = int(subprocess.check_output(['getconf', 'ARG_MAX']).strip())
-        
         machine_type = platform.uname()[0]
         
         if machine_type == 'Darwin':
@@ -5351,13 +8720,19 @@ def initializeEnergyCalc():
         
         
         print("Your " + machine_type + " machine has " + number_max_of_threads + " available threads")
-        inp = input("Enter the number of threads you want to be used in the calculation (For all leave it blank): ").strip()
-        while not inp.isdigit() and inp != '':
-            print("\nnumber of threads must be an integer!!!")
-            inp = input("Enter number of threads to be used in the calculation (For all leave it blank): ").strip()
+        inp = promptInput('threads', "Enter the number of threads you want to be used in the calculation (For all leave it blank, " + \
+                          "auto to calibrate it, optionally followed by the maximum seconds for each tried number of threads): ")
+        while not re.fullmatch(r"\d*|auto( +\d+(\.\d*)?)?", inp):
+            print("\nnumber of threads must be an integer or auto!!!")
+            inp = input("Enter number of threads to be used in the calculation (For all leave it blank, auto to calibrate it): ").strip()
     
         if inp == '':
             number_of_threads = number_max_of_threads
+        elif inp.startswith('auto'):
+            number_of_threads = 'auto'
+            
+            if len(inp.split()) == 2:
+                calibration_time = float(inp.split()[1])
         elif int(inp) > int(number_max_of_threads):
             number_of_threads = number_max_of_threads
         else:
@@ -5365,7 +8740,9 @@ def initializeEnergyCalc():
         
         print("number of threads = " + number_of_threads + "\n")
         
-        inp = input("Enter directory name for the calculations: ").strip()
+        setupJobServer()
+        
+        inp = promptInput('directory', "Enter directory name for the calculations: ")
         while inp == '':
             print("\n No input entered!!!\n\n")
             inp = input("Enter directory name for the calculations: ").strip()
@@ -5570,7 +8947,7 @@ def setupElectronConfigs():
         print("Number of occupied orbitals = " + str(count) + "\n")
         
         print("\nAll electron configurations were generated.\n")
-        inp = input("Would you like to calculate these configurations? - all, 3+s, 3holes, shakeup, excitation : ").strip()
+        inp = promptInput('states', "Would you like to calculate these configurations? - all, 3+s, 3holes, shakeup, excitation : ")
         while inp != 'all' and inp != '3+s' and inp != '3holes' and inp != 'shakeup' and inp != 'excitation':
             print("\n keyword must be all, 3+s, 3holes, shakeup or excitation!!!")
             inp = input("Would you like to calculate this configurations? - all, 3+s, 3holes, shakeup, excitation : ").strip()
@@ -5995,7 +9372,7 @@ def InitialPrompt():
     print("         #########################################################################################################################")
     print("         ######################################################################################################################### \n\n\n\n\n")
     
-    inp = input("Select option for the calculation - full or partial (if energy calculation has been already performed) : ").strip()
+    inp = promptInput('calculation', "Select option for the calculation - full or partial (if energy calculation has been already performed) : ")
     while inp != 'full' and inp != 'partial':
         print("\n keyword must be full or partial!!!")
         inp = input("Select option for the calculation - full or partial (if energy calculation has been already performed) : ").strip()
@@ -6035,7 +9412,7 @@ def midPrompt(partial_check=False):
         print("rates_all - A rate calculation will be performed for diagram, auger and satellite (shake-off and shake-up) decays, without any spectra calculations.\n")
         print("rates - A rate calculation will be performed for diagram and auger decays, without any spectra calculations.\n")
         print("excitation_rates - A rate calculation will be performed for diagram and auger excitation decays, without any spectra calculations.\n")
-        inp = input().strip()
+        inp = promptInput('rates')
         while inp != "All" and inp != "Simple" and inp != "Excitation" and inp != "rates_all" and inp != "rates" and inp != "excitation_rates":
             if "GetParameters" in inp:
                 if len(inp.split()) == 4:
@@ -6217,7 +9594,130 @@ def midPrompt(partial_check=False):
     return type_calc
 
 
+def selfCheck() -> bool:
+    """Function to check the helpers of the scheduler that do not need MCDFGME: the fit of the job cost model, the order of the fair share queue,
+    the journal of finished transitions, the end of the transition batches and the finished prefix of a stream of calculations.
+    The files are written in a temporary directory, which is removed afterwards.
+    
+    Returns:
+        bool: True if all the checks passed
+    """
+    global rootDir, directory_name
+    
+    failures: List[str] = []
+    
+    def check(condition: bool, message: str):
+        if not condition:
+            failures.append(message)
+            print("Error: self-check failed: " + message)
+    
+    previous_root, previous_directory = rootDir, directory_name
+    previous_footprints = dict(transition_footprints)
+    
+    with tempfile.TemporaryDirectory() as checkDir:
+        rootDir, directory_name = checkDir, "selfcheck"
+        os.makedirs(rootDir + "/" + directory_name + "/transitions")
+        
+        try:
+            # The fit recovers the coefficients of runtimes that follow the model exactly, also after the sums are saved and read again
+            coefficients = [-2.0, 0.5, 1.5, 0.25, 1.0]
+            samples = [[1.0, math.log(a), math.log(b), math.log(c), math.log(d)] for a in (2, 5, 11) for b in (1, 3, 7) for c in (2, 4) for d in (1, 2, 6)]
+            
+            model = JobCostModel(checkDir + "/timings.txt", prior_weight = 1e-9)
+            for features in samples:
+                model.record("check", features, math.exp(sum(c * f for c, f in zip(coefficients, features))))
+            
+            check(all(abs(fitted - c) < 1e-4 for fitted, c in zip(model.fit("check"), coefficients)), "JobCostModel.fit does not recover the coefficients")
+            check(model.predict("unknown", samples[0]) == math.exp(sum(c * f for c, f in zip(model.prior, samples[0]))), \
+                  "JobCostModel.predict does not use the prior for an unknown kind")
+            
+            model.save()
+            reloaded = JobCostModel(checkDir + "/timings.txt", prior_weight = 1e-9)
+            check(reloaded.samples("check") == len(samples), "JobCostModel does not read the number of timings it saved")
+            check(abs(reloaded.predict("check", samples[-1]) / model.predict("check", samples[-1]) - 1.0) < 1e-6, \
+                  "JobCostModel does not predict the same runtime after the sums are read again")
+            
+            # Each get takes the lowest priority of the client that took the fewest calculations
+            fair_queue = FairShareQueue()
+            for sequence, (client, priority) in enumerate([(0, 3.0), (0, 1.0), (0, 2.0), (1, 5.0), (1, 4.0)]):
+                fair_queue.put(((client, priority), sequence))
+            
+            order = [fair_queue.get()[0] for _ in range(5)]
+            check(order == [(0, 1.0), (1, 4.0), (0, 2.0), (1, 5.0), (0, 3.0)], "FairShareQueue takes the calculations in the order " + str(order))
+            
+            # A client that was idle starts from the fewest calculations taken by the busy clients
+            fair_queue.put(((0, 1.0), 5))
+            fair_queue.put(((0, 2.0), 6))
+            fair_queue.put(((2, 1.0), 7))
+            check(fair_queue.get()[0] == (0, 1.0) and fair_queue.get()[0] == (2, 1.0), "FairShareQueue lets an idle client take more than its share")
+            
+            # The journal reads back the transitions it recorded and skips a line left incomplete
+            journal = TransitionJournal("check", True, True)
+            journal.record(3, (1.5, 2.5, [["E1", "0.75"], ["M2", "1e-05"]]))
+            journal.record(7, (-0.5, 4.0, []))
+            journal.sync()
+            
+            with open(journal.path, "a") as partial_journal:
+                partial_journal.write("9 1.0 2.0 E1")
+            
+            reloaded_journal = TransitionJournal("check", True, False)
+            check(reloaded_journal.take(3) == (1.5, 2.5, [["E1", "0.75"], ["M2", "1e-05"]]) and reloaded_journal.take(7) == (-0.5, 4.0, []) and \
+                  reloaded_journal.take(9) is None, "TransitionJournal does not read back the recorded transitions")
+            
+            journal.journal.close()
+            transition_journals.remove(journal)
+            reloaded_journal.close()
+            
+            # The finished batches end where they ended, and a new batch is clamped between min_transitions and max_transitions
+            check(transitionBatchEnd("check", 100, 100, [100, 250], True) == 250, "transitionBatchEnd does not reuse the end of a finished batch")
+            check(transitionBatchEnd("check", 400, 400, [100, 250], False) is None, "transitionBatchEnd ends a batch before the starting transition")
+            
+            transition_footprints["check"] = 1e+30
+            check(transitionBatchEnd("check", 400, 450, [100, 250], True) == 450 + int(min_transitions), "transitionBatchEnd is not limited by min_transitions")
+            
+            transition_footprints["check"] = 1e-30
+            check(transitionBatchEnd("check", 400, 450, [100, 250], True) == 450 + int(max_transitions), "transitionBatchEnd is not limited by max_transitions")
+            
+            # The prefix only advances over calculations that all finished
+            watermark = CompletionWatermark()
+            advanced = [watermark.update(idx) for idx in [2, 0, 1, 5, 3]]
+            check(advanced == [False, True, True, False, True] and watermark.prefix == 4 and watermark.total == 6, \
+                  "CompletionWatermark advances the prefix as " + str(advanced) + " up to " + str(watermark.prefix))
+        finally:
+            rootDir, directory_name = previous_root, previous_directory
+            
+            transition_footprints.clear()
+            transition_footprints.update(previous_footprints)
+    
+    print(("Self-check passed" if len(failures) == 0 else str(len(failures)) + " self-checks failed") + "\n")
+    
+    return len(failures) == 0
+
+
 if __name__ == "__main__":
+    # Check of the helpers of the scheduler, which does not run any calculation
+    if len(sys.argv) > 1 and sys.argv[1] == "selfcheck":
+        sys.exit(0 if selfCheck() else 1)
+    
+    # Worker mode to run the calculations served by another instance of this script
+    if len(sys.argv) > 2 and sys.argv[1] == "worker":
+        runRemoteWorkers(sys.argv[2], int(sys.argv[3]) if len(sys.argv) > 3 else os.cpu_count() or 1)
+        sys.exit(0)
+    
+    # Stop gracefully on SIGINT or SIGTERM while calculations are running
+    signal.signal(signal.SIGINT, interruptCalculation)
+    signal.signal(signal.SIGTERM, interruptCalculation)
+    sys.excepthook = reportInterruption
+    
+    # Campaign mode to calculate several elements that share the workers of this process
+    if len(sys.argv) > 2 and sys.argv[1] == "campaign":
+        runCampaign(sys.argv[2], int(sys.argv[3]) if len(sys.argv) > 3 else os.cpu_count() or 1)
+        sys.exit(0)
+    
+    # Run of one element of a campaign, with the answers to the prompts given as setting=value arguments
+    if len(sys.argv) > 1 and sys.argv[1] == "element":
+        campaign_settings.update([argument.split("=", 1) for argument in sys.argv[2:]])
+    
     InitialPrompt()
     
     
@@ -6447,75 +9947,102 @@ if __name__ == "__main__":
     type_calc = ''
     
     if not partial:
+        # All state types are calculated at the same time in the shared job pool
+        state_calculations: List[Callable[[], None]] = []
+        
         if not calculate_excitation:
-            calculateStates(shell_array, "radiative", configuration_1hole, int(nelectrons), calculated1holeStates, \
+            # Diagram and auger transitions are calculated as soon as their states converge
+            transition_precalculator.addTransitions("radiative", "radiative", "radiative", nelectrons, nelectrons)
+            transition_precalculator.addTransitions("auger", "radiative", "auger", nelectrons, str(int(nelectrons) - 1))
+            
+            state_calculations.append(partial_f(calculateStates, shell_array, "radiative", configuration_1hole, int(nelectrons), calculated1holeStates, \
                             file_cycle_log_1hole, "1 hole states discovery done.\nList of all discovered states:\n", "1 Hole", \
                             partial_f(writeResultsState, file_cycle_log_1hole, file_final_results_1hole, "1 Hole", \
                                                         calculated1holeStates, radiative_by_hand, True), \
-                            radiative_by_hand)
+                            radiative_by_hand))
         
-            calculateStates(shell_array_2holes, "auger", configuration_2holes, int(nelectrons) - 1, calculated2holesStates, \
+            state_calculations.append(partial_f(calculateStates, shell_array_2holes, "auger", configuration_2holes, int(nelectrons) - 1, calculated2holesStates, \
                             file_cycle_log_2holes, "2 hole states discovery done.\nList of all discovered states:\n", "2 Hole", \
                             partial_f(writeResultsState, file_cycle_log_2holes, file_final_results_2holes, "2 Holes", \
                                                         calculated2holesStates, auger_by_hand, True), \
-                            auger_by_hand)
+                            auger_by_hand))
         
             if calculate_3holes:
-                calculateStates(shell_array_3holes, "3holes", configuration_3holes, int(nelectrons) - 2, calculated3holesStates, \
+                state_calculations.append(partial_f(calculateStates, shell_array_3holes, "3holes", configuration_3holes, int(nelectrons) - 2, calculated3holesStates, \
                                 file_cycle_log_3holes, "3 holes states discovery done.\nList of all discovered states:\n", "3 Hole", \
                                 partial_f(writeResultsState, file_cycle_log_3holes, file_final_results_3holes, "3 Holes", \
                                                             calculated3holesStates, sat_auger_by_hand, True), \
-                                sat_auger_by_hand)
+                                sat_auger_by_hand))
         
         if calculate_shakeup:
-            calculateStates(shell_array_shakeup, "shakeup", configuration_shakeup, int(nelectrons), calculatedShakeupStates, \
+            state_calculations.append(partial_f(calculateStates, shell_array_shakeup, "shakeup", configuration_shakeup, int(nelectrons), calculatedShakeupStates, \
                             file_cycle_log_shakeup, "Shake-up states discovery done.\nList of all discovered states:\n", "Shake-up", \
                             partial_f(writeResultsState, file_cycle_log_shakeup, file_final_results_shakeup, "Shake-up", \
                                                         calculatedShakeupStates, shakeup_by_hand, True), \
-                            shakeup_by_hand)
+                            shakeup_by_hand))
         if calculate_excitation:
-            calculateStates(shell_array_excitation, "raditive", configuration_excitation, int(nelectrons) + 1, calculated1holeStates, \
+            state_calculations.append(partial_f(calculateStates, shell_array_excitation, "raditive", configuration_excitation, int(nelectrons) + 1, calculated1holeStates, \
                             file_cycle_log_1hole, "1 hole states discovery done.\nList of all discovered states:\n", "1 Hole", \
                             partial_f(writeResultsState, file_cycle_log_1hole, file_final_results_1hole, "1 Hole", \
                                                         calculated1holeStates, radiative_by_hand, True), \
-                            radiative_by_hand)
+                            radiative_by_hand))
+        
+        calculateStatesConcurrently(state_calculations)
         
-        type_calc = midPrompt()
+        # The user can change the states in the prompt, so no more transitions are started until it is answered
+        transition_precalculator.pause()
+        try:
+            type_calc = midPrompt()
+        finally:
+            transition_precalculator.resume()
     elif redo_energy_calc:
+        # All state types are calculated at the same time in the shared job pool
+        state_calculations: List[Callable[[], None]] = []
+        
         if not calculate_excitation:
+            # Diagram and auger transitions are calculated as soon as their states converge
+            transition_precalculator.addTransitions("radiative", "radiative", "radiative", nelectrons, nelectrons)
+            transition_precalculator.addTransitions("auger", "radiative", "auger", nelectrons, str(int(nelectrons) - 1))
+            
+            # The states that converged before the calculation was stopped are paired with the ones that converge now
+            transition_precalculator.seedConverged("radiative", calculated1holeStates)
+            transition_precalculator.seedConverged("auger", calculated2holesStates)
+            
             if not complete_1hole: # type: ignore
-                calculateStates(shell_array, "radiative", configuration_1hole, int(nelectrons), calculated1holeStates, \
+                state_calculations.append(partial_f(calculateStates, shell_array, "radiative", configuration_1hole, int(nelectrons), calculated1holeStates, \
                             file_cycle_log_1hole, "1 hole states discovery done.\nList of all discovered states:\n", "1 Hole", \
                             partial_f(writeResultsState, file_cycle_log_1hole, file_final_results_1hole, "1 Hole", \
                                                         calculated1holeStates, radiative_by_hand, True), \
-                            radiative_by_hand, last_calculated_cycle_1hole, last_calculated_state_1hole) # type: ignore
+                            radiative_by_hand, last_calculated_cycle_1hole, last_calculated_state_1hole)) # type: ignore
             if not complete_2holes: # type: ignore
-                calculateStates(shell_array_2holes, "auger", configuration_2holes, int(nelectrons) - 1, calculated2holesStates, \
+                state_calculations.append(partial_f(calculateStates, shell_array_2holes, "auger", configuration_2holes, int(nelectrons) - 1, calculated2holesStates, \
                             file_cycle_log_2holes, "2 hole states discovery done.\nList of all discovered states:\n", "2 Hole", \
                             partial_f(writeResultsState, file_cycle_log_2holes, file_final_results_2holes, "2 Holes", \
                                                         calculated2holesStates, auger_by_hand, True), \
-                            auger_by_hand, last_calculated_cycle_2holes, last_calculated_state_2holes) # type: ignore
+                            auger_by_hand, last_calculated_cycle_2holes, last_calculated_state_2holes)) # type: ignore
             
             if not complete_3holes and calculate_3holes: # type: ignore
-                calculateStates(shell_array_3holes, "3holes", configuration_3holes, int(nelectrons) - 2, calculated3holesStates, \
+                state_calculations.append(partial_f(calculateStates, shell_array_3holes, "3holes", configuration_3holes, int(nelectrons) - 2, calculated3holesStates, \
                                 file_cycle_log_3holes, "3 holes states discovery done.\nList of all discovered states:\n", "3 Hole", \
                                 partial_f(writeResultsState, file_cycle_log_3holes, file_final_results_3holes, "3 Holes", \
                                                             calculated3holesStates, sat_auger_by_hand, True), \
-                                sat_auger_by_hand, last_calculated_cycle_3holes, last_calculated_state_3holes) # type: ignore
+                                sat_auger_by_hand, last_calculated_cycle_3holes, last_calculated_state_3holes)) # type: ignore
         
         if not complete_shakeup and calculate_shakeup: # type: ignore
-            calculateStates(shell_array_shakeup, "shakeup", configuration_shakeup, int(nelectrons), calculatedShakeupStates, \
+            state_calculations.append(partial_f(calculateStates, shell_array_shakeup, "shakeup", configuration_shakeup, int(nelectrons), calculatedShakeupStates, \
                             file_cycle_log_shakeup, "Shake-up states discovery done.\nList of all discovered states:\n", "Shake-up", \
                             partial_f(writeResultsState, file_cycle_log_shakeup, file_final_results_shakeup, "Shake-up", \
                                                         calculatedShakeupStates, shakeup_by_hand, True), \
-                            shakeup_by_hand, last_calculated_cycle_shakeup, last_calculated_state_shakeup) # type: ignore
+                            shakeup_by_hand, last_calculated_cycle_shakeup, last_calculated_state_shakeup)) # type: ignore
         
         if not complete_1hole and calculate_excitation: # type: ignore
-            calculateStates(shell_array_excitation, "radiative", configuration_excitation, int(nelectrons) + 1, calculated1holeStates, \
+            state_calculations.append(partial_f(calculateStates, shell_array_excitation, "radiative", configuration_excitation, int(nelectrons) + 1, calculated1holeStates, \
                         file_cycle_log_1hole, "1 hole states discovery done.\nList of all discovered states:\n", "1 Hole", \
                         partial_f(writeResultsState, file_cycle_log_1hole, file_final_results_1hole, "1 Hole", \
                                                     calculated1holeStates, radiative_by_hand, True), \
-                        radiative_by_hand, last_calculated_cycle_1hole, last_calculated_state_1hole) # type: ignore
+                        radiative_by_hand, last_calculated_cycle_1hole, last_calculated_state_1hole)) # type: ignore
+        
+        calculateStatesConcurrently(state_calculations)
         
         redo_transitions = True
         
@@ -6596,7 +10123,11 @@ if __name__ == "__main__":
         
             
     elif redo_transitions:
-        type_calc = midPrompt(True)
+        transition_precalculator.pause()
+        try:
+            type_calc = midPrompt(True)
+        finally:
+            transition_precalculator.resume()
         
         print("\nRe-sorting lists of states...")
         sortCalculatedStates()